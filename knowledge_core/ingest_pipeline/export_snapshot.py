@@ -16,8 +16,15 @@ import psycopg2.extras
 import yaml
 
 from knowledge_core.ingest_pipeline import logging as ingest_logging
-from knowledge_core.ingest_pipeline.graph_builder.pipeline import apply_cli_graph, build_dsn, load_config
+from knowledge_core.ingest_pipeline.graph_builder.pipeline import (
+    apply_cli_graph,
+    build_dsn,
+    fetch_embeddings_fingerprint,
+    load_config,
+)
+from knowledge_core.ingest_pipeline.graph_builder.snapshot import load_snapshot
 from knowledge_core.ingest_pipeline.logging import log_error, log_event, setup_logging
+from knowledge_core.ingest_pipeline.posts import ExtractCache, open_extract_cache, read_post_file
 
 
 @dataclass(frozen=True)
@@ -59,8 +66,42 @@ def normalize_rubric_id(rubric_id: str) -> str:
     return rubric_id if rubric_id.startswith('rubric:') else f'rubric:{rubric_id}'
 
 
-def load_documents(conn: psycopg2.extensions.connection, *, model: str) -> dict[str, Document]:
-    query = """
+def snapshot_doc_ids(
+    conn: psycopg2.extensions.connection,
+    *,
+    snapshot_dir: Path | None,
+    model: str,
+    doc_type: str = 'post',
+) -> set[str] | None:
+    if snapshot_dir is None:
+        return None
+    snapshot = load_snapshot(snapshot_dir, doc_type, model)
+    if snapshot is None or snapshot.fingerprint != fetch_embeddings_fingerprint(conn, doc_type=doc_type, model=model):
+        return None
+    return set(snapshot.doc_ids)
+
+
+def load_documents(
+    conn: psycopg2.extensions.connection,
+    *,
+    model: str,
+    doc_ids: set[str] | None = None,
+) -> dict[str, Document]:
+    embeddings_filter = """
+          AND EXISTS (
+              SELECT 1
+              FROM publications.embeddings e
+              WHERE e.doc_id = dm.doc_id
+                AND e.doc_type = 'post'
+                AND e.model = %s
+          )
+    """
+    params: tuple[Any, ...] = (model,)
+    if doc_ids is not None:
+        # Набор документов с embeddings известен из актуального snapshot, фильтруем в Python.
+        embeddings_filter = ''
+        params = ()
+    query = f"""
         SELECT
             dm.doc_id::text,
             COALESCE(dm.rubric_ids, ARRAY[]::text[]) AS rubric_ids,
@@ -69,19 +110,15 @@ def load_documents(conn: psycopg2.extensions.connection, *, model: str) -> dict[
             COALESCE(dm.meta->>'title', NULL) AS title
         FROM publications.doc_metadata dm
         WHERE dm.doc_type = 'post'
-          AND EXISTS (
-              SELECT 1
-              FROM publications.embeddings e
-              WHERE e.doc_id = dm.doc_id
-                AND e.doc_type = 'post'
-                AND e.model = %s
-          )
+        {embeddings_filter}
     """
 
     docs: dict[str, Document] = {}
     with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute(query, (model,))
+        cur.execute(query, params)
         for row in cur.fetchall():
+            if doc_ids is not None and row['doc_id'] not in doc_ids:
+                continue
             docs[row['doc_id']] = Document(
                 doc_id=row['doc_id'],
                 rubric_ids=[str(x) for x in (row['rubric_ids'] or [])],
@@ -94,20 +131,6 @@ def load_documents(conn: psycopg2.extensions.connection, *, model: str) -> dict[
     return docs
 
 
-def split_frontmatter(raw_text: str, path: Path) -> tuple[str, str]:
-    lines = raw_text.splitlines()
-    if not lines or lines[0].strip() != '---':
-        raise ValueError(f'Отсутствует frontmatter в {path}')
-
-    for idx in range(1, len(lines)):
-        if lines[idx].strip() == '---':
-            frontmatter = '\n'.join(lines[1:idx])
-            body = '\n'.join(lines[idx + 1 :])
-            return frontmatter, body
-
-    raise ValueError(f'Не найден конец frontmatter в {path}')
-
-
 def choose_doc_path(doc_id: str, channels: list[str], path_index: dict[str, list[Path]]) -> Path | None:
     candidates = path_index.get(doc_id, [])
     if not candidates:
@@ -137,6 +160,7 @@ def enrich_documents_from_frontmatter(
     blogs_root: Path,
     logger: Any,
     run_id: str,
+    cache: ExtractCache | None = None,
 ) -> dict[str, Document]:
     path_index = build_blog_path_index(blogs_root)
     enriched: dict[str, Document] = {}
@@ -152,9 +176,8 @@ def enrich_documents_from_frontmatter(
             continue
 
         try:
-            raw_text = path.read_text(encoding='utf-8')
-            frontmatter, _ = split_frontmatter(raw_text, path)
-            meta = yaml.safe_load(frontmatter) or {}
+            # Тот же кеш извлечения, что у ingest: неизменённый файл не читается и не разбирается заново.
+            meta = read_post_file(path, cache).meta
         except (OSError, ValueError, yaml.YAMLError) as exc:
             missing_files += 1
             log_error(logger, run_id, 'frontmatter', 'Ошибка чтения frontmatter', doc_id=doc_id, path=path, error=exc)
@@ -210,7 +233,7 @@ def detect_edge_profile(
 ) -> tuple[str, int, float, int] | None:
     query = """
         SELECT se.method, se.k, se.min_similarity, COUNT(*) AS edges_count
-        FROM publications.similarity_edges se
+        FROM publications.similarity_edges_active se
         WHERE se.doc_type = %s
           AND EXISTS (
               SELECT 1
@@ -245,14 +268,9 @@ def load_edges(
     method: str,
     k: int,
     min_similarity: float,
+    doc_ids: set[str] | None = None,
 ) -> list[Edge]:
-    query = """
-        SELECT se.source_id::text, se.target_id::text, se.weight, se.method, se.k, se.min_similarity, se.doc_type
-        FROM publications.similarity_edges se
-        WHERE se.doc_type = 'post'
-          AND se.method = %s
-          AND se.k = %s
-          AND se.min_similarity = %s
+    embeddings_filter = """
           AND EXISTS (
               SELECT 1
               FROM publications.embeddings es
@@ -268,9 +286,24 @@ def load_edges(
                 AND et.model = %s
           )
     """
+    params: tuple[Any, ...] = (method, k, min_similarity, model, model)
+    if doc_ids is not None:
+        embeddings_filter = ''
+        params = (method, k, min_similarity)
+    query = f"""
+        SELECT se.source_id::text, se.target_id::text, se.weight, se.method, se.k, se.min_similarity, se.doc_type
+        FROM publications.similarity_edges_active se
+        WHERE se.doc_type = 'post'
+          AND se.method = %s
+          AND se.k = %s
+          AND se.min_similarity = %s
+        {embeddings_filter}
+    """
     with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute(query, (method, k, min_similarity, model, model))
+        cur.execute(query, params)
         rows = cur.fetchall()
+    if doc_ids is not None:
+        rows = [row for row in rows if row['source_id'] in doc_ids and row['target_id'] in doc_ids]
 
     return [
         Edge(
@@ -513,13 +546,16 @@ def main() -> None:
     effective_k = graph_config.k
     effective_min_similarity = graph_config.min_similarity
     with psycopg2.connect(build_dsn()) as conn:
-        documents = load_documents(conn, model=model)
+        doc_ids = snapshot_doc_ids(conn, snapshot_dir=config.embeddings.snapshot_dir, model=model)
+        log_event(logger, run_id, 'read', 'Проверка snapshot embeddings', actual=doc_ids is not None)
+        documents = load_documents(conn, model=model, doc_ids=doc_ids)
         edges = load_edges(
             conn,
             model=model,
             method=effective_method,
             k=effective_k,
             min_similarity=effective_min_similarity,
+            doc_ids=doc_ids,
         )
 
         should_autodetect_profile = args.k is None and args.min_similarity is None
@@ -548,6 +584,7 @@ def main() -> None:
                     method=effective_method,
                     k=effective_k,
                     min_similarity=effective_min_similarity,
+                    doc_ids=doc_ids,
                 )
 
     if not edges:
@@ -573,7 +610,14 @@ def main() -> None:
         k=effective_k,
         min_similarity=effective_min_similarity,
     )
-    documents = enrich_documents_from_frontmatter(documents, blogs_root=blogs_root, logger=logger, run_id=run_id)
+    with open_extract_cache(config.extract.cache_path) as extract_cache:
+        documents = enrich_documents_from_frontmatter(
+            documents,
+            blogs_root=blogs_root,
+            logger=logger,
+            run_id=run_id,
+            cache=extract_cache,
+        )
 
     rubric_counts = write_counts_by_rubric(args.out, documents)
     log_event(logger, run_id, 'done', '📂 Обновлён counts_by_rubric.csv', path=args.out / 'aggregates' / 'counts_by_rubric.csv')
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+import uuid
+
+import numpy as np
+
+from knowledge_core.ingest_pipeline.graph_builder.embedding_store import EmbeddingStore
+from knowledge_core.ingest_pipeline.graph_builder.hnsw import approximate_backend
+from knowledge_core.ingest_pipeline.graph_builder.pipeline import (
+    GRAPH_METHODS,
+    EmbeddingRecord,
+    GraphConfig,
+    build_similarity_edges,
+    build_similarity_edges_python,
+)
+from knowledge_core.ingest_pipeline.logging import log_event, setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Бенчмарк построения similarity edges: numpy vs pure-python')
+    parser.add_argument('--docs', type=int, default=500)
+    parser.add_argument('--dims', type=int, default=3072)
+    parser.add_argument('--clusters', type=int, default=25)
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--min-similarity', type=float, default=0.5)
+    parser.add_argument('--method', type=str, choices=GRAPH_METHODS, default='topk')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--skip-python', action='store_true')
+    parser.add_argument(
+        '--crossover',
+        type=str,
+        default=None,
+        help='Размеры корпуса через запятую: сравнить topk и hnsw на каждом и найти точку пересечения',
+    )
+    return parser.parse_args()
+
+
+def synthetic_embeddings(docs: int, dims: int, clusters: int, seed: int) -> EmbeddingStore:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, clusters), dims))
+    labels = rng.integers(0, centers.shape[0], size=docs)
+    vectors = centers[labels] + 0.8 * rng.standard_normal((docs, dims))
+    return EmbeddingStore([f'bench-{idx:06d}' for idx in range(docs)], [''] * docs, vectors)
+
+
+def timed(fn, *args) -> tuple[list[tuple[str, str, float]], float]:
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def compare_edges(
+    expected: list[tuple[str, str, float]],
+    actual: list[tuple[str, str, float]],
+) -> tuple[bool, float]:
+    expected_map = {(a, b): weight for a, b, weight in expected}
+    actual_map = {(a, b): weight for a, b, weight in actual}
+    if expected_map.keys() != actual_map.keys():
+        return False, float('inf')
+    max_delta = max((abs(expected_map[key] - actual_map[key]) for key in expected_map), default=0.0)
+    return True, max_delta
+
+
+def edge_recall(exact: list[tuple[str, str, float]], approx: list[tuple[str, str, float]]) -> float | None:
+    exact_pairs = {(a, b) for a, b, _ in exact}
+    approx_pairs = {(a, b) for a, b, _ in approx}
+    return round(len(exact_pairs & approx_pairs) / len(exact_pairs), 4) if exact_pairs else None
+
+
+def crossover(args: argparse.Namespace, run_id: str) -> None:
+    exact_config = GraphConfig(k=args.k, min_similarity=args.min_similarity)
+    hnsw_config = GraphConfig(k=args.k, min_similarity=args.min_similarity, method='hnsw')
+    found = None
+    for docs in sorted(int(item) for item in args.crossover.split(',') if item.strip()):
+        embeddings = synthetic_embeddings(docs, args.dims, args.clusters, args.seed)
+        exact_edges, exact_seconds = timed(build_similarity_edges, embeddings, exact_config)
+        hnsw_edges, hnsw_seconds = timed(build_similarity_edges, embeddings, hnsw_config)
+        log_event(
+            logger,
+            run_id,
+            'crossover',
+            'topk vs hnsw',
+            docs=docs,
+            backend=approximate_backend(),
+            topk_seconds=round(exact_seconds, 4),
+            hnsw_seconds=round(hnsw_seconds, 4),
+            edge_recall=edge_recall(exact_edges, hnsw_edges),
+        )
+        # Точка пересечения — наименьший размер, начиная с которого hnsw быстрее на всех больших.
+        if hnsw_seconds >= exact_seconds:
+            found = None
+        elif found is None:
+            found = docs
+    log_event(logger, run_id, 'crossover', 'hnsw быстрее topk начиная с', docs=found, dims=args.dims)
+
+
+def main() -> None:
+    setup_logging()
+    args = parse_args()
+    run_id = uuid.uuid4().hex[:8]
+    if args.crossover:
+        crossover(args, run_id)
+        return
+    graph_config = GraphConfig(k=args.k, min_similarity=args.min_similarity)
+    embeddings = synthetic_embeddings(args.docs, args.dims, args.clusters, args.seed)
+    log_event(
+        logger,
+        run_id,
+        'start',
+        'бенчмарк similarity edges',
+        docs=args.docs,
+        dims=args.dims,
+        top_k=args.k,
+        store_mb=round(embeddings.nbytes / 2**20, 1),
+    )
+
+    numpy_edges, numpy_seconds = timed(build_similarity_edges, embeddings, graph_config)
+    log_event(logger, run_id, 'knn', 'numpy engine', edges=len(numpy_edges), seconds=round(numpy_seconds, 4))
+
+    if args.workers > 1:
+        parallel_config = GraphConfig(k=args.k, min_similarity=args.min_similarity, workers=args.workers)
+        parallel_edges, parallel_seconds = timed(build_similarity_edges, embeddings, parallel_config)
+        same_pairs, max_delta = compare_edges(numpy_edges, parallel_edges)
+        log_event(
+            logger,
+            run_id,
+            'knn',
+            'numpy engine (process pool)',
+            workers=args.workers,
+            edges=len(parallel_edges),
+            seconds=round(parallel_seconds, 4),
+            speedup=round(numpy_seconds / parallel_seconds, 1) if parallel_seconds > 0 else None,
+            same_pairs=same_pairs,
+            max_weight_delta=f'{max_delta:.3e}',
+        )
+
+    if args.method == 'hnsw':
+        hnsw_config = GraphConfig(k=args.k, min_similarity=args.min_similarity, method='hnsw')
+        hnsw_edges, hnsw_seconds = timed(build_similarity_edges, embeddings, hnsw_config, run_id)
+        log_event(
+            logger,
+            run_id,
+            'knn',
+            'hnsw engine',
+            backend=approximate_backend(),
+            edges=len(hnsw_edges),
+            seconds=round(hnsw_seconds, 4),
+            edge_recall=edge_recall(numpy_edges, hnsw_edges),
+        )
+
+    if args.skip_python:
+        return
+
+    records = [
+        EmbeddingRecord(doc_id=doc_id, source_hash='', vector=embeddings.matrix[row].tolist())
+        for row, doc_id in enumerate(embeddings.doc_ids)
+    ]
+    python_edges, python_seconds = timed(build_similarity_edges_python, records, graph_config)
+    same_pairs, max_delta = compare_edges(python_edges, numpy_edges)
+    log_event(
+        logger,
+        run_id,
+        'knn',
+        'pure-python engine',
+        edges=len(python_edges),
+        seconds=round(python_seconds, 4),
+        speedup=round(python_seconds / numpy_seconds, 1) if numpy_seconds > 0 else None,
+        same_pairs=same_pairs,
+        max_weight_delta=f'{max_delta:.3e}',
+    )
+    if not same_pairs:
+        raise SystemExit('Наборы рёбер numpy и pure-python расходятся')
+
+
+if __name__ == '__main__':
+    main()
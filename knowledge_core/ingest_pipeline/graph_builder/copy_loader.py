@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import io
+import struct
+from typing import Any, Callable, Iterable, Iterator, Sequence
+
+from knowledge_core.ingest_pipeline.graph_builder.vector_codec import encode_halfvec, encode_vector
+
+# Бинарный формат COPY: https://www.postgresql.org/docs/current/sql-copy.html#id-1.9.3.55.9.4
+PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+PGCOPY_TRAILER = struct.pack(">h", -1)
+NULL_FIELD = struct.pack(">i", -1)
+COPY_CHUNK_BYTES = 1 << 20
+
+
+def encode_text(value: Any) -> bytes:
+    return str(value).encode("utf-8")
+
+
+def encode_int4(value: Any) -> bytes:
+    return struct.pack(">i", int(value))
+
+
+def encode_int8(value: Any) -> bytes:
+    return struct.pack(">q", int(value))
+
+
+def encode_float8(value: Any) -> bytes:
+    return struct.pack(">d", float(value))
+
+
+FIELD_ENCODERS: dict[str, Callable[[Any], bytes]] = {
+    "text": encode_text,
+    "integer": encode_int4,
+    "bigint": encode_int8,
+    "double precision": encode_float8,
+    "vector": encode_vector,
+    "halfvec": encode_halfvec,
+}
+
+
+def encode_rows(rows: Iterable[Sequence[Any]], types: Sequence[str]) -> Iterator[bytes]:
+    encoders = [FIELD_ENCODERS[column_type] for column_type in types]
+    field_count = struct.pack(">h", len(encoders))
+    yield PGCOPY_HEADER
+    for row in rows:
+        parts = [field_count]
+        for encoder, value in zip(encoders, row, strict=True):
+            if value is None:
+                parts.append(NULL_FIELD)
+                continue
+            payload = encoder(value)
+            parts.append(struct.pack(">i", len(payload)))
+            parts.append(payload)
+        yield b"".join(parts)
+    yield PGCOPY_TRAILER
+
+
+class ChunkStream(io.RawIOBase):
+    # copy_expert читает файл кусками — строки кодируются по мере чтения, без сборки всего payload в памяти.
+    def __init__(self, chunks: Iterator[bytes]) -> None:
+        self._chunks = chunks
+        self._buffer = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, target: Any) -> int:
+        while not self._buffer:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._buffer = memoryview(chunk)
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def copy_to_staging(
+    cur: Any,
+    staging: str,
+    columns: Sequence[tuple[str, str]],
+    rows: Iterable[Sequence[Any]],
+) -> None:
+    definition = ", ".join(f"{name} {column_type}" for name, column_type in columns)
+    names = ", ".join(name for name, _ in columns)
+    cur.execute(f"CREATE TEMP TABLE {staging} ({definition}) ON COMMIT DROP")
+    stream = io.BufferedReader(
+        ChunkStream(encode_rows(rows, [column_type for _, column_type in columns])),
+        buffer_size=COPY_CHUNK_BYTES,
+    )
+    cur.copy_expert(f"COPY {staging} ({names}) FROM STDIN WITH (FORMAT binary)", stream, size=COPY_CHUNK_BYTES)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Mapping, Sequence
+
+import numpy as np
+
+CACHE_DTYPE = np.dtype("<f4")
+# SQLite ограничивает число параметров в запросе — ключи читаются порциями.
+LOOKUP_CHUNK = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    dims INTEGER NOT NULL,
+    text_hash TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used INTEGER NOT NULL,
+    PRIMARY KEY (provider, model, dims, text_hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS embedding_cache_last_used ON embedding_cache (last_used);
+-- Текущий объём кеша в одной строке: триггеры держат его точным и при записи из нескольких процессов,
+-- а вытеснению не нужен SUM(size) по всей таблице. Для старого файла значение считается один раз.
+CREATE TABLE IF NOT EXISTS embedding_cache_size (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    total INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO embedding_cache_size (id, total) SELECT 0, COALESCE(SUM(size), 0) FROM embedding_cache;
+CREATE TRIGGER IF NOT EXISTS embedding_cache_size_insert AFTER INSERT ON embedding_cache BEGIN
+    UPDATE embedding_cache_size SET total = total + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS embedding_cache_size_update AFTER UPDATE OF size ON embedding_cache BEGIN
+    UPDATE embedding_cache_size SET total = total + NEW.size - OLD.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS embedding_cache_size_delete AFTER DELETE ON embedding_cache BEGIN
+    UPDATE embedding_cache_size SET total = total - OLD.size WHERE id = 0;
+END;
+"""
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    # Кеш адресуется содержимым: ключ — (provider, model, dims, sha256 подготовленного текста),
+    # поэтому переживает смену БД, восстановление дампа и правки метаданных.
+    def __init__(
+        self,
+        path: Path,
+        provider: str,
+        model: str,
+        dimensions: int | None = None,
+        max_bytes: int | None = None,
+    ) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._namespace = (provider, model, int(dimensions or 0))
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+
+    def __enter__(self) -> EmbeddingCache:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, np.ndarray]:
+        unique = list(dict.fromkeys(keys))
+        found: dict[str, np.ndarray] = {}
+        with self._lock:
+            for start in range(0, len(unique), LOOKUP_CHUNK):
+                chunk = unique[start : start + LOOKUP_CHUNK]
+                placeholders = ", ".join("?" for _ in chunk)
+                rows = self._conn.execute(
+                    f"""
+                    SELECT text_hash, vector FROM embedding_cache
+                    WHERE provider = ? AND model = ? AND dims = ? AND text_hash IN ({placeholders})
+                    """,
+                    (*self._namespace, *chunk),
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=CACHE_DTYPE).astype(np.float32)
+            if found:
+                now = time.time_ns()
+                self._conn.executemany(
+                    """
+                    UPDATE embedding_cache SET last_used = ?
+                    WHERE provider = ? AND model = ? AND dims = ? AND text_hash = ?
+                    """,
+                    [(now, *self._namespace, text_hash) for text_hash in found],
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, vectors: Mapping[str, Sequence[float]]) -> None:
+        if not vectors:
+            return
+        now = time.time_ns()
+        blobs = {text_hash: np.asarray(vector, dtype=CACHE_DTYPE).tobytes() for text_hash, vector in vectors.items()}
+        rows = [(*self._namespace, text_hash, blob, len(blob), now) for text_hash, blob in blobs.items()]
+        with self._lock:
+            self._conn.executemany(
+                """
+                INSERT INTO embedding_cache (provider, model, dims, text_hash, vector, size, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (provider, model, dims, text_hash)
+                DO UPDATE SET vector = excluded.vector, size = excluded.size, last_used = excluded.last_used
+                """,
+                rows,
+            )
+            self.stored += len(rows)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        # LRU по last_used поверх всех моделей: вытесняются давно не читанные векторы.
+        if not self.max_bytes:
+            return
+        total = self._conn.execute("SELECT total FROM embedding_cache_size WHERE id = 0").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        victims = []
+        cursor = self._conn.execute(
+            """
+            SELECT provider, model, dims, text_hash, size
+            FROM embedding_cache
+            ORDER BY last_used
+            """
+        )
+        for provider, model, dims, text_hash, size in cursor:
+            victims.append((provider, model, dims, text_hash))
+            excess -= size
+            if excess <= 0:
+                break
+        cursor.close()
+        self._conn.executemany(
+            "DELETE FROM embedding_cache WHERE provider = ? AND model = ? AND dims = ? AND text_hash = ?",
+            victims,
+        )
+        self.evicted += len(victims)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_stored": self.stored,
+            "cache_evicted": self.evicted,
+        }
@@ -0,0 +1,333 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Mapping, Sequence
+
+from knowledge_core.ingest_pipeline.graph_builder.tokens import estimate_tokens, next_batch_end
+from knowledge_core.ingest_pipeline.logging import log_error, log_event
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+class EmbeddingHTTPError(RuntimeError):
+    def __init__(self, status: int, message: str, retry_after: float | None = None) -> None:
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    attempts: int = 5
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float:
+        # Full jitter: равномерно в [0, base * 2^(attempt-1)]; Retry-After сервера важнее backoff.
+        if retry_after is not None:
+            return max(retry_after, 0.0) + random.uniform(0, self.base_delay / 4)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+def parse_duration(value: str | None) -> float | None:
+    # Формат заголовков x-ratelimit-reset-*: "20ms", "1s", "6m0s", "1h2m3.5s".
+    if not value:
+        return None
+    parts = DURATION_PART.findall(value.strip())
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+
+def parse_retry_after(headers: Mapping[str, str] | None) -> float | None:
+    if not headers:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    resets = [
+        parse_duration(headers.get(name))
+        for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")
+    ]
+    resets = [value for value in resets if value is not None]
+    return max(resets) if resets else None
+
+
+def is_retryable(exc: Exception) -> bool:
+    # Ошибки запроса (400/401/403/404/422) повтором не лечатся; сетевые сбои и прочие ошибки — повторяем.
+    if isinstance(exc, EmbeddingHTTPError):
+        return exc.status in RETRYABLE_STATUSES
+    return True
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, now: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = float(per_minute) / 60.0
+        self.tokens = float(per_minute)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        # Резерв может увести баланс в минус — тогда возвращается время ожидания до погашения долга.
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= min(float(amount), self.capacity)
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        requests_per_minute: int | None,
+        tokens_per_minute: int | None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        now = clock()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._requests = TokenBucket(requests_per_minute, now) if requests_per_minute else None
+        self._tokens = TokenBucket(tokens_per_minute, now) if tokens_per_minute else None
+        self._paused_until = now
+
+    def reserve(self, tokens: int) -> float:
+        with self._lock:
+            now = self._clock()
+            wait = max(0.0, self._paused_until - now)
+            if self._requests is not None:
+                wait = max(wait, self._requests.reserve(1, now))
+            if self._tokens is not None:
+                wait = max(wait, self._tokens.reserve(tokens, now))
+            return wait
+
+    async def acquire(self, tokens: int) -> None:
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    def observe(self, headers: Mapping[str, str]) -> None:
+        # Сервер сообщил, что квота исчерпана, — все запросы ждут до её сброса.
+        for remaining_name, reset_name in (
+            ("x-ratelimit-remaining-requests", "x-ratelimit-reset-requests"),
+            ("x-ratelimit-remaining-tokens", "x-ratelimit-reset-tokens"),
+        ):
+            remaining = headers.get(remaining_name)
+            reset = parse_duration(headers.get(reset_name))
+            if remaining is not None and reset is not None and remaining.strip() == "0":
+                self.pause(reset)
+
+
+async def embed_batch(
+    provider: Any,
+    texts: Sequence[str],
+    executor: ThreadPoolExecutor,
+    limiter: RateLimiter | None,
+    retry: RetryPolicy,
+    fail_fast: bool,
+    run_id: str,
+    doc_ids: Sequence[str],
+    count_tokens: Callable[[str], int] = estimate_tokens,
+) -> list[list[float]]:
+    loop = asyncio.get_running_loop()
+    tokens = sum(count_tokens(text) for text in texts)
+    for attempt in range(1, retry.attempts + 1):
+        if limiter is not None:
+            await limiter.acquire(tokens)
+        try:
+            vectors = await loop.run_in_executor(executor, provider.embed_texts, list(texts))
+            if len(vectors) != len(texts):
+                raise RuntimeError("Количество embeddings не совпадает с количеством документов")
+            return vectors
+        except Exception as exc:
+            if fail_fast or attempt == retry.attempts or not is_retryable(exc):
+                raise
+            retry_after = getattr(exc, "retry_after", None)
+            delay = retry.delay(attempt, retry_after)
+            if limiter is not None and getattr(exc, "status", None) == 429:
+                limiter.pause(delay)
+            log_error(logger, run_id, "embed", str(exc), doc_ids=list(doc_ids), attempt=attempt, delay=round(delay, 2))
+            await asyncio.sleep(delay)
+    raise RuntimeError("Не удалось получить embeddings после повторов")
+
+
+class AdaptiveBatchSize:
+    # AIMD: после успешного запроса batch растёт на шаг, после неудачи — делится пополам.
+    def __init__(self, maximum: int, minimum: int = 1, increase: int | None = None) -> None:
+        if maximum <= 0:
+            raise ValueError("Размер batch должен быть больше нуля")
+        self.maximum = maximum
+        self.minimum = max(1, min(minimum, maximum))
+        self.increase = increase or max(1, maximum // 8)
+        self.current = maximum
+        self._lock = threading.Lock()
+
+    def success(self) -> None:
+        with self._lock:
+            self.current = min(self.maximum, self.current + self.increase)
+
+    def failure(self) -> None:
+        with self._lock:
+            self.current = max(self.minimum, self.current // 2)
+
+
+async def embed_in_order_async(
+    provider: Any,
+    texts: Sequence[str],
+    doc_ids: Sequence[str],
+    commit: Callable[[int, list[list[float] | None]], Awaitable[None] | None],
+    concurrency: int,
+    limiter: RateLimiter | None,
+    retry: RetryPolicy,
+    fail_fast: bool,
+    run_id: str,
+    count_tokens: Callable[[str], int] = estimate_tokens,
+    sizer: AdaptiveBatchSize | None = None,
+    max_batch_tokens: int | None = None,
+    quarantine: Callable[[str, Exception], None] | None = None,
+    window: int | None = None,
+) -> int:
+    concurrency = max(1, concurrency)
+    sizer = sizer or AdaptiveBatchSize(getattr(provider, "batch_size", 1) or 1)
+    token_counts = [count_tokens(text) for text in texts]
+    # slots — запросы в полёте; ahead — batch-и, отправленные, но ещё не закоммиченные. Слот окна
+    # освобождается только после commit: если головной batch завис, готовые ответы не копятся в памяти.
+    slots = asyncio.Semaphore(concurrency)
+    ahead = asyncio.Semaphore(max(concurrency, window or concurrency))
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embeddings") as executor:
+
+        async def run(start: int, end: int) -> list[list[float] | None]:
+            try:
+                vectors = await embed_batch(
+                    provider,
+                    texts[start:end],
+                    executor,
+                    limiter,
+                    retry,
+                    fail_fast,
+                    run_id,
+                    doc_ids[start:end],
+                    count_tokens,
+                )
+            except Exception as exc:
+                # Повторяемая ошибка после всех попыток — сбой провайдера, а не плохой вход: бисекция
+                # отправила бы в карантин весь корпус. Запуск падает, --resume досчитает остаток.
+                if fail_fast or is_retryable(exc):
+                    raise
+                sizer.failure()
+                if end - start == 1:
+                    # Одиночный документ не проходит — в карантин, остальной запуск продолжается.
+                    log_event(logger, run_id, "warn", "документ помещён в карантин", doc_id=doc_ids[start], error=exc)
+                    if quarantine is not None:
+                        quarantine(doc_ids[start], exc)
+                    return [None]
+                # Бисекция: половины проверяются по очереди в том же слоте, пока не найдутся виновные doc_id.
+                log_event(logger, run_id, "warn", "batch упал, делим пополам", batch=end - start, error=exc)
+                middle = (start + end) // 2
+                return await run(start, middle) + await run(middle, end)
+            sizer.success()
+            return list(vectors)
+
+        async def run_in_slot(start: int, end: int) -> list[list[float] | None]:
+            try:
+                return await run(start, end)
+            finally:
+                slots.release()
+
+        pending: asyncio.Queue[tuple[int, asyncio.Future[list[list[float] | None]]] | None] = asyncio.Queue()
+
+        async def dispatch() -> int:
+            # Размер следующего batch выбирается в момент отправки — с учётом последних успехов и ошибок.
+            position = 0
+            count = 0
+            while position < len(texts):
+                await ahead.acquire()
+                await slots.acquire()
+                end = next_batch_end(token_counts, position, sizer.current, max_batch_tokens)
+                await pending.put((position, asyncio.ensure_future(run_in_slot(position, end))))
+                position = end
+                count += 1
+            await pending.put(None)
+            return count
+
+        dispatcher = asyncio.ensure_future(dispatch())
+        tasks: list[asyncio.Future[Any]] = [dispatcher]
+        try:
+            # Ответы приходят в любом порядке, коммитятся строго по порядку документов.
+            while (item := await pending.get()) is not None:
+                start, task = item
+                tasks.append(task)
+                # commit может быть корутиной: ожидание записи не блокирует event loop, а окно
+                # не освобождается, пока запись не принята, — так backpressure доходит до отправки.
+                committed = commit(start, await task)
+                if inspect.isawaitable(committed):
+                    await committed
+                ahead.release()
+            return await dispatcher
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def embed_in_order(
+    provider: Any,
+    texts: Sequence[str],
+    doc_ids: Sequence[str],
+    commit: Callable[[int, list[list[float] | None]], Awaitable[None] | None],
+    concurrency: int,
+    limiter: RateLimiter | None,
+    retry: RetryPolicy,
+    fail_fast: bool,
+    run_id: str,
+    count_tokens: Callable[[str], int] = estimate_tokens,
+    sizer: AdaptiveBatchSize | None = None,
+    max_batch_tokens: int | None = None,
+    quarantine: Callable[[str, Exception], None] | None = None,
+    window: int | None = None,
+) -> int:
+    return asyncio.run(
+        embed_in_order_async(
+            provider,
+            texts,
+            doc_ids,
+            commit,
+            concurrency=concurrency,
+            limiter=limiter,
+            retry=retry,
+            fail_fast=fail_fast,
+            run_id=run_id,
+            count_tokens=count_tokens,
+            sizer=sizer,
+            max_batch_tokens=max_batch_tokens,
+            quarantine=quarantine,
+            window=window,
+        )
+    )
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from typing import Iterable, Sequence
+
+import numpy as np
+
+STORE_DTYPE = np.dtype(np.float32)
+STORE_MIN_CAPACITY = 1024
+
+
+def normalize_rows(matrix: np.ndarray) -> None:
+    # Нормы считаются во float64, чтобы float32-строки после деления были единичными с точностью float32.
+    norms = np.sqrt(np.einsum("ij,ij->i", matrix, matrix, dtype=np.float64))
+    nonzero = norms > 0
+    matrix[nonzero] /= norms[nonzero, None].astype(matrix.dtype)
+
+
+class EmbeddingStore:
+    # Векторы всех документов — одна C-contiguous float32-матрица, нормированная один раз при записи:
+    # 4 байта на измерение вместо ~32 у list[float], и расчёт рёбер не строит вторую нормированную копию.
+    __slots__ = ("doc_ids", "source_hashes", "matrix", "quantized", "_rows")
+
+    def __init__(
+        self,
+        doc_ids: Sequence[str],
+        source_hashes: Sequence[str],
+        matrix: np.ndarray,
+        normalized: bool = False,
+    ) -> None:
+        matrix = np.asarray(matrix)
+        if matrix.size == 0 and matrix.ndim != 2:
+            matrix = np.zeros((len(doc_ids), 0), dtype=STORE_DTYPE)
+        if matrix.ndim != 2:
+            raise ValueError("Векторы embeddings должны иметь одинаковую размерность")
+        if not (matrix.shape[0] == len(doc_ids) == len(source_hashes)):
+            raise ValueError("Число векторов не совпадает с числом документов")
+        if not normalized:
+            # Чужой буфер (в том числе mmap snapshot-а) не меняется: нормируется одна float32-копия.
+            matrix = np.array(matrix, dtype=STORE_DTYPE, order="C")
+            normalize_rows(matrix)
+        self.doc_ids = list(doc_ids)
+        self.source_hashes = list(source_hashes)
+        self.matrix = matrix
+        # Квантованные коды из snapshot (QuantizedMatrix), если их подготовил load_embeddings_for_edges.
+        self.quantized = None
+        self._rows = {doc_id: row for row, doc_id in enumerate(self.doc_ids)}
+        if len(self._rows) != len(self.doc_ids):
+            raise ValueError("Повторяющиеся doc_id в embeddings")
+
+    @classmethod
+    def from_rows(
+        cls,
+        rows: Iterable[tuple[str, str, Sequence[float]]],
+        size_hint: int = 0,
+    ) -> EmbeddingStore:
+        # Строки копируются сразу в общий буфер; при неверной подсказке размера буфер растёт удвоением.
+        doc_ids: list[str] = []
+        source_hashes: list[str] = []
+        buffer: np.ndarray | None = None
+        for doc_id, source_hash, vector in rows:
+            data = np.asarray(vector, dtype=STORE_DTYPE).reshape(-1)
+            if buffer is None:
+                buffer = np.empty((size_hint or STORE_MIN_CAPACITY, data.shape[0]), dtype=STORE_DTYPE)
+            elif len(doc_ids) == buffer.shape[0]:
+                grown = np.empty((buffer.shape[0] * 2, buffer.shape[1]), dtype=STORE_DTYPE)
+                grown[: buffer.shape[0]] = buffer
+                buffer = grown
+            if data.shape[0] != buffer.shape[1]:
+                raise ValueError("Векторы embeddings должны иметь одинаковую размерность")
+            buffer[len(doc_ids)] = data
+            doc_ids.append(doc_id)
+            source_hashes.append(source_hash)
+        if buffer is None:
+            buffer = np.zeros((0, 0), dtype=STORE_DTYPE)
+        elif buffer.shape[0] != len(doc_ids):
+            buffer = buffer[: len(doc_ids)].copy()
+        # Буфер собран здесь и никому не принадлежит — нормируется на месте, без второй копии.
+        normalize_rows(buffer)
+        return cls(doc_ids, source_hashes, buffer, normalized=True)
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def __contains__(self, doc_id: object) -> bool:
+        return doc_id in self._rows
+
+    def row(self, doc_id: str) -> int:
+        return self._rows[doc_id]
+
+    def vector(self, doc_id: str) -> np.ndarray:
+        return self.matrix[self._rows[doc_id]]
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.matrix.nbytes)
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator
+
+from knowledge_core.ingest_pipeline.graph_builder.local_embeddings import LOCAL_DEFAULT_DIMENSIONS, HashingEmbedder
+from knowledge_core.ingest_pipeline.graph_builder.tokens import estimate_tokens
+from knowledge_core.ingest_pipeline.graph_builder.vector_codec import encode_base64_embedding
+from knowledge_core.ingest_pipeline.logging import log_event, setup_logging
+
+logger = logging.getLogger(__name__)
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+
+@dataclass(frozen=True)
+class StandInConfig:
+    latency_ms: float = 0.0
+    # uniform: latency_ms ± jitter_ms; lognormal: медиана latency_ms, jitter_ms / latency_ms — sigma.
+    latency_distribution: str = "fixed"
+    jitter_ms: float = 0.0
+    rate_429: float = 0.0
+    rate_500: float = 0.0
+    retry_after: float | None = 1.0
+    max_input_tokens: int | None = 8191
+    dimensions: int = LOCAL_DEFAULT_DIMENSIONS
+    seed: int = 0
+
+
+class StandInState:
+    def __init__(self, config: StandInConfig) -> None:
+        if config.latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Неизвестное распределение задержки: {config.latency_distribution}")
+        self.config = config
+        self._random = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self._embedders: dict[int, HashingEmbedder] = {}
+        self.counts = {"requests": 0, "inputs": 0, "ok": 0, "429": 0, "500": 0, "400": 0}
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counts[name] += value
+
+    def latency(self) -> float:
+        config = self.config
+        with self._lock:
+            if config.latency_distribution == "uniform":
+                value = self._random.uniform(config.latency_ms - config.jitter_ms, config.latency_ms + config.jitter_ms)
+            elif config.latency_distribution == "lognormal" and config.latency_ms > 0:
+                value = self._random.lognormvariate(math.log(config.latency_ms), config.jitter_ms / config.latency_ms)
+            else:
+                value = config.latency_ms
+        return max(0.0, value) / 1000.0
+
+    def fault(self) -> int | None:
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.config.rate_429:
+            return 429
+        if roll < self.config.rate_429 + self.config.rate_500:
+            return 500
+        return None
+
+    def embedder(self, dimensions: int) -> HashingEmbedder:
+        with self._lock:
+            if dimensions not in self._embedders:
+                self._embedders[dimensions] = HashingEmbedder(dimensions, seed=self.config.seed)
+            return self._embedders[dimensions]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # Контракт POST /v1/embeddings в объёме, который использует OpenAIEmbeddingProvider.
+    server: StandInServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/").endswith("/stats"):
+            self._reply(200, dict(self.server.state.counts))
+            return
+        self._reply(404, error_body("Not found", "invalid_request_error"))
+
+    def do_POST(self) -> None:
+        state = self.server.state
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not self.path.rstrip("/").endswith("/embeddings"):
+            self._reply(404, error_body("Not found", "invalid_request_error"))
+            return
+        state.count("requests")
+        time.sleep(state.latency())
+
+        status = state.fault()
+        if status == 429:
+            state.count("429")
+            headers = {}
+            if state.config.retry_after is not None:
+                headers["Retry-After"] = f"{state.config.retry_after:g}"
+                headers["retry-after-ms"] = str(int(state.config.retry_after * 1000))
+            self._reply(429, error_body("Rate limit reached", "rate_limit_exceeded"), headers)
+            return
+        if status == 500:
+            state.count("500")
+            self._reply(500, error_body("The server had an error while processing your request", "server_error"))
+            return
+
+        try:
+            payload = json.loads(body)
+            model = str(payload["model"])
+            inputs = payload["input"]
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            dimensions = int(payload.get("dimensions") or state.config.dimensions)
+            encoding_format = str(payload.get("encoding_format") or "float")
+            if encoding_format not in ("float", "base64"):
+                raise ValueError(f"unsupported encoding_format {encoding_format}")
+        except (ValueError, KeyError, TypeError) as exc:
+            state.count("400")
+            self._reply(400, error_body(f"Invalid request: {exc}", "invalid_request_error"))
+            return
+
+        tokens = [estimate_tokens(text) for text in inputs]
+        limit = state.config.max_input_tokens
+        for index, used in enumerate(tokens):
+            if limit is not None and used > limit:
+                state.count("400")
+                message = (
+                    f"This model's maximum context length is {limit} tokens, however you requested "
+                    f"{used} tokens (input {index}). Please reduce your prompt."
+                )
+                self._reply(400, error_body(message, "invalid_request_error"))
+                return
+
+        vectors = state.embedder(dimensions).embed(inputs)
+        state.count("ok")
+        state.count("inputs", len(inputs))
+        self._reply(
+            200,
+            {
+                "object": "list",
+                "data": [
+                    {
+                        "object": "embedding",
+                        "index": index,
+                        "embedding": (
+                            encode_base64_embedding(vector) if encoding_format == "base64" else vector.tolist()
+                        ),
+                    }
+                    for index, vector in enumerate(vectors)
+                ],
+                "model": model,
+                "usage": {"prompt_tokens": sum(tokens), "total_tokens": sum(tokens)},
+            },
+            {"x-request-id": uuid.uuid4().hex},
+        )
+
+    def _reply(self, status: int, payload: dict[str, Any], headers: dict[str, str] | None = None) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], config: StandInConfig) -> None:
+        super().__init__(address, StandInHandler)
+        self.state = StandInState(config)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+def error_body(message: str, error_type: str) -> dict[str, Any]:
+    return {"error": {"message": message, "type": error_type, "param": None, "code": None}}
+
+
+@contextmanager
+def running_server(config: StandInConfig, host: str = "127.0.0.1", port: int = 0) -> Iterator[StandInServer]:
+    server = StandInServer((host, port), config)
+    thread = threading.Thread(target=server.serve_forever, name="embeddings-stand-in", daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Локальная замена OpenAI /v1/embeddings с инъекцией ошибок")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-distribution", type=str, choices=LATENCY_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-500", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--max-input-tokens", type=int, default=8191)
+    parser.add_argument("--dimensions", type=int, default=LOCAL_DEFAULT_DIMENSIONS)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def main() -> None:
+    setup_logging()
+    args = parse_args()
+    config = StandInConfig(
+        latency_ms=args.latency_ms,
+        latency_distribution=args.latency_distribution,
+        jitter_ms=args.jitter_ms,
+        rate_429=args.rate_429,
+        rate_500=args.rate_500,
+        retry_after=args.retry_after if args.retry_after >= 0 else None,
+        max_input_tokens=args.max_input_tokens if args.max_input_tokens > 0 else None,
+        dimensions=args.dimensions,
+        seed=args.seed,
+    )
+    server = StandInServer((args.host, args.port), config)
+    log_event(logger, "stand-in", "start", "локальный сервер embeddings запущен", base_url=server.base_url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        log_event(logger, "stand-in", "stop", "локальный сервер embeddings остановлен", **server.state.counts)
+
+
+if __name__ == "__main__":
+    main()
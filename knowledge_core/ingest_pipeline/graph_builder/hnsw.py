@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+from knowledge_core.ingest_pipeline.graph_builder.similarity import SIMILARITY_BLOCK_BYTES, block_rows_for
+
+try:
+    import hnswlib
+except ImportError:  # pragma: no cover - hnswlib опционален
+    hnswlib = None
+
+
+KMEANS_ITERATIONS = 4
+
+
+def approximate_backend() -> str:
+    return "hnswlib" if hnswlib is not None else "partition"
+
+
+def approximate_neighbours(
+    matrix: np.ndarray,
+    k: int,
+    min_similarity: float,
+    m: int = 16,
+    ef_construction: int = 100,
+    ef_search: int = 64,
+    seed: int = 42,
+) -> tuple[np.ndarray, np.ndarray]:
+    # Формат как у topk_neighbours: по убыванию веса, при равенстве — по возрастанию индекса,
+    # пустые позиции: индекс -1 и вес -inf.
+    n = matrix.shape[0]
+    kk = min(k, n - 1)
+    if kk <= 0:
+        return np.full((n, 0), -1, dtype=np.int64), np.zeros((n, 0), dtype=matrix.dtype)
+    if hnswlib is not None:
+        return hnswlib_neighbours(matrix, kk, min_similarity, m, ef_construction, ef_search, seed)
+    return partition_neighbours(matrix, kk, min_similarity, probes=max(1, ef_search // 4), seed=seed)
+
+
+def hnswlib_neighbours(
+    matrix: np.ndarray,
+    kk: int,
+    min_similarity: float,
+    m: int,
+    ef_construction: int,
+    ef_search: int,
+    seed: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    n, dims = matrix.shape
+    index = hnswlib.Index(space="ip", dim=dims)
+    index.init_index(max_elements=n, ef_construction=max(ef_construction, kk + 1), M=m, random_seed=seed)
+    index.add_items(np.asarray(matrix, dtype=np.float32), np.arange(n))
+    index.set_ef(max(ef_search, kk + 1))
+    labels, distances = index.knn_query(np.asarray(matrix, dtype=np.float32), k=kk + 1)
+    labels = labels.astype(np.int64)
+    weights = (1.0 - distances).astype(matrix.dtype)
+
+    # Сам документ обычно первый, но при дублях векторов может стоять где угодно или не найтись вовсе.
+    own = labels == np.arange(n)[:, None]
+    own[~own.any(axis=1), -1] = True
+    return ranked_neighbours(labels[~own].reshape(n, kk), weights[~own].reshape(n, kk), min_similarity)
+
+
+def partition_neighbours(
+    matrix: np.ndarray,
+    kk: int,
+    min_similarity: float,
+    probes: int,
+    seed: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    # Сферический k-means на ~√n кластеров; строки кластера одним матричным умножением сравниваются
+    # только с членами `probes` ближайших к его центроиду кластеров — ~probes·n·√n вместо n² операций.
+    n = matrix.shape[0]
+    centroids = spherical_kmeans(matrix, max(1, math.isqrt(n)), seed)
+    members = cluster_members(nearest_centroid(matrix, centroids), centroids.shape[0])
+    closeness = centroids @ centroids.T
+    np.fill_diagonal(closeness, np.inf)
+    probes = min(probes, centroids.shape[0])
+    nearest = np.argsort(-closeness, axis=1, kind="stable")[:, :probes]
+
+    neighbours = np.full((n, kk), -1, dtype=np.int64)
+    weights = np.full((n, kk), -np.inf, dtype=matrix.dtype)
+    for cluster, rows in enumerate(members):
+        if rows.size == 0:
+            continue
+        candidates = np.concatenate([members[other] for other in nearest[cluster]])
+        sims = matrix[rows] @ matrix[candidates].T
+        sims[rows[:, None] == candidates[None, :]] = -np.inf
+        width = min(kk, candidates.size)
+        part = np.argpartition(-sims, width - 1, axis=1)[:, :width]
+        neighbours[rows, :width] = candidates[part]
+        weights[rows, :width] = np.take_along_axis(sims, part, axis=1)
+    return ranked_neighbours(neighbours, weights, min_similarity)
+
+
+def spherical_kmeans(matrix: np.ndarray, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centroids = matrix[np.sort(rng.choice(matrix.shape[0], clusters, replace=False))].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = nearest_centroid(matrix, centroids)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=clusters)
+        filled = counts > 0
+        starts = (np.cumsum(counts) - counts)[filled]
+        sums = np.add.reduceat(matrix[order], starts, axis=0)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # Пустой кластер сохраняет прежний центроид.
+        centroids[filled] = sums / np.maximum(norms, np.finfo(sums.dtype).tiny)
+    return centroids
+
+
+def nearest_centroid(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assignment = np.empty(matrix.shape[0], dtype=np.int64)
+    step = block_rows_for(centroids.shape[0], matrix.dtype.itemsize, SIMILARITY_BLOCK_BYTES)
+    for start in range(0, matrix.shape[0], step):
+        assignment[start : start + step] = np.argmax(matrix[start : start + step] @ centroids.T, axis=1)
+    return assignment
+
+
+def cluster_members(assignment: np.ndarray, clusters: int) -> list[np.ndarray]:
+    order = np.argsort(assignment, kind="stable")
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=clusters))))
+    return [order[bounds[cluster] : bounds[cluster + 1]] for cluster in range(clusters)]
+
+
+def ranked_neighbours(
+    neighbours: np.ndarray,
+    weights: np.ndarray,
+    min_similarity: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    order = np.lexsort((neighbours, -weights), axis=1)
+    neighbours = np.take_along_axis(neighbours, order, axis=1)
+    weights = np.take_along_axis(weights, order, axis=1)
+    below = ~(weights >= min_similarity)
+    neighbours[below] = -1
+    weights[below] = -np.inf
+    return neighbours, weights
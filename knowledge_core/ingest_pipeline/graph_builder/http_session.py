@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import http.client
+import queue
+import threading
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+# Ошибки, после которых соединение из пула считается протухшим (сервер закрыл keep-alive).
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+
+@dataclass(frozen=True)
+class HttpResponse:
+    status: int
+    headers: dict[str, str]
+    body: bytes
+
+
+class HttpSession:
+    def __init__(self, base_url: str, timeout: float = 60.0, max_idle: int = 8) -> None:
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Некорректный base URL: {base_url}")
+        self._scheme = parts.scheme
+        self._host = parts.hostname
+        self._port = parts.port
+        self._prefix = parts.path.rstrip("/")
+        self._timeout = timeout
+        self._idle: queue.LifoQueue[http.client.HTTPConnection] = queue.LifoQueue(maxsize=max_idle)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.connections_opened = 0
+        self.requests = 0
+        self.reused = 0
+        self.stale_retries = 0
+
+    def __enter__(self) -> HttpSession:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        with self._lock:
+            self.connections_opened += 1
+        if self._scheme == "https":
+            return http.client.HTTPSConnection(self._host, self._port, timeout=self._timeout)
+        return http.client.HTTPConnection(self._host, self._port, timeout=self._timeout)
+
+    def _acquire(self) -> tuple[http.client.HTTPConnection, bool]:
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            return self._connect(), False
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        if self._closed:
+            conn.close()
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def request(self, method: str, path: str, body: bytes | None, headers: dict[str, str]) -> HttpResponse:
+        conn, reused = self._acquire()
+        try:
+            response = self._send(conn, method, path, body, headers)
+        except STALE_CONNECTION_ERRORS:
+            conn.close()
+            if not reused:
+                raise
+            # Keep-alive соединение закрылось на стороне сервера — один повтор на свежем.
+            with self._lock:
+                self.stale_retries += 1
+            conn, reused = self._connect(), False
+            try:
+                response = self._send(conn, method, path, body, headers)
+            except Exception:
+                conn.close()
+                raise
+        except Exception:
+            conn.close()
+            raise
+
+        with self._lock:
+            self.requests += 1
+            self.reused += int(reused)
+        status, response_headers, payload, will_close = response
+        if will_close:
+            conn.close()
+        else:
+            self._release(conn)
+        return HttpResponse(status=status, headers=response_headers, body=payload)
+
+    def _send(
+        self,
+        conn: http.client.HTTPConnection,
+        method: str,
+        path: str,
+        body: bytes | None,
+        headers: dict[str, str],
+    ) -> tuple[int, dict[str, str], bytes, bool]:
+        conn.request(method, f"{self._prefix}{path}", body=body, headers={"Connection": "keep-alive", **headers})
+        response = conn.getresponse()
+        payload = response.read()
+        response_headers = {name.lower(): value for name, value in response.getheaders()}
+        return response.status, response_headers, payload, response.will_close
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "http_requests": self.requests,
+            "http_connections": self.connections_opened,
+            "http_reused": self.reused,
+            "http_stale_retries": self.stale_retries,
+        }
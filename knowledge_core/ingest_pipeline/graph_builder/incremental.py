@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+import numpy as np
+
+from knowledge_core.ingest_pipeline.graph_builder.similarity import SIMILARITY_BLOCK_BYTES, block_rows_for
+
+
+def affected_rows(
+    matrix: np.ndarray,
+    changed_rows: Iterable[int],
+    thresholds: np.ndarray,
+    neighbour_rows: Iterable[int] = (),
+    block_bytes: int = SIMILARITY_BLOCK_BYTES,
+) -> np.ndarray:
+    # Строка затронута, если её вектор изменился, если она была соседом изменённого документа
+    # или если изменённый документ теперь сильнее её самого слабого ребра (thresholds).
+    changed = np.fromiter(changed_rows, dtype=np.int64)
+    affected = np.zeros(matrix.shape[0], dtype=bool)
+    affected[changed] = True
+    affected[np.fromiter(neighbour_rows, dtype=np.int64)] = True
+
+    step = block_rows_for(matrix.shape[0], matrix.dtype.itemsize, block_bytes)
+    for start in range(0, changed.size, step):
+        block = changed[start : start + step]
+        sims = matrix[block] @ matrix.T
+        sims[np.arange(block.size), block] = -np.inf
+        affected |= (sims >= thresholds[None, :]).any(axis=0)
+    return np.flatnonzero(affected)
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import hashlib
+import re
+from typing import Sequence
+
+import numpy as np
+
+LOCAL_DEFAULT_DIMENSIONS = 256
+LOCAL_FEATURE_CACHE_SIZE = 1_000_000
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+BIGRAM_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+class HashingEmbedder:
+    # Feature hashing по словам и парам соседних слов: знак и индекс измерения берутся из blake2b
+    # слова (не из hash(), который солится на каждый процесс), вес — log(1 + tf), вектор L2-нормирован.
+    # Одинаковый текст даёт один и тот же вектор на любой машине; близкие по словам тексты — близкие векторы.
+    def __init__(self, dimensions: int = LOCAL_DEFAULT_DIMENSIONS, seed: int = 0) -> None:
+        if dimensions <= 0:
+            raise ValueError("Размерность локальных embeddings должна быть больше нуля")
+        self.dimensions = dimensions
+        self._salt = seed.to_bytes(8, "little", signed=True)
+        # blake2b считается один раз на уникальное слово; кеш сбрасывается, чтобы не расти без предела.
+        self._hashes: dict[str, int] = {}
+
+    def _hash(self, word: str) -> int:
+        value = self._hashes.get(word)
+        if value is None:
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8, salt=self._salt).digest()
+            value = int.from_bytes(digest, "little")
+            if len(self._hashes) >= LOCAL_FEATURE_CACHE_SIZE:
+                self._hashes.clear()
+            self._hashes[word] = value
+        return value
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        words: list[str] = []
+        lengths = np.zeros(len(texts), dtype=np.int64)
+        for row, text in enumerate(texts):
+            found = TOKEN_PATTERN.findall(text.lower())
+            words.extend(found)
+            lengths[row] = len(found)
+        hashes = np.fromiter((self._hash(word) for word in words), dtype=np.uint64, count=len(words))
+        rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+        # Пара соседних слов одного текста — перемешанная комбинация их хешей, без сборки строк.
+        same_text = rows[1:] == rows[:-1]
+        with np.errstate(over="ignore"):
+            pairs = (hashes[:-1] * BIGRAM_MULTIPLIER) ^ hashes[1:]
+        features = np.concatenate([hashes, pairs[same_text]])
+        rows = np.concatenate([rows, rows[:-1][same_text]])
+
+        index = (features % np.uint64(self.dimensions)).astype(np.int64)
+        # Старший бит — знак: коллизии гасят друг друга, а не копятся в одном направлении.
+        sign = np.where(features >> np.uint64(63), -1.0, 1.0)
+        counts = np.bincount(rows * self.dimensions + index, weights=sign, minlength=len(texts) * self.dimensions)
+        matrix = counts.reshape(len(texts), self.dimensions)
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.sqrt(np.einsum("ij,ij->i", matrix, matrix))
+        nonzero = norms > 0
+        matrix[nonzero] /= norms[nonzero, None]
+        return matrix.astype(np.float32)
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import contextlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Iterator
+
+import numpy as np
+
+from knowledge_core.ingest_pipeline.graph_builder.similarity import SIMILARITY_BLOCK_BYTES, topk_neighbours
+
+
+PARALLEL_MIN_ROWS = 1024
+BLAS_THREAD_ENV = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+_shared_block: shared_memory.SharedMemory | None = None
+_shared_matrix: np.ndarray | None = None
+
+
+def parallel_topk_neighbours(
+    matrix: np.ndarray,
+    k: int,
+    min_similarity: float,
+    workers: int,
+    rows: np.ndarray | None = None,
+    block_bytes: int = SIMILARITY_BLOCK_BYTES,
+) -> tuple[np.ndarray, np.ndarray]:
+    rows = np.arange(matrix.shape[0]) if rows is None else np.asarray(rows, dtype=np.int64)
+    workers = min(workers, os.cpu_count() or 1)
+    if workers <= 1 or rows.size < PARALLEL_MIN_ROWS:
+        return topk_neighbours(matrix, k, min_similarity, rows=rows, block_bytes=block_bytes)
+
+    block = shared_memory.SharedMemory(create=True, size=max(1, matrix.nbytes))
+    try:
+        shared = np.ndarray(matrix.shape, dtype=matrix.dtype, buffer=block.buf)
+        shared[:] = matrix
+        del shared
+        shards = [shard for shard in np.array_split(rows, workers * 2) if shard.size]
+        worker_block_bytes = max(1, block_bytes // workers)
+        with single_threaded_blas(), ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_attach_matrix,
+            initargs=(block.name, matrix.shape, matrix.dtype.str),
+        ) as pool:
+            results = list(
+                pool.map(
+                    _shard_topk,
+                    shards,
+                    [k] * len(shards),
+                    [min_similarity] * len(shards),
+                    [worker_block_bytes] * len(shards),
+                )
+            )
+    finally:
+        block.close()
+        block.unlink()
+
+    neighbours = np.concatenate([item[0] for item in results])
+    weights = np.concatenate([item[1] for item in results])
+    return neighbours, weights
+
+
+@contextlib.contextmanager
+def single_threaded_blas() -> Iterator[None]:
+    # Воркеры делят ядра между собой, поэтому внутри каждого BLAS работает в один поток.
+    previous = {name: os.environ.get(name) for name in BLAS_THREAD_ENV}
+    for name in BLAS_THREAD_ENV:
+        os.environ.setdefault(name, "1")
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _attach_matrix(name: str, shape: tuple[int, ...], dtype: str) -> None:
+    global _shared_block, _shared_matrix
+    _shared_block = shared_memory.SharedMemory(name=name)
+    _shared_matrix = np.ndarray(shape, dtype=np.dtype(dtype), buffer=_shared_block.buf)
+
+
+def _shard_topk(
+    rows: np.ndarray,
+    k: int,
+    min_similarity: float,
+    block_bytes: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    if _shared_matrix is None:
+        raise RuntimeError("Матрица embeddings не подключена к воркеру")
+    return topk_neighbours(_shared_matrix, k, min_similarity, rows=rows, block_bytes=block_bytes)
@@ -1,30 +1,108 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import hashlib
+import heapq
 import json
 import logging
 import math
 import os
 import re
 import uuid
+import weakref
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, Sequence
-from urllib import request
+from typing import Sequence
 
+import numpy as np
 import psycopg2
 import psycopg2.extras
 
+from knowledge_core.ingest_pipeline.graph_builder.copy_loader import copy_to_staging
+from knowledge_core.ingest_pipeline.graph_builder.embedding_cache import EmbeddingCache, text_key
+from knowledge_core.ingest_pipeline.graph_builder.embedding_client import (
+    AdaptiveBatchSize,
+    EmbeddingHTTPError,
+    RateLimiter,
+    RetryPolicy,
+    embed_in_order,
+    parse_retry_after,
+)
+from knowledge_core.ingest_pipeline.graph_builder.embedding_store import EmbeddingStore, normalize_rows
+from knowledge_core.ingest_pipeline.graph_builder.http_session import HttpSession
+from knowledge_core.ingest_pipeline.graph_builder.hnsw import approximate_backend, approximate_neighbours
+from knowledge_core.ingest_pipeline.graph_builder.incremental import affected_rows
+from knowledge_core.ingest_pipeline.graph_builder.local_embeddings import LOCAL_DEFAULT_DIMENSIONS, HashingEmbedder
+from knowledge_core.ingest_pipeline.graph_builder.parallel import parallel_topk_neighbours
+from knowledge_core.ingest_pipeline.graph_builder.quantization import (
+    QUANTIZATIONS,
+    QuantizedMatrix,
+    quantized_topk_neighbours,
+)
+from knowledge_core.ingest_pipeline.graph_builder.run_ledger import (
+    finish_embedding_run,
+    mark_embedding_docs,
+    quarantine_embedding_docs,
+    start_embedding_run,
+)
+from knowledge_core.ingest_pipeline.graph_builder.snapshot import (
+    EmbeddingSnapshot,
+    load_codes,
+    load_snapshot,
+    write_codes,
+    write_snapshot,
+)
+from knowledge_core.ingest_pipeline.graph_builder.similarity import neighbour_recall
+from knowledge_core.ingest_pipeline.graph_builder.tokens import TokenCounter
+from knowledge_core.ingest_pipeline.graph_builder.vector_codec import decode_base64_embedding, decode_vector
+from knowledge_core.ingest_pipeline.graph_builder.writer import BackgroundWriter
 from knowledge_core.ingest_pipeline.logging import (
     log_error as log_error_event,
     log_event as log_event_message,
 )
-from knowledge_core.ingest_pipeline.posts import PostExtracted, extract_publish_posts
+from knowledge_core.ingest_pipeline.posts import (
+    EXTRACT_VERSION,
+    PostExtracted,
+    PostHeader,
+    materialize_posts,
+    open_extract_cache,
+    scan_publish_posts,
+)
 
 
 logger = logging.getLogger(__name__)
 
 OPENAI_KEY_PATTERN = re.compile(r"^sk-[A-Za-z0-9_-]{20,}$")
+OPENAI_API_BASE = "https://api.openai.com/v1"
+LOCAL_MODEL_PREFIX = "local-"
+EMBEDDING_ENCODING_FORMATS = ("base64", "float")
+GRAPH_METHODS = ("topk", "hnsw")
+INCREMENTAL_MAX_CHANGED_SHARE = 0.5
+EMBEDDINGS_FETCH_ITERSIZE = 2000
+EMBEDDING_STORAGES = ("vector", "halfvec")
+# Колонка publications.embeddings под каждый профиль хранения (миграция 0012).
+EMBEDDING_STORAGE_COLUMNS = {"vector": "embedding", "halfvec": "embedding_half"}
+# Колонки профилей, которые реально есть в схеме, по соединению: embedding_half только на pgvector >= 0.7.
+_storage_columns: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+EMBEDDINGS_STAGING_COLUMNS = (
+    ("doc_id", "text"),
+    ("doc_type", "text"),
+    ("model", "text"),
+    ("source_hash", "text"),
+    ("input_hash", "text"),
+    ("dims", "integer"),
+)
+EDGES_STAGING_COLUMNS = (
+    ("source_id", "text"),
+    ("target_id", "text"),
+    ("doc_type", "text"),
+    ("weight", "double precision"),
+    ("method", "text"),
+    ("k", "integer"),
+    ("min_similarity", "double precision"),
+    ("generation", "bigint"),
+)
 
 
 @dataclass(frozen=True)
@@ -34,6 +112,20 @@ class EmbeddingConfig:
     provider: str
     normalize_text: bool = True
     max_chars: int | None = None
+    max_input_tokens: int | None = 8191
+    max_batch_tokens: int | None = None
+    cache_path: Path | None = None
+    cache_max_mb: int | None = None
+    snapshot_dir: Path | None = None
+    concurrency: int = 4
+    write_queue: int = 4
+    requests_per_minute: int | None = None
+    tokens_per_minute: int | None = None
+    max_retries: int = 5
+    dimensions: int | None = None
+    storage: str = "vector"
+    api_base: str = OPENAI_API_BASE
+    encoding_format: str = "base64"
 
 
 @dataclass(frozen=True)
@@ -42,6 +134,22 @@ class GraphConfig:
     min_similarity: float
     method: str = "topk"
     doc_type: str = "post"
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 100
+    hnsw_ef_search: int = 64
+    recall_sample: int = 200
+    workers: int = 1
+    weight_epsilon: float = 1e-6
+    keep_generations: int = 2
+    quantization: str = "none"
+    rescore: int = 4
+
+
+@dataclass(frozen=True)
+class EdgeDelta:
+    inserts: list[tuple[str, str, float]]
+    updates: list[tuple[str, str, float]]
+    deletes: list[tuple[str, str]]
 
 
 @dataclass(frozen=True)
@@ -61,6 +169,7 @@ class ExecutionConfig:
 @dataclass(frozen=True)
 class ExtractConfig:
     prefer_channel: str | None
+    cache_path: Path | None = None
 
 
 @dataclass(frozen=True)
@@ -75,47 +184,105 @@ class PipelineConfig:
 class EmbeddingRecord:
     doc_id: str
     source_hash: str
-    vector: list[float]
+    vector: Sequence[float]
+    input_hash: str | None = None
 
 
 class EmbeddingProvider:
-    def __init__(self, model: str, batch_size: int) -> None:
+    def __init__(self, model: str, batch_size: int, rate_limiter: RateLimiter | None = None) -> None:
         self.model = model
         self.batch_size = batch_size
+        self.rate_limiter = rate_limiter
 
     def embed_texts(self, texts: Sequence[str]) -> list[list[float]]:
         raise NotImplementedError
 
+    def __enter__(self) -> EmbeddingProvider:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        pass
+
+    def session_stats(self) -> dict[str, int]:
+        return {}
+
 
 class OpenAIEmbeddingProvider(EmbeddingProvider):
-    def __init__(self, model: str, batch_size: int, api_key: str) -> None:
-        super().__init__(model, batch_size)
+    def __init__(
+        self,
+        model: str,
+        batch_size: int,
+        api_key: str,
+        rate_limiter: RateLimiter | None = None,
+        dimensions: int | None = None,
+        api_base: str = OPENAI_API_BASE,
+        encoding_format: str = "base64",
+    ) -> None:
+        super().__init__(model, batch_size, rate_limiter)
         if not api_key:
             raise ValueError("OPENAI_API_KEY не задан")
+        if encoding_format not in EMBEDDING_ENCODING_FORMATS:
+            raise ValueError(f"Неизвестный encoding_format: {encoding_format}")
         self._api_key = api_key
+        self.dimensions = dimensions
+        self.encoding_format = encoding_format
+        # Одна keep-alive сессия на запуск: TCP/TLS-рукопожатие не повторяется для каждого batch.
+        self._session = HttpSession(api_base)
 
     def embed_texts(self, texts: Sequence[str]) -> list[list[float]]:
         payload = {
             "model": self.model,
             "input": list(texts),
+            "encoding_format": self.encoding_format,
         }
-        data = json.dumps(payload).encode("utf-8")
-        req = request.Request(
-            "https://api.openai.com/v1/embeddings",
-            data=data,
-            method="POST",
+        if self.dimensions:
+            # text-embedding-3-*: укороченный вектор считается на стороне провайдера (Matryoshka).
+            payload["dimensions"] = self.dimensions
+        response = self._session.request(
+            "POST",
+            "/embeddings",
+            json.dumps(payload).encode("utf-8"),
             headers={
                 "Authorization": f"Bearer {self._api_key}",
                 "Content-Type": "application/json",
             },
         )
-        with request.urlopen(req, timeout=60) as response:
-            body = response.read()
-        parsed = json.loads(body)
+        if response.status >= 400:
+            raise EmbeddingHTTPError(
+                response.status,
+                response.body.decode("utf-8", errors="replace")[:500],
+                retry_after=parse_retry_after(response.headers),
+            )
+        if self.rate_limiter is not None:
+            self.rate_limiter.observe(response.headers)
+        parsed = json.loads(response.body)
         if "data" not in parsed:
             raise RuntimeError(f"Некорректный ответ OpenAI: {parsed}")
+        if self.encoding_format == "base64":
+            # Вектор приходит одной base64-строкой float32 — без разбора тысяч десятичных чисел.
+            return [decode_base64_embedding(item["embedding"]) for item in parsed["data"]]
         return [item["embedding"] for item in parsed["data"]]
 
+    def close(self) -> None:
+        self._session.close()
+
+    def session_stats(self) -> dict[str, int]:
+        return self._session.stats()
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    # Офлайн-провайдер без сети и ключа: детерминированный feature hashing (graph_builder/local_embeddings.py).
+    def __init__(self, model: str, batch_size: int, dimensions: int | None = None) -> None:
+        super().__init__(model, batch_size)
+        self._embedder = HashingEmbedder(dimensions or LOCAL_DEFAULT_DIMENSIONS)
+        self.dimensions = self._embedder.dimensions
+
+    def embed_texts(self, texts: Sequence[str]) -> list[list[float]]:
+        return list(self._embedder.embed(texts))
+
 
 def run_pipeline(
     source_root: Path,
@@ -128,24 +295,68 @@ def run_pipeline(
     run_id: str,
     run_embeddings: bool = True,
     run_edges: bool = True,
+    provider: EmbeddingProvider | None = None,
+    resume: bool = False,
 ) -> None:
     full_rebuild = full_rebuild or execution_config.mode == "full"
-    posts = extract_publish_posts(source_root, prefer_channel=extract_config.prefer_channel)
-    posts = apply_limit(posts, execution_config.limit_posts)
-    log_event(run_id, "extract", "publish-посты извлечены", posts=len(posts))
-
     embeddings: list[EmbeddingRecord] = []
     recalculated_count = 0
 
-    with psycopg2.connect(db_config.dsn) as conn:
+    with open_extract_cache(extract_config.cache_path) as extract_cache, psycopg2.connect(db_config.dsn) as conn:
         conn.autocommit = False
+        # Фаза 1: только frontmatter и хеши файлов; тексты собираются ниже для постов, которым нужен пересчёт.
+        headers = scan_publish_posts(
+            source_root,
+            prefer_channel=extract_config.prefer_channel,
+            cache=extract_cache,
+        )
+        headers = apply_limit(headers, execution_config.limit_posts)
+        log_event(
+            run_id,
+            "extract",
+            "publish-посты извлечены",
+            posts=len(headers),
+            **(extract_cache.stats() if extract_cache is not None else {}),
+        )
 
         if execution_config.dry_run:
             log_event(run_id, "dry_run", "dry-run активен, вычисления и запись пропущены")
             return
 
         if run_embeddings:
-            provider = build_provider(embedding_config)
+            # До запросов к провайдеру: иначе недоступный профиль обнаружится только на записи.
+            require_embedding_storage(conn, embedding_config.storage)
+            owns_provider = provider is None
+            provider = provider or build_provider(embedding_config)
+            counter = TokenCounter(embedding_config.model)
+            input_hashes = {
+                header.id: embedding_input_hash(header.source_hash, embedding_config, exact_tokens=counter.exact)
+                for header in headers
+            }
+            existing = fetch_existing_embeddings(
+                conn,
+                doc_ids=[header.id for header in headers],
+                doc_type=graph_config.doc_type,
+                model=embedding_config.model,
+            )
+            # Фаза 2: файл не изменился и параметры подготовки те же — вектор валиден без разбора тела.
+            unchanged = [
+                existing[header.id]
+                for header in headers
+                if header.id in existing and existing[header.id].input_hash == input_hashes[header.id]
+            ]
+            unchanged_ids = {record.doc_id for record in unchanged}
+            posts = materialize_posts(
+                (header for header in headers if header.id not in unchanged_ids),
+                cache=extract_cache,
+            )
+            log_event(
+                run_id,
+                "extract",
+                "тексты собраны для изменённых постов",
+                unchanged=len(unchanged),
+                materialized=len(posts),
+            )
             normalized_texts = {
                 post.id: prepare_text(
                     post.text_for_embedding,
@@ -153,26 +364,63 @@ def run_pipeline(
                     max_chars=embedding_config.max_chars,
                     doc_id=post.id,
                     run_id=run_id,
+                    max_tokens=embedding_config.max_input_tokens,
+                    counter=counter,
                 )
                 for post in posts
             }
-            existing = fetch_existing_embeddings(
+            done_ids = start_embedding_run(
                 conn,
-                doc_ids=[post.id for post in posts],
-                doc_type=graph_config.doc_type,
-                model=embedding_config.model,
-            )
-            embeddings, reused_count, recalculated_count = build_embeddings(
-                provider,
-                posts=posts,
-                normalized_texts=normalized_texts,
-                existing=existing,
+                run_id,
                 doc_type=graph_config.doc_type,
                 model=embedding_config.model,
-                conn=conn,
-                fail_fast=execution_config.fail_fast,
-                run_id=run_id,
+                docs_total=len(headers),
+                resume=resume,
             )
+            if resume:
+                log_event(
+                    run_id,
+                    "embed",
+                    "продолжение запуска embeddings",
+                    written=len(done_ids),
+                )
+            cache = build_embedding_cache(embedding_config)
+            try:
+                embeddings, reused_count, recalculated_count = build_embeddings(
+                    provider,
+                    posts=posts,
+                    normalized_texts=normalized_texts,
+                    existing=existing,
+                    doc_type=graph_config.doc_type,
+                    model=embedding_config.model,
+                    conn=conn,
+                    fail_fast=execution_config.fail_fast,
+                    run_id=run_id,
+                    concurrency=embedding_config.concurrency,
+                    retry=RetryPolicy(attempts=embedding_config.max_retries),
+                    counter=counter,
+                    max_batch_tokens=embedding_config.max_batch_tokens,
+                    cache=cache,
+                    write_queue=embedding_config.write_queue,
+                    dimensions=embedding_config.dimensions,
+                    storage=embedding_config.storage,
+                    input_hashes=input_hashes,
+                    unchanged=unchanged,
+                )
+            except Exception:
+                # Зафиксированные batch-и остаются в БД; --resume <run_id> досчитает остаток.
+                conn.rollback()
+                finish_embedding_run(conn, run_id, "failed")
+                raise
+            finally:
+                if owns_provider:
+                    provider.close()
+                if cache is not None:
+                    cache.close()
+            finish_embedding_run(conn, run_id, "done")
+            log_event(run_id, "embed", "HTTP-сессия провайдера", **provider.session_stats())
+            if cache is not None:
+                log_event(run_id, "embed", "локальный кеш embeddings", **cache.stats())
             log_event(
                 run_id,
                 "embed",
@@ -183,39 +431,57 @@ def run_pipeline(
                 batch=embedding_config.batch_size,
                 docs_count=len(embeddings),
             )
-
-        if run_edges:
-            if not embeddings:
-                embeddings = fetch_embeddings_for_edges(
+            if embedding_config.snapshot_dir is not None:
+                sync_embeddings_snapshot(
                     conn,
+                    embedding_config.snapshot_dir,
                     doc_type=graph_config.doc_type,
                     model=embedding_config.model,
+                    run_id=run_id,
+                    known={record.doc_id: record for record in embeddings},
                 )
-            if full_rebuild:
-                clear_edges(conn, graph_config)
 
-            edges = build_similarity_edges(embeddings, graph_config)
+        if run_edges:
+            # Векторы этого запуска — только документы текущих заголовков (с учётом --limit-posts), а не все
+            # embeddings профиля: рёбра остальных документов такая сборка не трогает.
+            partial = bool(embeddings)
+            if embeddings:
+                store = as_embedding_store(embeddings)
+                # Дальше векторы живут только в общем float32-буфере.
+                embeddings = []
+            else:
+                store = load_embeddings_for_edges(
+                    conn,
+                    embedding_config,
+                    doc_type=graph_config.doc_type,
+                    run_id=run_id,
+                    quantization=graph_config.quantization if graph_config.method == "topk" else "none",
+                )
+            edges, edge_delta = sync_edges(
+                conn,
+                store,
+                graph_config=graph_config,
+                full_rebuild=full_rebuild,
+                run_id=run_id,
+                partial=partial,
+            )
             log_event(
                 run_id,
                 "knn",
                 "edges подготовлены",
                 edges=len(edges),
+                method=graph_config.method,
                 top_k=graph_config.k,
                 min_similarity=graph_config.min_similarity,
             )
-            edges_written = persist_edges(
-                conn,
-                edges,
-                graph_config=graph_config,
-                affected_doc_ids={record.doc_id for record in embeddings},
-                full_rebuild=full_rebuild,
-            )
             log_event(
                 run_id,
                 "persist",
                 "запись завершена",
                 embeddings_upserted=recalculated_count,
-                edges_upserted=edges_written,
+                edges_inserted=len(edge_delta.inserts),
+                edges_updated=len(edge_delta.updates),
+                edges_deleted=len(edge_delta.deletes),
             )
 
         conn.commit()
@@ -225,10 +491,39 @@ def build_provider(config: EmbeddingConfig) -> EmbeddingProvider:
     provider = config.provider.lower()
     if provider == "openai":
         api_key = os.getenv("OPENAI_API_KEY", "")
-        return OpenAIEmbeddingProvider(config.model, config.batch_size, api_key)
+        return OpenAIEmbeddingProvider(
+            config.model,
+            config.batch_size,
+            api_key,
+            rate_limiter=RateLimiter(config.requests_per_minute, config.tokens_per_minute),
+            dimensions=config.dimensions,
+            api_base=config.api_base,
+            encoding_format=config.encoding_format,
+        )
+    if provider == "local":
+        if not config.model.startswith(LOCAL_MODEL_PREFIX):
+            # model — часть ключа строки в publications.embeddings: локальные векторы не должны
+            # перезаписать векторы настоящей модели.
+            raise ValueError(
+                f"Для провайдера local имя модели должно начинаться с {LOCAL_MODEL_PREFIX!r}: {config.model}"
+            )
+        return LocalEmbeddingProvider(config.model, config.batch_size, dimensions=config.dimensions)
     raise ValueError(f"Неизвестный провайдер embeddings: {config.provider}")
 
 
+def build_embedding_cache(config: EmbeddingConfig) -> EmbeddingCache | None:
+    # Локальный провайдер считает быстрее, чем читает SQLite — кешировать нечего.
+    if config.cache_path is None or config.provider.lower() == "local":
+        return None
+    return EmbeddingCache(
+        config.cache_path,
+        provider=config.provider.lower(),
+        model=config.model,
+        dimensions=config.dimensions,
+        max_bytes=config.cache_max_mb * 1024 * 1024 if config.cache_max_mb else None,
+    )
+
+
 def validate_openai_key_format(api_key: str) -> None:
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY не задан")
@@ -241,13 +536,23 @@ def validate_openai_embeddings_access(
     model: str,
     batch_size: int,
     run_id: str,
+    provider: EmbeddingProvider | None = None,
+    api_base: str = OPENAI_API_BASE,
 ) -> None:
-    provider = OpenAIEmbeddingProvider(model=model, batch_size=batch_size, api_key=api_key)
+    ping_provider = provider or OpenAIEmbeddingProvider(
+        model=model,
+        batch_size=batch_size,
+        api_key=api_key,
+        api_base=api_base,
+    )
     try:
-        provider.embed_texts(["ping"])
+        ping_provider.embed_texts(["ping"])
     except Exception as exc:
         log_error(run_id, "preflight", exc)
         raise RuntimeError("Не удалось подтвердить доступ к embeddings OpenAI") from exc
+    finally:
+        if provider is None:
+            ping_provider.close()
 
 
 def normalize_text(text: str) -> str:
@@ -262,6 +567,8 @@ def prepare_text(
     max_chars: int | None,
     doc_id: str,
     run_id: str,
+    max_tokens: int | None = None,
+    counter: TokenCounter | None = None,
 ) -> str:
     prepared = normalize_text(text) if normalize else text
     if max_chars is not None and max_chars > 0 and len(prepared) > max_chars:
@@ -272,10 +579,57 @@ def prepare_text(
             doc_id=doc_id,
             max_chars=max_chars,
         )
-        return prepared[:max_chars]
+        prepared = prepared[:max_chars]
+    if max_tokens is not None and max_tokens > 0 and counter is not None:
+        truncated = counter.truncate(prepared, max_tokens)
+        if len(truncated) < len(prepared):
+            log_event(
+                run_id,
+                "extract",
+                "текст обрезан по лимиту токенов",
+                doc_id=doc_id,
+                max_tokens=max_tokens,
+                exact=counter.exact,
+            )
+            prepared = truncated
     return prepared
 
 
+def embedding_storage_columns(conn: psycopg2.extensions.connection) -> dict[str, str]:
+    columns = _storage_columns.get(conn)
+    if columns is None:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT attname
+                FROM pg_attribute
+                WHERE attrelid = 'publications.embeddings'::regclass
+                  AND NOT attisdropped
+                  AND attname = ANY(%s)
+                """,
+                (list(EMBEDDING_STORAGE_COLUMNS.values()),),
+            )
+            present = {row[0] for row in cur.fetchall()}
+        columns = {storage: column for storage, column in EMBEDDING_STORAGE_COLUMNS.items() if column in present}
+        _storage_columns[conn] = columns
+    return columns
+
+
+def require_embedding_storage(conn: psycopg2.extensions.connection, storage: str) -> None:
+    if storage not in embedding_storage_columns(conn):
+        raise ValueError(
+            f"Профиль хранения {storage} недоступен: в publications.embeddings нет колонки "
+            f"{EMBEDDING_STORAGE_COLUMNS[storage]} (нужен pgvector >= 0.7 и миграция 0012)"
+        )
+
+
+def stored_vector_sql(conn: psycopg2.extensions.connection) -> str:
+    columns = embedding_storage_columns(conn)
+    if "halfvec" not in columns:
+        return "embedding"
+    return "COALESCE(embedding, embedding_half::vector)"
+
+
 def fetch_existing_embeddings(
     conn: psycopg2.extensions.connection,
     doc_ids: list[str],
@@ -285,8 +639,8 @@ def fetch_existing_embeddings(
     if not doc_ids:
         return {}
 
-    query = """
-        SELECT doc_id::text, source_hash, embedding::text
+    query = f"""
+        SELECT doc_id::text, source_hash, input_hash, vector_send({stored_vector_sql(conn)})
         FROM publications.embeddings
         WHERE doc_type = %s AND model = %s AND doc_id = ANY(%s)
     """
@@ -295,12 +649,13 @@ def fetch_existing_embeddings(
         rows = cur.fetchall()
 
     records: dict[str, EmbeddingRecord] = {}
-    for doc_id, source_hash, embedding_text in rows:
-        vector = parse_pgvector_text(embedding_text)
+    for doc_id, source_hash, input_hash, embedding_raw in rows:
+        vector = decode_vector(embedding_raw)
         records[str(doc_id)] = EmbeddingRecord(
             doc_id=str(doc_id),
             source_hash=source_hash,
             vector=vector,
+            input_hash=input_hash,
         )
     return records
 
@@ -309,23 +664,166 @@ def fetch_embeddings_for_edges(
     conn: psycopg2.extensions.connection,
     doc_type: str,
     model: str,
-) -> list[EmbeddingRecord]:
+) -> EmbeddingStore:
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT count(*) FROM publications.embeddings WHERE doc_type = %s AND model = %s",
+            (doc_type, model),
+        )
+        size_hint = int(cur.fetchone()[0])
+    query = f"""
+        SELECT doc_id::text, source_hash, vector_send({stored_vector_sql(conn)})
+        FROM publications.embeddings
+        WHERE doc_type = %s AND model = %s
+    """
+    # Серверный курсор: bytea всех строк не держится в памяти одновременно, векторы сразу ложатся в буфер.
+    with conn.cursor(name="embeddings_for_edges") as cur:
+        cur.itersize = EMBEDDINGS_FETCH_ITERSIZE
+        cur.execute(query, (doc_type, model))
+        return EmbeddingStore.from_rows(
+            (
+                (str(doc_id), source_hash, decode_vector(embedding_raw))
+                for doc_id, source_hash, embedding_raw in cur
+            ),
+            size_hint=size_hint,
+        )
+
+
+def load_embeddings_for_edges(
+    conn: psycopg2.extensions.connection,
+    embedding_config: EmbeddingConfig,
+    doc_type: str,
+    run_id: str,
+    quantization: str = "none",
+) -> EmbeddingStore:
+    if embedding_config.snapshot_dir is None:
+        return fetch_embeddings_for_edges(conn, doc_type=doc_type, model=embedding_config.model)
+    snapshot = sync_embeddings_snapshot(
+        conn,
+        embedding_config.snapshot_dir,
+        doc_type=doc_type,
+        model=embedding_config.model,
+        run_id=run_id,
+    )
+    # Строки snapshot уже нормированы: хранилище читает mmap напрямую, файл не копируется в память.
+    store = EmbeddingStore(snapshot.doc_ids, snapshot.source_hashes, snapshot.matrix, normalized=True)
+    if quantization != "none" and len(store) > 0:
+        # Коды лежат рядом со snapshot: float-строки читаются только для запросов и пересчёта кандидатов.
+        snapshot_dir, model = embedding_config.snapshot_dir, embedding_config.model
+        store.quantized = load_codes(snapshot_dir, doc_type, model, quantization, snapshot)
+        if store.quantized is None:
+            store.quantized = QuantizedMatrix(snapshot.matrix, quantization)
+            write_codes(snapshot_dir, doc_type, model, store.quantized, snapshot)
+            log_event(run_id, "read", "квантованные коды snapshot обновлены", quantization=quantization)
+    return store
+
+
+def fetch_embeddings_fingerprint(
+    conn: psycopg2.extensions.connection,
+    doc_type: str,
+    model: str,
+) -> str:
     query = """
-        SELECT doc_id::text, source_hash, embedding::text
+        SELECT md5(COALESCE(string_agg(doc_id::text || ':' || source_hash, E'\\n' ORDER BY doc_id::text COLLATE "C"), ''))
         FROM publications.embeddings
         WHERE doc_type = %s AND model = %s
     """
     with conn.cursor() as cur:
         cur.execute(query, (doc_type, model))
-        rows = cur.fetchall()
-    return [
-        EmbeddingRecord(
-            doc_id=str(doc_id),
-            source_hash=source_hash,
-            vector=parse_pgvector_text(embedding_text),
+        return str(cur.fetchone()[0])
+
+
+def fetch_embedding_hashes(
+    conn: psycopg2.extensions.connection,
+    doc_type: str,
+    model: str,
+) -> dict[str, str]:
+    query = """
+        SELECT doc_id::text, source_hash
+        FROM publications.embeddings
+        WHERE doc_type = %s AND model = %s
+    """
+    with conn.cursor() as cur:
+        cur.execute(query, (doc_type, model))
+        return {str(doc_id): source_hash for doc_id, source_hash in cur.fetchall()}
+
+
+def sync_embeddings_snapshot(
+    conn: psycopg2.extensions.connection,
+    snapshot_dir: Path,
+    doc_type: str,
+    model: str,
+    run_id: str,
+    known: dict[str, EmbeddingRecord] | None = None,
+) -> EmbeddingSnapshot:
+    snapshot = load_snapshot(snapshot_dir, doc_type, model)
+    fingerprint = fetch_embeddings_fingerprint(conn, doc_type=doc_type, model=model)
+    if snapshot is not None and snapshot.fingerprint == fingerprint:
+        log_event(run_id, "read", "snapshot embeddings актуален", docs_count=len(snapshot.doc_ids))
+        return snapshot
+
+    hashes = fetch_embedding_hashes(conn, doc_type=doc_type, model=model)
+    reusable: dict[str, Sequence[float]] = {}
+    if snapshot is not None:
+        for row, (doc_id, source_hash) in enumerate(zip(snapshot.doc_ids, snapshot.source_hashes)):
+            if hashes.get(doc_id) == source_hash:
+                reusable[doc_id] = snapshot.matrix[row]
+    for doc_id, record in (known or {}).items():
+        if doc_id not in reusable and hashes.get(doc_id) == record.source_hash:
+            reusable[doc_id] = record.vector
+    fetched = fetch_existing_embeddings(
+        conn,
+        doc_ids=[doc_id for doc_id in hashes if doc_id not in reusable],
+        doc_type=doc_type,
+        model=model,
+    )
+
+    doc_ids = sorted(set(reusable) | set(fetched))
+    source_hashes = [fetched[doc_id].source_hash if doc_id in fetched else hashes[doc_id] for doc_id in doc_ids]
+    vectors = [fetched[doc_id].vector if doc_id in fetched else reusable[doc_id] for doc_id in doc_ids]
+    dims = len(vectors[0]) if vectors else 0
+    matrix = np.empty((len(doc_ids), dims), dtype=np.float32)
+    for row, vector in enumerate(vectors):
+        matrix[row] = vector
+    # Строки из прежнего snapshot уже нормированы, повторное деление на единичную норму их не меняет.
+    normalize_rows(matrix)
+
+    snapshot = write_snapshot(snapshot_dir, doc_type, model, doc_ids, source_hashes, matrix, normalized=True)
+    log_event(
+        run_id,
+        "persist",
+        "snapshot embeddings обновлён",
+        docs_count=len(doc_ids),
+        reused=len(doc_ids) - len(fetched),
+        fetched=len(fetched),
+        path=str(snapshot_dir),
+    )
+    return snapshot
+
+
+def embedding_content_hash(prepared_text: str, model: str, dimensions: int | None = None) -> str:
+    # Единственный хеш содержимого поста и ключ вектора в publications.embeddings.source_hash: подготовленный
+    # текст (после нормализации и обрезки) плюс модель и размерность. Правки frontmatter его не меняют.
+    profile = f"{model}@{dimensions}" if dimensions else model
+    return hashlib.sha256(f"{profile}\n{prepared_text}".encode("utf-8")).hexdigest()
+
+
+def embedding_input_hash(source_hash: str, config: EmbeddingConfig, exact_tokens: bool = True) -> str:
+    # Всё, от чего зависит подготовленный текст, кроме самого тела: при совпадении с input_hash строки
+    # текст можно не собирать. Меняется версия правил извлечения — пересобираются все тексты.
+    profile = "|".join(
+        str(value)
+        for value in (
+            EXTRACT_VERSION,
+            config.model,
+            config.dimensions,
+            config.normalize_text,
+            config.max_chars,
+            config.max_input_tokens,
+            exact_tokens,
         )
-        for doc_id, source_hash, embedding_text in rows
-    ]
+    )
+    return hashlib.sha256(f"{profile}\n{source_hash}".encode("utf-8")).hexdigest()
 
 
 def build_embeddings(
@@ -338,19 +836,72 @@ def build_embeddings(
     conn: psycopg2.extensions.connection,
     fail_fast: bool,
     run_id: str,
+    concurrency: int = 1,
+    retry: RetryPolicy = RetryPolicy(),
+    counter: TokenCounter | None = None,
+    max_batch_tokens: int | None = None,
+    cache: EmbeddingCache | None = None,
+    write_queue: int = 4,
+    dimensions: int | None = None,
+    storage: str = "vector",
+    input_hashes: dict[str, str] | None = None,
+    unchanged: Sequence[EmbeddingRecord] = (),
 ) -> tuple[list[EmbeddingRecord], int, int]:
+    input_hashes = input_hashes or {}
     to_update: list[PostExtracted] = []
-    embeddings: list[EmbeddingRecord] = []
-    reused_count = 0
+    embeddings: list[EmbeddingRecord] = list(unchanged)
+    reused_count = len(embeddings)
     recalculated_count = 0
 
+    rehashed: list[EmbeddingRecord] = []
     for post in posts:
         record = existing.get(post.id)
-        if record and record.source_hash == post.source_hash:
+        content_hash = embedding_content_hash(normalized_texts[post.id], model, dimensions)
+        input_hash = input_hashes.get(post.id)
+        if record and record.source_hash == content_hash and record.input_hash == input_hash:
             embeddings.append(record)
             reused_count += 1
             continue
+        if record and record.source_hash == content_hash:
+            # Подготовленный текст и профиль модели те же (правка frontmatter) — вектор валиден, меняется только
+            # input_hash. Строки под другим ключом (в том числе старые, по хешу всего файла) пересчитываются:
+            # совпадение файла не гарантирует тех же max_chars и нормализации.
+            rehashed.append(
+                EmbeddingRecord(doc_id=post.id, source_hash=content_hash, vector=record.vector, input_hash=input_hash)
+            )
+            continue
         to_update.append(post)
+    if rehashed:
+        upsert_embeddings(conn, rehashed, doc_type=doc_type, model=model, storage=storage)
+        embeddings.extend(rehashed)
+        reused_count += len(rehashed)
+        log_event(run_id, "embed", "ключи embeddings обновлены без пересчёта", docs=len(rehashed))
+    # В журнал запуска попадают только записанные в этом запуске строки; переиспользованные векторы
+    # не пишутся, иначе каждый запуск добавлял бы по строке на документ корпуса.
+    mark_embedding_docs(conn, run_id, (record.doc_id for record in rehashed))
+    conn.commit()
+
+    if cache is not None and to_update:
+        # Вектор того же текста уже оплачен — в этой или другой БД; провайдер не нужен.
+        cached = cache.get_many(text_key(normalized_texts[post.id]) for post in to_update)
+        cached_records = [
+            EmbeddingRecord(
+                doc_id=post.id,
+                source_hash=embedding_content_hash(normalized_texts[post.id], model, dimensions),
+                vector=vector,
+                input_hash=input_hashes.get(post.id),
+            )
+            for post in to_update
+            if (vector := cached.get(text_key(normalized_texts[post.id]))) is not None
+        ]
+        upsert_embeddings(conn, cached_records, doc_type=doc_type, model=model, storage=storage)
+        mark_embedding_docs(conn, run_id, (record.doc_id for record in cached_records))
+        conn.commit()
+        embeddings.extend(cached_records)
+        reused_count += len(cached_records)
+        cached_ids = {record.doc_id for record in cached_records}
+        to_update = [post for post in to_update if post.id not in cached_ids]
+        log_event(run_id, "embed", "embeddings из локального кеша", cached=len(cached_records), missing=len(to_update))
 
     recalculated_count += process_batches(
         provider,
@@ -362,6 +913,15 @@ def build_embeddings(
         model,
         fail_fast=fail_fast,
         run_id=run_id,
+        concurrency=concurrency,
+        retry=retry,
+        counter=counter,
+        max_batch_tokens=max_batch_tokens,
+        cache=cache,
+        write_queue=write_queue,
+        dimensions=dimensions,
+        storage=storage,
+        input_hashes=input_hashes,
     )
 
     return embeddings, reused_count, recalculated_count
@@ -377,132 +937,329 @@ def process_batches(
     model: str,
     fail_fast: bool,
     run_id: str,
+    concurrency: int = 1,
+    retry: RetryPolicy = RetryPolicy(),
+    counter: TokenCounter | None = None,
+    max_batch_tokens: int | None = None,
+    cache: EmbeddingCache | None = None,
+    write_queue: int = 4,
+    dimensions: int | None = None,
+    storage: str = "vector",
+    input_hashes: dict[str, str] | None = None,
 ) -> int:
+    input_hashes = input_hashes or {}
+    counter = counter or TokenCounter(model)
+    # Одинаковые тексты отправляются провайдеру один раз, вектор раздаётся всем их документам.
+    groups: dict[str, list[PostExtracted]] = {}
+    for post in posts:
+        groups.setdefault(text_key(normalized_texts[post.id]), []).append(post)
+    unique = [members[0] for members in groups.values()]
+    if len(unique) < len(posts):
+        log_event(run_id, "embed", "одинаковые тексты схлопнуты", docs=len(posts), unique=len(unique))
     recalculated_count = 0
-    batch_size = provider.batch_size
-    start = 0
-    while start < len(posts):
-        current_size = min(batch_size, len(posts) - start)
-        batch = posts[start : start + current_size]
-        try:
-            vectors = embed_with_retry(
-                provider,
-                [normalized_texts[item.id] for item in batch],
-                run_id=run_id,
-                doc_ids=[item.id for item in batch],
-                fail_fast=fail_fast,
-            )
-        except Exception as exc:
-            log_error(
-                run_id,
-                "embed",
-                exc,
-                doc_ids=[item.id for item in batch],
-            )
-            if fail_fast:
-                raise
-            if current_size <= 1:
-                raise
-            logger.warning("⚠️ Падение batch=%s, уменьшаем размер: %s", current_size, exc)
-            batch_size = max(1, current_size // 2)
-            continue
-
-        if len(vectors) != len(batch):
-            raise RuntimeError("Количество embeddings не совпадает с количеством документов")
-
-        updated_records = []
-        for post, vector in zip(batch, vectors, strict=True):
-            record = EmbeddingRecord(
-                doc_id=post.id,
-                source_hash=post.source_hash,
-                vector=vector,
-            )
-            embeddings.append(record)
-            updated_records.append(record)
-        recalculated_count += len(updated_records)
+    quarantined: list[tuple[str, str]] = []
+
+    def write(item: tuple[dict[str, list[float]], list[EmbeddingRecord]]) -> None:
+        vectors_by_key, records = item
+        if cache is not None:
+            cache.put_many(vectors_by_key)
+        upsert_embeddings(conn, records, doc_type=doc_type, model=model, storage=storage)
+        # Checkpoint: batch и отметка в журнале запуска фиксируются одной транзакцией.
+        mark_embedding_docs(conn, run_id, (record.doc_id for record in records))
+        conn.commit()
 
-        upsert_embeddings(
-            conn,
-            updated_records,
-            doc_type=doc_type,
-            model=model,
+    def quarantine(doc_id: str, exc: Exception) -> None:
+        key = text_key(normalized_texts[doc_id])
+        quarantined.extend((member.id, str(exc)) for member in groups[key])
+
+    sizer = AdaptiveBatchSize(provider.batch_size)
+    with BackgroundWriter(write, max_pending=write_queue) as writer:
+
+        async def commit(start: int, vectors: list[list[float] | None]) -> None:
+            nonlocal recalculated_count
+            batch = unique[start : start + len(vectors)]
+            done = [(post, vector) for post, vector in zip(batch, vectors, strict=True) if vector is not None]
+            keys = [text_key(normalized_texts[post.id]) for post, _ in done]
+            updated_records = [
+                EmbeddingRecord(
+                    doc_id=member.id,
+                    source_hash=embedding_content_hash(normalized_texts[member.id], model, dimensions),
+                    vector=vector,
+                    input_hash=input_hashes.get(member.id),
+                )
+                for key, (_, vector) in zip(keys, done, strict=True)
+                for member in groups[key]
+            ]
+            embeddings.extend(updated_records)
+            recalculated_count += len(updated_records)
+            item = ({key: vector for key, (_, vector) in zip(keys, done, strict=True)}, updated_records)
+            # Полная очередь записи ждёт в пуле потоков, а не в event loop: ответы продолжают приниматься,
+            # а новые batch-и не отправляются, пока окно embed_in_order занято.
+            await asyncio.get_running_loop().run_in_executor(None, writer.submit, item)
+
+        batches = embed_in_order(
+            provider,
+            [normalized_texts[post.id] for post in unique],
+            [post.id for post in unique],
+            commit,
+            concurrency=concurrency,
+            limiter=provider.rate_limiter,
+            retry=retry,
+            fail_fast=fail_fast,
+            run_id=run_id,
+            count_tokens=counter.count,
+            sizer=sizer,
+            max_batch_tokens=max_batch_tokens,
+            quarantine=quarantine,
+            # В памяти не больше concurrency + write_queue неотданных batch-ей и write_queue в очереди записи.
+            window=concurrency + write_queue,
         )
-        start += current_size
-
+    if quarantined:
+        quarantine_embedding_docs(conn, run_id, doc_type, model, quarantined)
+        log_event(
+            run_id,
+            "embed",
+            "документы в карантине, embeddings не рассчитаны",
+            docs=len(quarantined),
+            doc_ids=",".join(doc_id for doc_id, _ in quarantined[:10]),
+        )
+    if unique:
+        log_event(
+            run_id,
+            "embed",
+            "batch-и отправлены",
+            batches=batches,
+            batch_size_final=sizer.current,
+            exact_tokens=counter.exact,
+        )
+        log_event(run_id, "persist", "запись embeddings завершена", **writer.stats())
     return recalculated_count
 
 
-def embed_with_retry(
-    provider: EmbeddingProvider,
-    texts: Sequence[str],
-    run_id: str,
-    doc_ids: list[str],
-    fail_fast: bool,
-) -> list[list[float]]:
-    delays = (1, 2, 4)
-    for attempt, delay in enumerate(delays, start=1):
-        try:
-            return provider.embed_texts(texts)
-        except Exception as exc:
-            if attempt == len(delays):
-                raise
-            log_error(
-                run_id,
-                "embed",
-                exc,
-                doc_ids=doc_ids,
-                attempt=attempt,
-            )
-            if fail_fast:
-                raise
-            time_sleep(delay)
-    raise RuntimeError("Не удалось получить embeddings после повторов")
-
-
-def time_sleep(seconds: int) -> None:
-    import time
-
-    time.sleep(seconds)
-
-
 def upsert_embeddings(
     conn: psycopg2.extensions.connection,
     records: list[EmbeddingRecord],
     doc_type: str,
     model: str,
+    storage: str = "vector",
 ) -> None:
     if not records:
         return
 
-    values = [
-        (
-            record.doc_id,
-            doc_type,
-            model,
-            record.source_hash,
-            pgvector_literal(record.vector),
-        )
+    require_embedding_storage(conn, storage)
+    columns = embedding_storage_columns(conn)
+    column = columns[storage]
+    # Вектор пишется в колонку профиля хранения, колонка другого профиля очищается.
+    cleared = "".join(f"{name} = NULL,\n            " for name in columns.values() if name != column)
+    rows = (
+        (record.doc_id, doc_type, model, record.source_hash, record.input_hash, len(record.vector), record.vector)
         for record in records
-    ]
-    query = """
-        INSERT INTO publications.embeddings (doc_id, doc_type, model, source_hash, embedding, updated_at)
-        VALUES %s
+    )
+    query = f"""
+        INSERT INTO publications.embeddings (doc_id, doc_type, model, source_hash, input_hash, dims, {column}, updated_at)
+        SELECT doc_id, doc_type, model, source_hash, input_hash, dims, {column}, now()
+        FROM embeddings_staging
         ON CONFLICT (doc_id, doc_type, model)
         DO UPDATE SET
             source_hash = EXCLUDED.source_hash,
-            embedding = EXCLUDED.embedding,
-            updated_at = now()
+            input_hash = EXCLUDED.input_hash,
+            dims = EXCLUDED.dims,
+            {column} = EXCLUDED.{column},
+            {cleared}updated_at = now()
     """
     with conn.cursor() as cur:
-        psycopg2.extras.execute_values(
+        copy_to_staging(
             cur,
-            query,
-            values,
-            template="(%s, %s, %s, %s, %s::vector, now())",
+            "embeddings_staging",
+            (*EMBEDDINGS_STAGING_COLUMNS, (column, storage)),
+            rows,
         )
+        cur.execute(query)
+        cur.execute("DROP TABLE embeddings_staging")
+
+
+def as_embedding_store(embeddings: EmbeddingStore | Sequence[EmbeddingRecord]) -> EmbeddingStore:
+    if isinstance(embeddings, EmbeddingStore):
+        return embeddings
+    return EmbeddingStore.from_rows(
+        ((record.doc_id, record.source_hash, record.vector) for record in embeddings),
+        size_hint=len(embeddings),
+    )
 
 
 def build_similarity_edges(
+    embeddings: EmbeddingStore | Sequence[EmbeddingRecord],
+    graph_config: GraphConfig,
+    run_id: str | None = None,
+) -> list[tuple[str, str, float]]:
+    return edges_from_neighbour_lists(
+        build_neighbour_lists(embeddings, graph_config, run_id=run_id),
+        graph_config.k,
+    )
+
+
+def build_neighbour_lists(
+    embeddings: EmbeddingStore | Sequence[EmbeddingRecord],
+    graph_config: GraphConfig,
+    run_id: str | None = None,
+) -> dict[str, list[tuple[str, float]]]:
+    store = as_embedding_store(embeddings)
+    doc_ids = store.doc_ids
+    if graph_config.method == "topk" and graph_config.quantization != "none":
+        # Кандидаты по кодам, веса — по векторам хранилища.
+        neighbours, weights = quantized_topk_neighbours(
+            store.matrix,
+            graph_config.k,
+            graph_config.min_similarity,
+            kind=graph_config.quantization,
+            rescore=graph_config.rescore,
+            quantized=store.quantized,
+        )
+        if run_id is not None:
+            log_event(
+                run_id,
+                "knn",
+                "соседи найдены по квантованным векторам",
+                quantization=graph_config.quantization,
+                rescore=graph_config.rescore,
+                docs_count=len(doc_ids),
+            )
+    else:
+        neighbours, weights = compute_neighbours(store.matrix, graph_config, run_id=run_id)
+    return {
+        doc_id: neighbour_list(doc_ids, neighbours[row], weights[row])
+        for row, doc_id in enumerate(doc_ids)
+    }
+
+
+def neighbour_list(
+    doc_ids: list[str],
+    neighbours: np.ndarray,
+    weights: np.ndarray,
+) -> list[tuple[str, float]]:
+    items: list[tuple[str, float]] = []
+    for col, weight in zip(neighbours.tolist(), weights.tolist()):
+        if col < 0:
+            break
+        items.append((doc_ids[col], weight))
+    return items
+
+
+def edges_from_neighbour_lists(
+    neighbour_lists: dict[str, list[tuple[str, float]]],
+    k: int,
+) -> list[tuple[str, str, float]]:
+    normalized_edges: dict[tuple[str, str], float] = {}
+    for doc_id, items in neighbour_lists.items():
+        for other_id, weight in items:
+            source_id, target_id = sorted((doc_id, other_id))
+            current = normalized_edges.get((source_id, target_id))
+            normalized_edges[(source_id, target_id)] = max(current, weight) if current is not None else weight
+
+    pruned_edges = prune_edges(
+        [(a, b, weight) for (a, b), weight in normalized_edges.items()],
+        k,
+    )
+    return pruned_edges
+
+
+def update_neighbour_lists(
+    embeddings: EmbeddingStore | Sequence[EmbeddingRecord],
+    graph_config: GraphConfig,
+    edge_state: dict[str, tuple[str, list[tuple[str, float]]]],
+) -> tuple[dict[str, list[tuple[str, float]]], int] | None:
+    store = as_embedding_store(embeddings)
+    doc_ids = store.doc_ids
+    index = {doc_id: row for row, doc_id in enumerate(doc_ids)}
+    changed = [
+        doc_id
+        for doc_id, source_hash in zip(doc_ids, store.source_hashes)
+        if doc_id not in edge_state or edge_state[doc_id][0] != source_hash
+    ]
+    if len(changed) > INCREMENTAL_MAX_CHANGED_SHARE * len(doc_ids):
+        return None
+
+    stale = set(changed) | (set(edge_state) - set(index))
+    lists = {doc_id: edge_state[doc_id][1] for doc_id in doc_ids if doc_id not in stale}
+    if not stale:
+        return lists, 0
+
+    kk = min(graph_config.k, len(doc_ids) - 1)
+    thresholds = np.full(len(doc_ids), graph_config.min_similarity, dtype=np.float64)
+    for doc_id, items in lists.items():
+        if kk > 0 and len(items) >= kk:
+            thresholds[index[doc_id]] = max(graph_config.min_similarity, items[kk - 1][1])
+
+    matrix = store.matrix
+    rows = affected_rows(
+        matrix,
+        (index[doc_id] for doc_id in changed),
+        thresholds,
+        neighbour_rows=(
+            index[doc_id]
+            for doc_id, items in lists.items()
+            if any(other_id in stale for other_id, _ in items)
+        ),
+    )
+    neighbours, weights = parallel_topk_neighbours(
+        matrix,
+        graph_config.k,
+        graph_config.min_similarity,
+        workers=graph_config.workers,
+        rows=rows,
+    )
+    for position, row in enumerate(rows.tolist()):
+        lists[doc_ids[row]] = neighbour_list(doc_ids, neighbours[position], weights[position])
+    return {doc_id: lists[doc_id] for doc_id in doc_ids}, len(rows)
+
+
+def compute_neighbours(
+    matrix: np.ndarray,
+    graph_config: GraphConfig,
+    run_id: str | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    if graph_config.method == "topk":
+        return parallel_topk_neighbours(
+            matrix,
+            graph_config.k,
+            graph_config.min_similarity,
+            workers=graph_config.workers,
+        )
+    if graph_config.method != "hnsw":
+        raise ValueError(f"Неизвестный метод построения рёбер: {graph_config.method}")
+
+    if approximate_backend() != "hnswlib":
+        logger.warning("⚠️ hnswlib не установлен, method=hnsw использует поиск по разбиению на кластеры (~n·√n)")
+    neighbours, weights = approximate_neighbours(
+        matrix,
+        graph_config.k,
+        graph_config.min_similarity,
+        m=graph_config.hnsw_m,
+        ef_construction=graph_config.hnsw_ef_construction,
+        ef_search=graph_config.hnsw_ef_search,
+    )
+    if run_id is not None and graph_config.recall_sample > 0:
+        recall = neighbour_recall(
+            matrix,
+            neighbours,
+            graph_config.k,
+            graph_config.min_similarity,
+            sample_size=graph_config.recall_sample,
+        )
+        log_event(
+            run_id,
+            "knn",
+            "recall hnsw относительно точного topk",
+            backend=approximate_backend(),
+            recall=round(recall, 4),
+            sample=min(graph_config.recall_sample, matrix.shape[0]),
+            m=graph_config.hnsw_m,
+            ef_search=graph_config.hnsw_ef_search,
+        )
+    return neighbours, weights
+
+
+def build_similarity_edges_python(
     embeddings: list[EmbeddingRecord],
     graph_config: GraphConfig,
 ) -> list[tuple[str, str, float]]:
@@ -536,100 +1293,471 @@ def build_similarity_edges(
 
 
 def prune_edges(edges: list[tuple[str, str, float]], k: int) -> list[tuple[str, str, float]]:
-    adjacency: dict[str, list[tuple[str, str, float]]] = {}
-    for a, b, weight in edges:
-        adjacency.setdefault(a, []).append((a, b, weight))
-        adjacency.setdefault(b, []).append((a, b, weight))
-
-    active_edges = {(a, b, weight) for a, b, weight in edges}
-
-    updated = True
-    while updated:
-        updated = False
-        for node, node_edges in list(adjacency.items()):
-            if len(node_edges) <= k:
-                continue
-            node_edges.sort(key=lambda item: item[2])
-            while len(node_edges) > k:
-                edge = node_edges.pop(0)
-                if edge in active_edges:
-                    active_edges.remove(edge)
-                    updated = True
-                for endpoint in (edge[0], edge[1]):
-                    if endpoint == node:
-                        continue
-                    adjacency[endpoint] = [
-                        item for item in adjacency.get(endpoint, []) if item != edge
-                    ]
-    return list(active_edges)
+    # Степень каждой вершины ограничивается k: рёбра просматриваются один раз по возрастанию
+    # (weight, source_id, target_id) и удаляются, пока у любого конца степень больше k.
+    # При равных весах первым удаляется ребро с лексикографически меньшей парой (source_id, target_id).
+    # В кучу попадают только рёбра вершин с превышением степени: O(E log E).
+    unique_edges = list(dict.fromkeys(edges))
+    degree: dict[str, int] = {}
+    for a, b, _ in unique_edges:
+        degree[a] = degree.get(a, 0) + 1
+        degree[b] = degree.get(b, 0) + 1
+
+    heap = [(weight, a, b) for a, b, weight in unique_edges if degree[a] > k or degree[b] > k]
+    heapq.heapify(heap)
+    removed: set[tuple[str, str, float]] = set()
+    while heap:
+        weight, a, b = heapq.heappop(heap)
+        if degree[a] > k or degree[b] > k:
+            removed.add((a, b, weight))
+            degree[a] -= 1
+            degree[b] -= 1
+    return [edge for edge in unique_edges if edge not in removed]
+
+
+def sync_edges(
+    conn: psycopg2.extensions.connection,
+    embeddings: EmbeddingStore | Sequence[EmbeddingRecord],
+    graph_config: GraphConfig,
+    full_rebuild: bool,
+    run_id: str,
+    partial: bool = False,
+) -> tuple[list[tuple[str, str, float]], EdgeDelta]:
+    # partial: embeddings — подмножество документов профиля. Удаляются только рёбра и состояние документов
+    # этого подмножества, как при прежнем delete_edges_for_docs; остальные рёбра остаются как есть.
+    embeddings = as_embedding_store(embeddings)
+    scope = set(embeddings.doc_ids) if partial else None
+    edge_state = fetch_edge_state(conn, graph_config)
+    active_generation = fetch_active_generation(conn, graph_config)
+    stored_edges = (
+        fetch_stored_edges(conn, graph_config, active_generation) if active_generation is not None else {}
+    )
+    same_profile = all(
+        k == graph_config.k and min_similarity == graph_config.min_similarity
+        for _, k, min_similarity in stored_edges.values()
+    )
+
+    lists = None
+    if not full_rebuild and graph_config.method == "topk" and same_profile:
+        update = update_neighbour_lists(embeddings, graph_config, edge_state)
+        if update is not None:
+            lists, recomputed = update
+            log_event(
+                run_id,
+                "knn",
+                "инкрементальное обновление рёбер",
+                recomputed_docs=recomputed,
+                docs_count=len(embeddings),
+            )
+        else:
+            log_event(run_id, "knn", "изменена большая часть документов, рёбра пересчитываются полностью")
+
+    if lists is None:
+        lists = build_neighbour_lists(embeddings, graph_config, run_id=run_id)
+    edges = edges_from_neighbour_lists(lists, graph_config.k)
+    delta = diff_edges(stored_edges, edges, graph_config, scope=scope)
+    if active_generation is None or (full_rebuild and (delta.inserts or delta.updates or delta.deletes)):
+        # Полная пересборка не трогает строки активного поколения: новое поколение пишется рядом,
+        # читатели видят старый граф до переключения указателя. Рёбра вне подмножества переносятся как есть.
+        kept = (
+            [
+                (source_id, target_id, weight)
+                for (source_id, target_id), (weight, _, _) in stored_edges.items()
+                if source_id not in scope and target_id not in scope
+            ]
+            if scope is not None
+            else []
+        )
+        generation = create_edge_generation(conn, graph_config)
+        persist_edges(conn, EdgeDelta(inserts=edges + kept, updates=[], deletes=[]), graph_config, generation)
+        activate_edge_generation(conn, graph_config, generation, len(edges) + len(kept))
+        collected = collect_edge_generations(conn, graph_config)
+        log_event(
+            run_id,
+            "persist",
+            "опубликовано новое поколение рёбер",
+            generation=generation,
+            previous_generation=active_generation,
+            edges=len(edges),
+            collected_generations=collected,
+        )
+    else:
+        persist_edges(conn, delta, graph_config, active_generation)
+    sync_edge_state(conn, graph_config, embeddings, lists, edge_state, partial=partial)
+    return edges, delta
 
 
-def persist_edges(
+def fetch_active_generation(
+    conn: psycopg2.extensions.connection,
+    graph_config: GraphConfig,
+) -> int | None:
+    # FOR UPDATE сериализует параллельные сборки одного профиля; читателей указатель не блокирует.
+    query = """
+        SELECT generation
+        FROM publications.similarity_edge_active
+        WHERE doc_type = %s AND method = %s
+        FOR UPDATE
+    """
+    with conn.cursor() as cur:
+        cur.execute(query, (graph_config.doc_type, graph_config.method))
+        row = cur.fetchone()
+    return int(row[0]) if row else None
+
+
+def create_edge_generation(
     conn: psycopg2.extensions.connection,
-    edges: list[tuple[str, str, float]],
     graph_config: GraphConfig,
-    affected_doc_ids: set[str],
-    full_rebuild: bool,
 ) -> int:
-    if not full_rebuild and affected_doc_ids:
-        delete_edges_for_docs(conn, graph_config, affected_doc_ids)
+    query = """
+        INSERT INTO publications.similarity_edge_generations (doc_type, method, k, min_similarity)
+        VALUES (%s, %s, %s, %s)
+        RETURNING generation
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            query,
+            (graph_config.doc_type, graph_config.method, graph_config.k, graph_config.min_similarity),
+        )
+        return int(cur.fetchone()[0])
 
-    if not edges:
-        return 0
 
-    values = [
-        (
-            source_id,
-            target_id,
-            graph_config.doc_type,
-            weight,
-            graph_config.method,
-            graph_config.k,
-            graph_config.min_similarity,
+def activate_edge_generation(
+    conn: psycopg2.extensions.connection,
+    graph_config: GraphConfig,
+    generation: int,
+    edges_count: int,
+) -> None:
+    profile = (graph_config.doc_type, graph_config.method)
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE publications.similarity_edge_generations
+            SET status = 'retired'
+            WHERE doc_type = %s AND method = %s AND status = 'active'
+            """,
+            profile,
         )
-        for source_id, target_id, weight in edges
-    ]
+        cur.execute(
+            """
+            UPDATE publications.similarity_edge_generations
+            SET status = 'active', edges_count = %s, activated_at = now()
+            WHERE doc_type = %s AND method = %s AND generation = %s
+            """,
+            (edges_count, *profile, generation),
+        )
+        cur.execute(
+            """
+            INSERT INTO publications.similarity_edge_active (doc_type, method, generation)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (doc_type, method)
+            DO UPDATE SET generation = EXCLUDED.generation, switched_at = now()
+            """,
+            (*profile, generation),
+        )
+
+
+def collect_edge_generations(
+    conn: psycopg2.extensions.connection,
+    graph_config: GraphConfig,
+) -> int:
+    # Кроме активного хранится keep_generations - 1 предыдущих поколений — цели для отката.
+    profile = (graph_config.doc_type, graph_config.method)
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT generation
+            FROM publications.similarity_edge_generations
+            WHERE doc_type = %s AND method = %s AND status <> 'active'
+            ORDER BY generation DESC
+            OFFSET %s
+            """,
+            (*profile, max(0, graph_config.keep_generations - 1)),
+        )
+        doomed = [int(row[0]) for row in cur.fetchall()]
+        if not doomed:
+            return 0
+        cur.execute(
+            """
+            DELETE FROM publications.similarity_edges
+            WHERE doc_type = %s AND method = %s AND generation = ANY(%s)
+            """,
+            (*profile, doomed),
+        )
+        cur.execute(
+            """
+            DELETE FROM publications.similarity_edge_generations
+            WHERE doc_type = %s AND method = %s AND generation = ANY(%s)
+            """,
+            (*profile, doomed),
+        )
+    return len(doomed)
+
+
+def rollback_edge_generation(
+    conn: psycopg2.extensions.connection,
+    graph_config: GraphConfig,
+) -> tuple[int, int]:
+    current = fetch_active_generation(conn, graph_config)
+    if current is None:
+        raise RuntimeError(f"Нет активного поколения рёбер: {graph_config.doc_type}/{graph_config.method}")
+    profile = (graph_config.doc_type, graph_config.method)
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT generation
+            FROM publications.similarity_edge_generations
+            WHERE doc_type = %s AND method = %s AND status = 'retired'
+            ORDER BY generation DESC
+            LIMIT 1
+            """,
+            profile,
+        )
+        row = cur.fetchone()
+        if row is None:
+            raise RuntimeError(f"Нет предыдущего поколения рёбер для отката: {graph_config.doc_type}/{graph_config.method}")
+        previous = int(row[0])
+        cur.execute(
+            """
+            UPDATE publications.similarity_edge_generations
+            SET status = CASE WHEN generation = %s THEN 'active' ELSE 'rolled_back' END,
+                activated_at = CASE WHEN generation = %s THEN now() ELSE activated_at END
+            WHERE doc_type = %s AND method = %s AND generation IN (%s, %s)
+            """,
+            (previous, previous, *profile, previous, current),
+        )
+        cur.execute(
+            """
+            UPDATE publications.similarity_edge_active
+            SET generation = %s, switched_at = now()
+            WHERE doc_type = %s AND method = %s
+            """,
+            (previous, *profile),
+        )
+        # Состояние инкрементального пересчёта описывает откатываемую сборку — следующий запуск пересчитает всё.
+        cur.execute(
+            """
+            DELETE FROM publications.similarity_edge_state
+            WHERE doc_type = %s AND method = %s
+            """,
+            profile,
+        )
+    return current, previous
+
+
+def fetch_stored_edges(
+    conn: psycopg2.extensions.connection,
+    graph_config: GraphConfig,
+    generation: int,
+) -> dict[tuple[str, str], tuple[float, int, float]]:
     query = """
-        INSERT INTO publications.similarity_edges
-          (source_id, target_id, doc_type, weight, method, k, min_similarity)
-        VALUES %s
-        ON CONFLICT (source_id, target_id, doc_type, method)
-        DO UPDATE SET
-          weight = EXCLUDED.weight,
-          k = EXCLUDED.k,
-          min_similarity = EXCLUDED.min_similarity,
-          updated_at = now()
+        SELECT source_id, target_id, weight, k, min_similarity
+        FROM publications.similarity_edges
+        WHERE doc_type = %s AND method = %s AND generation = %s
     """
     with conn.cursor() as cur:
-        psycopg2.extras.execute_values(cur, query, values)
-    return len(values)
+        cur.execute(query, (graph_config.doc_type, graph_config.method, generation))
+        rows = cur.fetchall()
+    return {
+        (str(source_id), str(target_id)): (float(weight), int(k), float(min_similarity))
+        for source_id, target_id, weight, k, min_similarity in rows
+    }
+
 
+def diff_edges(
+    stored_edges: dict[tuple[str, str], tuple[float, int, float]],
+    edges: list[tuple[str, str, float]],
+    graph_config: GraphConfig,
+    scope: set[str] | None = None,
+) -> EdgeDelta:
+    # Вес считается изменившимся только при отличии больше weight_epsilon:
+    # шум последних разрядов float после пересчёта не должен переписывать строки.
+    # scope — пересобранные документы: удаляются только рёбра, у которых хотя бы один конец в нём.
+    inserts: list[tuple[str, str, float]] = []
+    updates: list[tuple[str, str, float]] = []
+    seen: set[tuple[str, str]] = set()
+    for source_id, target_id, weight in edges:
+        key = (source_id, target_id)
+        seen.add(key)
+        stored = stored_edges.get(key)
+        if stored is None:
+            inserts.append((source_id, target_id, weight))
+            continue
+        stored_weight, k, min_similarity = stored
+        if (
+            abs(stored_weight - weight) > graph_config.weight_epsilon
+            or k != graph_config.k
+            or min_similarity != graph_config.min_similarity
+        ):
+            updates.append((source_id, target_id, weight))
+    deletes = [
+        key
+        for key in stored_edges
+        if key not in seen and (scope is None or key[0] in scope or key[1] in scope)
+    ]
+    return EdgeDelta(inserts=inserts, updates=updates, deletes=deletes)
 
-def delete_edges_for_docs(
+
+def same_neighbours(
+    left: list[tuple[str, float]],
+    right: list[tuple[str, float]],
+    epsilon: float,
+) -> bool:
+    return len(left) == len(right) and all(
+        left_id == right_id and abs(left_weight - right_weight) <= epsilon
+        for (left_id, left_weight), (right_id, right_weight) in zip(left, right)
+    )
+
+
+def fetch_edge_state(
     conn: psycopg2.extensions.connection,
     graph_config: GraphConfig,
-    doc_ids: set[str],
-) -> None:
+) -> dict[str, tuple[str, list[tuple[str, float]]]]:
     query = """
-        DELETE FROM publications.similarity_edges
-        WHERE doc_type = %s
-          AND method = %s
-          AND (source_id = ANY(%s) OR target_id = ANY(%s))
+        SELECT doc_id, source_hash, neighbour_ids, neighbour_weights
+        FROM publications.similarity_edge_state
+        WHERE doc_type = %s AND method = %s AND k = %s AND min_similarity = %s
     """
     with conn.cursor() as cur:
-        cur.execute(query, (graph_config.doc_type, graph_config.method, list(doc_ids), list(doc_ids)))
+        cur.execute(
+            query,
+            (graph_config.doc_type, graph_config.method, graph_config.k, graph_config.min_similarity),
+        )
+        rows = cur.fetchall()
+    return {
+        str(doc_id): (source_hash, list(zip(neighbour_ids, neighbour_weights, strict=True)))
+        for doc_id, source_hash, neighbour_ids, neighbour_weights in rows
+    }
+
+
+def sync_edge_state(
+    conn: psycopg2.extensions.connection,
+    graph_config: GraphConfig,
+    embeddings: EmbeddingStore,
+    neighbour_lists: dict[str, list[tuple[str, float]]],
+    edge_state: dict[str, tuple[str, list[tuple[str, float]]]],
+    partial: bool = False,
+) -> None:
+    changed = [
+        (
+            doc_id,
+            graph_config.doc_type,
+            graph_config.method,
+            graph_config.k,
+            graph_config.min_similarity,
+            source_hash,
+            [other_id for other_id, _ in neighbour_lists[doc_id]],
+            [weight for _, weight in neighbour_lists[doc_id]],
+        )
+        for doc_id, source_hash in zip(embeddings.doc_ids, embeddings.source_hashes)
+        if doc_id not in edge_state
+        or edge_state[doc_id][0] != source_hash
+        or not same_neighbours(
+            edge_state[doc_id][1],
+            neighbour_lists[doc_id],
+            graph_config.weight_epsilon,
+        )
+    ]
+    current_ids = set(embeddings.doc_ids)
+    # Отсутствие документа в неполном наборе не значит, что он удалён: его состояние сохраняется.
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            DELETE FROM publications.similarity_edge_state
+            WHERE doc_type = %s
+              AND method = %s
+              AND ((NOT %s AND NOT (doc_id = ANY(%s))) OR k <> %s OR min_similarity <> %s)
+            """,
+            (
+                graph_config.doc_type,
+                graph_config.method,
+                partial,
+                list(current_ids),
+                graph_config.k,
+                graph_config.min_similarity,
+            ),
+        )
+        if changed:
+            psycopg2.extras.execute_values(
+                cur,
+                """
+                INSERT INTO publications.similarity_edge_state
+                  (doc_id, doc_type, method, k, min_similarity, source_hash, neighbour_ids, neighbour_weights)
+                VALUES %s
+                ON CONFLICT (doc_id, doc_type, method)
+                DO UPDATE SET
+                  k = EXCLUDED.k,
+                  min_similarity = EXCLUDED.min_similarity,
+                  source_hash = EXCLUDED.source_hash,
+                  neighbour_ids = EXCLUDED.neighbour_ids,
+                  neighbour_weights = EXCLUDED.neighbour_weights,
+                  updated_at = now()
+                """,
+                changed,
+            )
 
 
-def clear_edges(
+def persist_edges(
+    conn: psycopg2.extensions.connection,
+    delta: EdgeDelta,
+    graph_config: GraphConfig,
+    generation: int,
+) -> int:
+    delete_edge_pairs(conn, graph_config, generation, delta.deletes)
+    upserts = delta.inserts + delta.updates
+    if upserts:
+        rows = (
+            (
+                source_id,
+                target_id,
+                graph_config.doc_type,
+                weight,
+                graph_config.method,
+                graph_config.k,
+                graph_config.min_similarity,
+                generation,
+            )
+            for source_id, target_id, weight in upserts
+        )
+        query = """
+            INSERT INTO publications.similarity_edges
+              (source_id, target_id, doc_type, weight, method, k, min_similarity, generation)
+            SELECT source_id, target_id, doc_type, weight, method, k, min_similarity, generation
+            FROM similarity_edges_staging
+            ON CONFLICT (source_id, target_id, doc_type, method, generation)
+            DO UPDATE SET
+              weight = EXCLUDED.weight,
+              k = EXCLUDED.k,
+              min_similarity = EXCLUDED.min_similarity,
+              updated_at = now()
+        """
+        with conn.cursor() as cur:
+            copy_to_staging(cur, "similarity_edges_staging", EDGES_STAGING_COLUMNS, rows)
+            cur.execute(query)
+            cur.execute("DROP TABLE similarity_edges_staging")
+    return len(delta.deletes) + len(upserts)
+
+
+def delete_edge_pairs(
     conn: psycopg2.extensions.connection,
     graph_config: GraphConfig,
+    generation: int,
+    pairs: list[tuple[str, str]],
 ) -> None:
+    if not pairs:
+        return
     query = """
-        DELETE FROM publications.similarity_edges
-        WHERE doc_type = %s AND method = %s
+        DELETE FROM publications.similarity_edges e
+        USING similarity_edges_gone gone
+        WHERE e.source_id = gone.source_id
+          AND e.target_id = gone.target_id
+          AND e.doc_type = %s
+          AND e.method = %s
+          AND e.generation = %s
     """
     with conn.cursor() as cur:
-        cur.execute(query, (graph_config.doc_type, graph_config.method))
+        copy_to_staging(cur, "similarity_edges_gone", [("source_id", "text"), ("target_id", "text")], pairs)
+        cur.execute(query, (graph_config.doc_type, graph_config.method, generation))
+        cur.execute("DROP TABLE similarity_edges_gone")
 
 
 def cosine_similarity(vec_a: list[float], vec_b: list[float]) -> float:
@@ -643,24 +1771,6 @@ def normalize_vector(vec: list[float]) -> list[float]:
     return [x / norm for x in vec]
 
 
-def parse_pgvector_text(raw: str) -> list[float]:
-    cleaned = raw.strip().strip("[]")
-    if not cleaned:
-        return []
-    return [float(value) for value in cleaned.split(",")]
-
-
-def pgvector_literal(vector: list[float]) -> str:
-    return "[" + ", ".join(f"{value:.8f}" for value in vector) + "]"
-
-
-def chunked(items: Sequence[PostExtracted], size: int) -> Iterable[Sequence[PostExtracted]]:
-    if size <= 0:
-        raise ValueError("Размер batch должен быть больше нуля")
-    for idx in range(0, len(items), size):
-        yield items[idx : idx + size]
-
-
 def build_dsn() -> str:
     if os.getenv("DATABASE_URL"):
         return os.environ["DATABASE_URL"]
@@ -680,8 +1790,16 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--provider", type=str, default=None)
     parser.add_argument("--batch-size", type=int, default=None)
     parser.add_argument("--max-chars", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--resume", type=str, default=None, metavar="RUN_ID")
     parser.add_argument("--k", type=int, default=None)
     parser.add_argument("--min-similarity", type=float, default=None)
+    parser.add_argument("--method", type=str, choices=GRAPH_METHODS, default=None)
+    parser.add_argument("--quantization", type=str, choices=QUANTIZATIONS, default=None)
+    parser.add_argument("--dimensions", type=int, default=None)
+    parser.add_argument("--api-base", type=str, default=None)
+    parser.add_argument("--workers", type=int, default=None)
     parser.add_argument("--limit-posts", type=int, default=None)
     parser.add_argument("--limit", type=int, default=None)
     parser.add_argument("--mode", type=str, choices=("incremental", "full"), default=None)
@@ -713,41 +1831,55 @@ def main() -> None:
     embedding_config = apply_cli_embeddings(pipeline_config.embeddings, args)
     graph_config = apply_cli_graph(pipeline_config.graph, args)
     execution_config = apply_cli_execution(pipeline_config.execution, args)
-    extract_config = pipeline_config.extract
+    extract_config = apply_cli_extract(pipeline_config.extract, args)
 
-    run_id = uuid.uuid4().hex[:8]
+    run_id = args.resume or uuid.uuid4().hex[:8]
     log_event(
         run_id,
         "start",
         "запуск пайплайна",
         model=embedding_config.model,
+        method=graph_config.method,
         top_k=graph_config.k,
         min_similarity=graph_config.min_similarity,
         mode=execution_config.mode,
         prefer_channel=extract_config.prefer_channel,
     )
 
-    preflight(
-        run_id=run_id,
-        config_path=config_path,
-        db_config=DbConfig(dsn=build_dsn()),
-        embedding_config=embedding_config,
-        graph_config=graph_config,
-        execution_config=execution_config,
-        extract_config=extract_config,
-        source_root=source_root,
-    )
-
-    run_pipeline(
-        source_root=source_root,
-        db_config=DbConfig(dsn=build_dsn()),
-        embedding_config=embedding_config,
-        graph_config=graph_config,
-        execution_config=execution_config,
-        extract_config=extract_config,
-        full_rebuild=args.full_rebuild or args.full,
-        run_id=run_id,
+    provider = (
+        build_provider(embedding_config)
+        if not execution_config.dry_run
+        and (embedding_config.provider.lower() != "openai" or os.getenv("OPENAI_API_KEY"))
+        else None
     )
+    try:
+        preflight(
+            run_id=run_id,
+            config_path=config_path,
+            db_config=DbConfig(dsn=build_dsn()),
+            embedding_config=embedding_config,
+            graph_config=graph_config,
+            execution_config=execution_config,
+            extract_config=extract_config,
+            source_root=source_root,
+            provider=provider,
+        )
+
+        run_pipeline(
+            source_root=source_root,
+            db_config=DbConfig(dsn=build_dsn()),
+            embedding_config=embedding_config,
+            graph_config=graph_config,
+            execution_config=execution_config,
+            extract_config=extract_config,
+            full_rebuild=args.full_rebuild or args.full,
+            run_id=run_id,
+            provider=provider,
+            resume=args.resume is not None,
+        )
+    finally:
+        if provider is not None:
+            provider.close()
 
 
 def load_config(path: Path) -> PipelineConfig:
@@ -774,14 +1906,73 @@ def load_config(path: Path) -> PipelineConfig:
             if embeddings_data.get("max_chars") is not None
             else (int(os.getenv("EMBEDDINGS_MAX_CHARS")) if os.getenv("EMBEDDINGS_MAX_CHARS") else None)
         ),
+        max_input_tokens=optional_int(
+            embeddings_data.get("max_input_tokens"),
+            os.getenv("EMBEDDINGS_MAX_INPUT_TOKENS") or "8191",
+        ),
+        max_batch_tokens=optional_int(
+            embeddings_data.get("max_batch_tokens"),
+            os.getenv("EMBEDDINGS_MAX_BATCH_TOKENS"),
+        ),
+        cache_path=resolve_config_path(
+            path,
+            embeddings_data.get("cache_path") or os.getenv("EMBEDDINGS_CACHE_PATH"),
+        ),
+        cache_max_mb=optional_int(embeddings_data.get("cache_max_mb"), os.getenv("EMBEDDINGS_CACHE_MAX_MB")),
+        snapshot_dir=resolve_config_path(
+            path,
+            embeddings_data.get("snapshot_dir") or os.getenv("EMBEDDINGS_SNAPSHOT_DIR"),
+        ),
+        concurrency=int(embeddings_data.get("concurrency") or os.getenv("EMBEDDINGS_CONCURRENCY") or 4),
+        write_queue=int(embeddings_data.get("write_queue") or os.getenv("EMBEDDINGS_WRITE_QUEUE") or 4),
+        requests_per_minute=optional_int(
+            embeddings_data.get("requests_per_minute"),
+            os.getenv("EMBEDDINGS_REQUESTS_PER_MINUTE"),
+        ),
+        tokens_per_minute=optional_int(
+            embeddings_data.get("tokens_per_minute"),
+            os.getenv("EMBEDDINGS_TOKENS_PER_MINUTE"),
+        ),
+        max_retries=int(embeddings_data.get("max_retries") or os.getenv("EMBEDDINGS_MAX_RETRIES") or 5),
+        dimensions=optional_int(embeddings_data.get("dimensions"), os.getenv("EMBEDDINGS_DIMENSIONS")),
+        storage=str(embeddings_data.get("storage") or os.getenv("EMBEDDINGS_STORAGE") or "vector"),
+        api_base=str(embeddings_data.get("api_base") or os.getenv("EMBEDDINGS_API_BASE") or OPENAI_API_BASE),
+        encoding_format=str(
+            embeddings_data.get("encoding_format") or os.getenv("EMBEDDINGS_ENCODING_FORMAT") or "base64"
+        ),
     )
+    if embeddings.storage not in EMBEDDING_STORAGES:
+        raise ValueError(f"Неизвестный профиль хранения embeddings: {embeddings.storage}")
     graph = GraphConfig(
         method=str(graph_data.get("method") or os.getenv("GRAPH_METHOD") or "topk"),
         k=int(graph_data.get("top_k") or os.getenv("GRAPH_TOP_K") or 8),
         min_similarity=float(
             graph_data.get("min_similarity") or os.getenv("GRAPH_MIN_SIMILARITY") or 0.75
         ),
+        hnsw_m=int(graph_data.get("hnsw_m") or os.getenv("GRAPH_HNSW_M") or 16),
+        hnsw_ef_construction=int(
+            graph_data.get("hnsw_ef_construction") or os.getenv("GRAPH_HNSW_EF_CONSTRUCTION") or 100
+        ),
+        hnsw_ef_search=int(graph_data.get("hnsw_ef_search") or os.getenv("GRAPH_HNSW_EF_SEARCH") or 64),
+        recall_sample=int(
+            graph_data.get("recall_sample")
+            if graph_data.get("recall_sample") is not None
+            else os.getenv("GRAPH_RECALL_SAMPLE") or 200
+        ),
+        workers=int(graph_data.get("workers") or os.getenv("GRAPH_WORKERS") or 1),
+        weight_epsilon=float(
+            graph_data.get("weight_epsilon")
+            if graph_data.get("weight_epsilon") is not None
+            else os.getenv("GRAPH_WEIGHT_EPSILON") or 1e-6
+        ),
+        keep_generations=int(graph_data.get("keep_generations") or os.getenv("GRAPH_KEEP_GENERATIONS") or 2),
+        quantization=str(graph_data.get("quantization") or os.getenv("GRAPH_QUANTIZATION") or "none"),
+        rescore=int(graph_data.get("rescore") or os.getenv("GRAPH_RESCORE") or 4),
     )
+    if graph.method not in GRAPH_METHODS:
+        raise ValueError(f"Неизвестный метод построения рёбер: {graph.method}")
+    if graph.quantization not in QUANTIZATIONS:
+        raise ValueError(f"Неизвестный профиль квантования: {graph.quantization}")
     execution = ExecutionConfig(
         mode=str(execution_data.get("mode") or os.getenv("EXECUTION_MODE") or "incremental"),
         limit_posts=(
@@ -810,7 +2001,11 @@ def load_config(path: Path) -> PipelineConfig:
             str(extract_data.get("prefer_channel"))
             if extract_data.get("prefer_channel") is not None
             else os.getenv("EXTRACT_PREFER_CHANNEL")
-        )
+        ),
+        cache_path=resolve_config_path(
+            path,
+            extract_data.get("cache_path") or os.getenv("EXTRACT_CACHE_PATH"),
+        ),
     )
     return PipelineConfig(
         embeddings=embeddings,
@@ -820,6 +2015,26 @@ def load_config(path: Path) -> PipelineConfig:
     )
 
 
+def optional_int(value: object, env_value: str | None) -> int | None:
+    if value is not None:
+        return int(value)
+    return int(env_value) if env_value else None
+
+
+def resolve_config_path(config_path: Path, value: str | None) -> Path | None:
+    if not value:
+        return None
+    candidate = Path(value)
+    return candidate if candidate.is_absolute() else config_path.resolve().parent / candidate
+
+
+def apply_cli_extract(config: ExtractConfig, args: argparse.Namespace) -> ExtractConfig:
+    return ExtractConfig(
+        prefer_channel=config.prefer_channel,
+        cache_path=None if getattr(args, "no_cache", False) else config.cache_path,
+    )
+
+
 def apply_cli_embeddings(config: EmbeddingConfig, args: argparse.Namespace) -> EmbeddingConfig:
     return EmbeddingConfig(
         provider=args.provider or config.provider,
@@ -827,14 +2042,38 @@ def apply_cli_embeddings(config: EmbeddingConfig, args: argparse.Namespace) -> E
         batch_size=args.batch_size or config.batch_size,
         normalize_text=config.normalize_text,
         max_chars=args.max_chars if args.max_chars is not None else config.max_chars,
+        max_input_tokens=config.max_input_tokens,
+        max_batch_tokens=config.max_batch_tokens,
+        cache_path=None if getattr(args, "no_cache", False) else config.cache_path,
+        cache_max_mb=config.cache_max_mb,
+        snapshot_dir=config.snapshot_dir,
+        concurrency=getattr(args, "concurrency", None) or config.concurrency,
+        write_queue=config.write_queue,
+        requests_per_minute=config.requests_per_minute,
+        tokens_per_minute=config.tokens_per_minute,
+        max_retries=config.max_retries,
+        dimensions=getattr(args, "dimensions", None) or config.dimensions,
+        storage=config.storage,
+        api_base=getattr(args, "api_base", None) or config.api_base,
+        encoding_format=config.encoding_format,
     )
 
 
 def apply_cli_graph(config: GraphConfig, args: argparse.Namespace) -> GraphConfig:
     return GraphConfig(
-        method=config.method,
+        method=getattr(args, "method", None) or config.method,
         k=args.k or config.k,
         min_similarity=args.min_similarity or config.min_similarity,
+        doc_type=config.doc_type,
+        hnsw_m=config.hnsw_m,
+        hnsw_ef_construction=config.hnsw_ef_construction,
+        hnsw_ef_search=config.hnsw_ef_search,
+        recall_sample=config.recall_sample,
+        workers=getattr(args, "workers", None) or config.workers,
+        weight_epsilon=config.weight_epsilon,
+        keep_generations=config.keep_generations,
+        quantization=getattr(args, "quantization", None) or config.quantization,
+        rescore=config.rescore,
     )
 
 
@@ -853,7 +2092,7 @@ def apply_cli_execution(config: ExecutionConfig, args: argparse.Namespace) -> Ex
     )
 
 
-def apply_limit(posts: list[PostExtracted], limit: int | None) -> list[PostExtracted]:
+def apply_limit(posts: list[PostHeader], limit: int | None) -> list[PostHeader]:
     if limit is None or limit <= 0:
         return posts
     return posts[:limit]
@@ -868,6 +2107,7 @@ def preflight(
     execution_config: ExecutionConfig,
     extract_config: ExtractConfig,
     source_root: Path,
+    provider: EmbeddingProvider | None = None,
 ) -> None:
     try:
         if not config_path.exists():
@@ -903,9 +2143,16 @@ def preflight(
                 model=embedding_config.model,
                 batch_size=embedding_config.batch_size,
                 run_id=run_id,
+                provider=provider,
+                api_base=embedding_config.api_base,
             )
 
-        posts = extract_publish_posts(source_root, prefer_channel=extract_config.prefer_channel)
+        with open_extract_cache(extract_config.cache_path) as extract_cache:
+            posts = scan_publish_posts(
+                source_root,
+                prefer_channel=extract_config.prefer_channel,
+                cache=extract_cache,
+            )
         posts = apply_limit(posts, execution_config.limit_posts)
         if len(posts) < execution_config.min_posts:
             raise RuntimeError(
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import numpy as np
+
+from knowledge_core.ingest_pipeline.graph_builder.similarity import SIMILARITY_BLOCK_BYTES, block_rows_for
+
+QUANTIZATIONS = ("none", "int8", "binary")
+
+# Сумма произведений кодов — целое число; пока оно меньше 2**24, float32-GEMM считает его точно,
+# как int32-накопление, но через BLAS (целочисленный matmul в numpy идёт без BLAS и на порядок медленнее).
+FLOAT32_EXACT_INTEGER = 2**24
+# Бюджет на временные копии: распакованные блоки кодов и float-строки кандидатов для пересчёта.
+WORK_BLOCK_BYTES = 32 * 1024 * 1024
+
+
+class QuantizedMatrix:
+    # Коды вместо float-матрицы: int8 — 1 байт на измерение (4× меньше float32),
+    # binary — 1 бит (32× меньше). Строки матрицы нормированы (EmbeddingStore).
+    def __init__(self, matrix: np.ndarray, kind: str, block_bytes: int = SIMILARITY_BLOCK_BYTES) -> None:
+        if kind not in ("int8", "binary"):
+            raise ValueError(f"Неизвестный профиль квантования: {kind}")
+        self.kind = kind
+        self.size, self.dims = matrix.shape
+        if kind == "int8":
+            self.codes = np.zeros((self.size, self.dims), dtype=np.int8)
+            self.scales = np.zeros(self.size, dtype=np.float32)
+            peak_product = self.dims * 127 * 127
+        else:
+            self.codes = np.zeros((self.size, (self.dims + 7) // 8), dtype=np.uint8)
+            self.scales = np.ones(self.size, dtype=np.float32)
+            peak_product = self.dims
+        self.accumulator = np.dtype(np.float32 if peak_product < FLOAT32_EXACT_INTEGER else np.float64)
+
+        step = block_rows_for(self.dims, np.dtype(np.float32).itemsize, block_bytes)
+        for start in range(0, self.size, step):
+            rows = slice(start, start + step)
+            if kind == "binary":
+                self.codes[rows] = np.packbits(matrix[rows] > 0, axis=1)
+                continue
+            peak = np.abs(matrix[rows]).max(axis=1) if self.dims else np.zeros(0, dtype=np.float32)
+            scales = (peak / 127.0).astype(np.float32)
+            self.scales[rows] = scales
+            safe = np.where(scales > 0, scales, 1.0)
+            self.codes[rows] = np.rint(matrix[rows] / safe[:, None]).astype(np.int8)
+
+    @classmethod
+    def from_codes(cls, kind: str, dims: int, codes: np.ndarray, scales: np.ndarray) -> QuantizedMatrix:
+        # Коды, сохранённые рядом со snapshot: float-матрица для их построения не читается.
+        quantized = cls(np.zeros((0, dims), dtype=np.float32), kind)
+        quantized.size = codes.shape[0]
+        quantized.codes = codes
+        quantized.scales = scales
+        return quantized
+
+    def code_block(self, rows: slice) -> np.ndarray:
+        # Коды без масштабов в типе накопления: int8 как есть, binary — ±1.
+        if self.kind == "int8":
+            return self.codes[rows].astype(self.accumulator)
+        bits = np.unpackbits(self.codes[rows], axis=1, count=self.dims).astype(self.accumulator)
+        return bits * 2 - 1
+
+
+def quantized_topk_neighbours(
+    matrix: np.ndarray,
+    k: int,
+    min_similarity: float,
+    kind: str,
+    rescore: int = 4,
+    block_bytes: int = SIMILARITY_BLOCK_BYTES,
+    quantized: QuantizedMatrix | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    # Кандидаты (k × rescore на строку) ищутся по целочисленным кодам, итоговые веса —
+    # точный cosine по строкам matrix, которые читаются только для кандидатов.
+    # С готовыми кодами (quantized) matrix может быть mmap snapshot-а: в память попадают коды,
+    # а float-строки читаются блоками запросов и строками кандидатов при пересчёте.
+    n = matrix.shape[0]
+    kk = min(k, n - 1)
+    if kk <= 0:
+        return np.full((n, 0), -1, dtype=np.int64), np.zeros((n, 0), dtype=matrix.dtype)
+    candidates_count = min(n - 1, kk * max(1, rescore))
+    if quantized is None or quantized.kind != kind or quantized.size != n:
+        quantized = QuantizedMatrix(matrix, kind, block_bytes)
+    neighbours = np.full((n, kk), -1, dtype=np.int64)
+    weights = np.full((n, kk), -np.inf, dtype=matrix.dtype)
+    accumulator = quantized.accumulator
+    # Коды и рабочие копии вычитаются из бюджета блока, чтобы пик не превышал точный режим.
+    # На строку блока: оценки плюс int64-индексы, которые argpartition заводит под всю строку.
+    work_bytes = min(block_bytes, WORK_BLOCK_BYTES)
+    step = block_rows_for(
+        n,
+        accumulator.itemsize + np.dtype(np.int64).itemsize,
+        max(1, block_bytes - work_bytes - quantized.codes.nbytes),
+    )
+    rescore_step = max(1, work_bytes // max(1, candidates_count * quantized.dims * matrix.dtype.itemsize))
+    column_step = max(1, work_bytes // max(1, quantized.dims * accumulator.itemsize))
+
+    for start in range(0, n, step):
+        block = np.arange(start, min(n, start + step))
+        left = quantized.code_block(slice(start, start + block.size))
+        scores = np.empty((block.size, n), dtype=accumulator)
+        for column in range(0, n, column_step):
+            right = quantized.code_block(slice(column, column + column_step))
+            scores[:, column : column + right.shape[0]] = left @ right.T
+        # Масштаб строки-запроса на порядок кандидатов не влияет, нужен только масштаб столбца.
+        if kind == "int8":
+            scores *= quantized.scales
+        scores[np.arange(block.size), block] = -np.inf
+        np.negative(scores, out=scores)
+        picked = np.argpartition(scores, candidates_count - 1, axis=1)[:, :candidates_count]
+        del scores
+
+        for offset in range(0, block.size, rescore_step):
+            rows = block[offset : offset + rescore_step]
+            chosen = picked[offset : offset + rescore_step]
+            exact = np.matmul(matrix[chosen], matrix[rows][:, :, None])[:, :, 0]
+            exact[~(exact >= min_similarity)] = -np.inf
+            order = np.lexsort((chosen, -exact), axis=1)[:, :kk]
+            rows_idx = np.take_along_axis(chosen, order, axis=1)
+            rows_vals = np.take_along_axis(exact, order, axis=1)
+            rows_idx[~np.isfinite(rows_vals)] = -1
+            neighbours[rows] = rows_idx
+            weights[rows] = rows_vals
+
+    return neighbours, weights
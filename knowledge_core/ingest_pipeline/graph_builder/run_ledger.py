@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from typing import Any, Iterable
+
+import psycopg2.extras
+
+# Журнал нужен для --resume и разбора сбоев; старые запуски удаляются вместе с отметками и карантином.
+EMBEDDING_RUN_RETENTION_DAYS = 30
+
+
+def start_embedding_run(
+    conn: Any,
+    run_id: str,
+    doc_type: str,
+    model: str,
+    docs_total: int,
+    resume: bool,
+) -> set[str]:
+    with conn.cursor() as cur:
+        if resume:
+            cur.execute(
+                """
+                SELECT doc_type, model, status
+                FROM publications.embedding_runs
+                WHERE run_id = %s
+                FOR UPDATE
+                """,
+                (run_id,),
+            )
+            row = cur.fetchone()
+            if row is None:
+                raise RuntimeError(f"Запуск embeddings {run_id} не найден, продолжать нечего")
+            if (row[0], row[1]) != (doc_type, model):
+                raise RuntimeError(
+                    f"Запуск {run_id} считал {row[0]}/{row[1]}, а сейчас задано {doc_type}/{model}"
+                )
+            if row[2] == "done":
+                raise RuntimeError(f"Запуск embeddings {run_id} уже завершён")
+            cur.execute(
+                """
+                UPDATE publications.embedding_runs
+                SET status = 'running', docs_total = %s, finished_at = NULL, resumed_count = resumed_count + 1
+                WHERE run_id = %s
+                """,
+                (docs_total, run_id),
+            )
+            cur.execute("SELECT doc_id FROM publications.embedding_run_docs WHERE run_id = %s", (run_id,))
+            done = {str(doc_id) for (doc_id,) in cur.fetchall()}
+        else:
+            cur.execute(
+                """
+                INSERT INTO publications.embedding_runs (run_id, doc_type, model, status, docs_total)
+                VALUES (%s, %s, %s, 'running', %s)
+                """,
+                (run_id, doc_type, model, docs_total),
+            )
+            done = set()
+    conn.commit()
+    return done
+
+
+def mark_embedding_docs(conn: Any, run_id: str, doc_ids: Iterable[str]) -> None:
+    values = [(run_id, doc_id) for doc_id in doc_ids]
+    if not values:
+        return
+    with conn.cursor() as cur:
+        psycopg2.extras.execute_values(
+            cur,
+            """
+            INSERT INTO publications.embedding_run_docs (run_id, doc_id)
+            VALUES %s
+            ON CONFLICT (run_id, doc_id) DO NOTHING
+            """,
+            values,
+            page_size=1000,
+        )
+
+
+def finish_embedding_run(
+    conn: Any,
+    run_id: str,
+    status: str,
+    retention_days: int = EMBEDDING_RUN_RETENTION_DAYS,
+) -> None:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE publications.embedding_runs
+            SET status = %s,
+                finished_at = now(),
+                docs_done = (SELECT count(*) FROM publications.embedding_run_docs WHERE run_id = %s)
+            WHERE run_id = %s
+            """,
+            (status, run_id, run_id),
+        )
+        if status == "done":
+            # Завершённый запуск не продолжается: отметки по документам больше не нужны, остаётся docs_done.
+            cur.execute("DELETE FROM publications.embedding_run_docs WHERE run_id = %s", (run_id,))
+        cur.execute(
+            """
+            DELETE FROM publications.embedding_runs
+            WHERE started_at < now() - make_interval(days => %s)
+              AND run_id <> %s
+            """,
+            (retention_days, run_id),
+        )
+    conn.commit()
+
+
+def quarantine_embedding_docs(
+    conn: Any,
+    run_id: str,
+    doc_type: str,
+    model: str,
+    items: Iterable[tuple[str, str]],
+) -> None:
+    values = [(run_id, doc_id, doc_type, model, error[:1000]) for doc_id, error in items]
+    if not values:
+        return
+    with conn.cursor() as cur:
+        psycopg2.extras.execute_values(
+            cur,
+            """
+            INSERT INTO publications.embedding_quarantine (run_id, doc_id, doc_type, model, error)
+            VALUES %s
+            ON CONFLICT (run_id, doc_id) DO UPDATE SET error = EXCLUDED.error, created_at = now()
+            """,
+            values,
+            page_size=1000,
+        )
+    conn.commit()
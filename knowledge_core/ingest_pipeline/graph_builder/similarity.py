@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import numpy as np
+
+
+# Верхняя граница памяти под один блок матрицы сходства (rows × n × itemsize).
+SIMILARITY_BLOCK_BYTES = 256 * 1024 * 1024
+
+
+def block_rows_for(n: int, itemsize: int, block_bytes: int = SIMILARITY_BLOCK_BYTES) -> int:
+    return max(1, min(n, block_bytes // max(1, n * itemsize)))
+
+
+def topk_neighbours(
+    matrix: np.ndarray,
+    k: int,
+    min_similarity: float,
+    rows: np.ndarray | None = None,
+    block_bytes: int = SIMILARITY_BLOCK_BYTES,
+) -> tuple[np.ndarray, np.ndarray]:
+    # Соседи упорядочены по убыванию веса, при равенстве — по возрастанию индекса
+    # (как стабильная сортировка в попарном цикле). Пустые позиции: индекс -1.
+    n = matrix.shape[0]
+    if rows is None:
+        rows = np.arange(n)
+    rows = np.asarray(rows, dtype=np.int64)
+    kk = min(k, n - 1)
+    if kk <= 0 or rows.size == 0:
+        return np.full((rows.size, 0), -1, dtype=np.int64), np.zeros((rows.size, 0), dtype=matrix.dtype)
+
+    neighbours = np.full((rows.size, kk), -1, dtype=np.int64)
+    weights = np.full((rows.size, kk), -np.inf, dtype=matrix.dtype)
+    # На элемент блока: сходство плюс int64-индекс, который argpartition заводит под всю строку.
+    step = block_rows_for(n, matrix.dtype.itemsize + np.dtype(np.int64).itemsize, block_bytes)
+
+    for start in range(0, rows.size, step):
+        block = rows[start : start + step]
+        sims = matrix[block] @ matrix.T
+        sims[np.arange(block.size), block] = -np.inf
+        sims[~(sims >= min_similarity)] = -np.inf
+
+        # Знак меняется на месте, без второй копии блока; нужные значения возвращаются с исходным знаком.
+        np.negative(sims, out=sims)
+        part = np.argpartition(sims, kk - 1, axis=1)[:, :kk]
+        np.negative(sims, out=sims)
+        part_vals = np.take_along_axis(sims, part, axis=1)
+        order = np.lexsort((part, -part_vals), axis=1)
+        block_idx = np.take_along_axis(part, order, axis=1)
+        block_vals = np.take_along_axis(part_vals, order, axis=1)
+
+        # argpartition выбирает произвольных представителей среди равных весов на границе k;
+        # такие строки досчитываем точно, чтобы порядок совпадал с эталонным.
+        threshold = block_vals[:, -1]
+        ambiguous = np.isfinite(threshold) & ((sims >= threshold[:, None]).sum(axis=1) > kk)
+        for local in np.flatnonzero(ambiguous):
+            row = sims[local]
+            candidates = np.flatnonzero(row >= threshold[local])
+            picked = candidates[np.lexsort((candidates, -row[candidates]))[:kk]]
+            block_idx[local] = picked
+            block_vals[local] = row[picked]
+
+        block_idx[~np.isfinite(block_vals)] = -1
+        neighbours[start : start + block.size] = block_idx
+        weights[start : start + block.size] = block_vals
+
+    return neighbours, weights
+
+
+def neighbour_recall(
+    matrix: np.ndarray,
+    neighbours: np.ndarray,
+    k: int,
+    min_similarity: float,
+    sample_size: int,
+    seed: int = 42,
+) -> float:
+    n = matrix.shape[0]
+    if n == 0 or sample_size <= 0:
+        return 1.0
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(n, size=min(sample_size, n), replace=False))
+    exact, _ = topk_neighbours(matrix, k, min_similarity, rows=rows)
+    hits = 0
+    total = 0
+    for row, expected in zip(rows.tolist(), exact):
+        expected_ids = set(expected[expected >= 0].tolist())
+        found_ids = set(neighbours[row][neighbours[row] >= 0].tolist())
+        hits += len(expected_ids & found_ids)
+        total += len(expected_ids)
+    return hits / total if total else 1.0
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+from knowledge_core.ingest_pipeline.graph_builder.embedding_store import normalize_rows
+from knowledge_core.ingest_pipeline.graph_builder.quantization import QuantizedMatrix
+
+
+@dataclass(frozen=True)
+class EmbeddingSnapshot:
+    doc_ids: list[str]
+    source_hashes: list[str]
+    matrix: np.ndarray
+    fingerprint: str
+
+
+def snapshot_paths(snapshot_dir: Path, doc_type: str, model: str) -> tuple[Path, Path]:
+    stem = re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{doc_type}.{model}")
+    return snapshot_dir / f"{stem}.npy", snapshot_dir / f"{stem}.index.json"
+
+
+def codes_path(snapshot_dir: Path, doc_type: str, model: str, kind: str) -> Path:
+    matrix_path, _ = snapshot_paths(snapshot_dir, doc_type, model)
+    return matrix_path.with_suffix(f".{kind}.npz")
+
+
+def fingerprint_rows(rows: Iterable[tuple[str, str]]) -> str:
+    # Совпадает с md5(string_agg(doc_id || ':' || source_hash, E'\n' ORDER BY doc_id COLLATE "C")).
+    payload = "\n".join(f"{doc_id}:{source_hash}" for doc_id, source_hash in sorted(rows))
+    return hashlib.md5(payload.encode("utf-8")).hexdigest()
+
+
+def load_snapshot(snapshot_dir: Path, doc_type: str, model: str) -> EmbeddingSnapshot | None:
+    matrix_path, index_path = snapshot_paths(snapshot_dir, doc_type, model)
+    try:
+        index = json.loads(index_path.read_text(encoding="utf-8"))
+        matrix = np.load(matrix_path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    # Snapshot старого формата хранил ненормированные строки: он пересобирается, а не читается в память целиком.
+    if not index.get("normalized"):
+        return None
+    doc_ids = [str(doc_id) for doc_id in index.get("doc_ids") or []]
+    source_hashes = [str(value) for value in index.get("source_hashes") or []]
+    if matrix.ndim != 2 or matrix.shape[0] != len(doc_ids) or len(source_hashes) != len(doc_ids):
+        return None
+    return EmbeddingSnapshot(
+        doc_ids=doc_ids,
+        source_hashes=source_hashes,
+        matrix=matrix,
+        fingerprint=str(index.get("fingerprint") or ""),
+    )
+
+
+def write_snapshot(
+    snapshot_dir: Path,
+    doc_type: str,
+    model: str,
+    doc_ids: list[str],
+    source_hashes: list[str],
+    matrix: np.ndarray,
+    normalized: bool = False,
+) -> EmbeddingSnapshot:
+    # Строки пишутся нормированными float32: edges stage работает прямо с mmap, без копии в памяти.
+    # normalized=True — matrix уже float32 с нормированными строками, копия не нужна.
+    if not normalized:
+        matrix = np.array(matrix, dtype=np.float32, order="C")
+        normalize_rows(matrix)
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    matrix_path, index_path = snapshot_paths(snapshot_dir, doc_type, model)
+    fingerprint = fingerprint_rows(zip(doc_ids, source_hashes))
+
+    tmp_matrix = matrix_path.with_suffix(".npy.tmp")
+    with tmp_matrix.open("wb") as fh:
+        np.save(fh, np.ascontiguousarray(matrix, dtype=np.float32))
+    tmp_index = index_path.with_suffix(".json.tmp")
+    tmp_index.write_text(
+        json.dumps(
+            {
+                "doc_type": doc_type,
+                "model": model,
+                "dims": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+                "fingerprint": fingerprint,
+                "normalized": True,
+                "doc_ids": doc_ids,
+                "source_hashes": source_hashes,
+            },
+            ensure_ascii=False,
+        ),
+        encoding="utf-8",
+    )
+    os.replace(tmp_matrix, matrix_path)
+    os.replace(tmp_index, index_path)
+    return load_snapshot(snapshot_dir, doc_type, model) or EmbeddingSnapshot(
+        doc_ids=doc_ids,
+        source_hashes=source_hashes,
+        matrix=matrix,
+        fingerprint=fingerprint,
+    )
+
+
+def load_codes(
+    snapshot_dir: Path,
+    doc_type: str,
+    model: str,
+    kind: str,
+    snapshot: EmbeddingSnapshot,
+) -> QuantizedMatrix | None:
+    # Коды действительны только для того же набора строк, что и матрица snapshot-а.
+    try:
+        with np.load(codes_path(snapshot_dir, doc_type, model, kind)) as data:
+            fingerprint = str(data["fingerprint"])
+            codes = data["codes"]
+            scales = data["scales"]
+    except (OSError, ValueError, KeyError):
+        return None
+    if fingerprint != snapshot.fingerprint or codes.shape[0] != snapshot.matrix.shape[0]:
+        return None
+    return QuantizedMatrix.from_codes(kind, int(snapshot.matrix.shape[1]), codes, scales)
+
+
+def write_codes(
+    snapshot_dir: Path,
+    doc_type: str,
+    model: str,
+    quantized: QuantizedMatrix,
+    snapshot: EmbeddingSnapshot,
+) -> None:
+    path = codes_path(snapshot_dir, doc_type, model, quantized.kind)
+    tmp_path = path.with_suffix(".npz.tmp")
+    with tmp_path.open("wb") as fh:
+        np.savez(fh, codes=quantized.codes, scales=quantized.scales, fingerprint=np.array(snapshot.fingerprint))
+    os.replace(tmp_path, path)
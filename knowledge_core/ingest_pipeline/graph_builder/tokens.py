@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import math
+from typing import Sequence
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken опционален
+    tiktoken = None
+
+# Калибровка по cl100k_base: латиница ~4 символа на токен, кириллица ~2.9 (берём 2 с запасом),
+# прочие символы (CJK, emoji) — до токена на символ.
+ASCII_CHARS_PER_TOKEN = 4.0
+CYRILLIC_CHARS_PER_TOKEN = 2.0
+
+
+def estimate_tokens(text: str) -> int:
+    ascii_chars = 0
+    cyrillic_chars = 0
+    other_chars = 0
+    for char in text:
+        code = ord(char)
+        if code < 0x80:
+            ascii_chars += 1
+        elif code < 0x500:
+            cyrillic_chars += 1
+        else:
+            other_chars += 1
+    return math.ceil(ascii_chars / ASCII_CHARS_PER_TOKEN + cyrillic_chars / CYRILLIC_CHARS_PER_TOKEN) + other_chars + 1
+
+
+class TokenCounter:
+    def __init__(self, model: str) -> None:
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("cl100k_base")
+
+    @property
+    def exact(self) -> bool:
+        return self.encoding is not None
+
+    def count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return estimate_tokens(text)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text
+            return self.encoding.decode(tokens[:max_tokens])
+        if estimate_tokens(text) <= max_tokens:
+            return text
+        # Оценка монотонна по длине префикса — ищем самый длинный префикс в пределах лимита.
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if estimate_tokens(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low]
+
+
+def next_batch_end(token_counts: Sequence[int], start: int, max_items: int, max_tokens: int | None) -> int:
+    # Жадная упаковка подряд идущих текстов: порядок документов сохраняется,
+    # batch закрывается по лимиту входов или по бюджету токенов на запрос (минимум один текст).
+    if max_items <= 0:
+        raise ValueError("Размер batch должен быть больше нуля")
+    end = start
+    used = 0
+    while end < len(token_counts) and end - start < max_items:
+        if end > start and max_tokens is not None and used + token_counts[end] > max_tokens:
+            break
+        used += token_counts[end]
+        end += 1
+    return end
+
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import base64
+import struct
+from typing import Any, Sequence
+
+import numpy as np
+
+# Бинарное представление pgvector (vector_send / vector_recv): uint16 dim, uint16 unused,
+# затем dim × float4 в big-endian. Совпадает с форматом COPY BINARY.
+VECTOR_HEADER = struct.Struct(">HH")
+VECTOR_WIRE_DTYPE = np.dtype(">f4")
+# halfvec_send / halfvec_recv: тот же заголовок, значения — float2 (IEEE half) в big-endian.
+HALFVEC_WIRE_DTYPE = np.dtype(">f2")
+# encoding_format="base64" в ответе OpenAI: base64 от массива float32 little-endian.
+BASE64_EMBEDDING_DTYPE = np.dtype("<f4")
+
+
+def encode_vector(value: Any) -> bytes:
+    data = np.asarray(value, dtype=VECTOR_WIRE_DTYPE).reshape(-1)
+    return VECTOR_HEADER.pack(data.shape[0], 0) + data.tobytes()
+
+
+def encode_halfvec(value: Any) -> bytes:
+    data = np.asarray(value, dtype=np.float32).reshape(-1)
+    if data.size and float(np.abs(data).max()) > float(np.finfo(np.float16).max):
+        raise ValueError("Значение вне диапазона halfvec (float16)")
+    return VECTOR_HEADER.pack(data.shape[0], 0) + data.astype(HALFVEC_WIRE_DTYPE).tobytes()
+
+
+def decode_vector(raw: bytes | memoryview) -> np.ndarray:
+    dims, _ = VECTOR_HEADER.unpack_from(raw)
+    if len(raw) != VECTOR_HEADER.size + dims * VECTOR_WIRE_DTYPE.itemsize:
+        raise ValueError(f"Повреждённый бинарный vector: ожидалось {dims} значений")
+    return np.frombuffer(raw, dtype=VECTOR_WIRE_DTYPE, offset=VECTOR_HEADER.size).astype(np.float32)
+
+
+def encode_base64_embedding(value: Any) -> str:
+    return base64.b64encode(np.asarray(value, dtype=BASE64_EMBEDDING_DTYPE).tobytes()).decode("ascii")
+
+
+def decode_base64_embedding(value: str | Sequence[float]) -> np.ndarray:
+    # Совместимые серверы могут проигнорировать encoding_format и вернуть список чисел.
+    if not isinstance(value, str):
+        return np.asarray(value, dtype=np.float32)
+    raw = base64.b64decode(value, validate=True)
+    if len(raw) % BASE64_EMBEDDING_DTYPE.itemsize:
+        raise ValueError("Повреждённый base64 embedding: длина не кратна float32")
+    return np.frombuffer(raw, dtype=BASE64_EMBEDDING_DTYPE).astype(np.float32)
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from typing import Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+_STOP = object()
+
+
+class BackgroundWriter(Generic[T]):
+    # Запись в БД идёт в отдельном потоке, пока следующие batch-и считаются у провайдера.
+    # Очередь ограничена: если БД не успевает, submit блокируется (backpressure), память не растёт.
+    def __init__(self, write: Callable[[T], None], max_pending: int = 4) -> None:
+        self._write = write
+        self._queue: queue.Queue[object] = queue.Queue(maxsize=max(1, max_pending))
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._run, name="embeddings-writer", daemon=True)
+        self._closed = False
+        self.written = 0
+        self.write_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self._thread.start()
+
+    def __enter__(self) -> BackgroundWriter[T]:
+        return self
+
+    def __exit__(self, exc_type: object, *exc_info: object) -> None:
+        # При ошибке у вызывающего недописанное не ждём, но поток всё равно останавливаем.
+        self.close(raise_error=exc_type is None)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            if self._error is not None:
+                continue
+            started = time.perf_counter()
+            try:
+                self._write(item)  # type: ignore[arg-type]
+            except BaseException as exc:
+                self._error = exc
+                continue
+            self.write_seconds += time.perf_counter() - started
+            self.written += 1
+
+    def submit(self, item: T) -> None:
+        if self._error is not None:
+            raise self._error
+        started = time.perf_counter()
+        self._queue.put(item)
+        self.blocked_seconds += time.perf_counter() - started
+
+    def close(self, raise_error: bool = True) -> None:
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join()
+        if raise_error and self._error is not None:
+            raise self._error
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "writes": self.written,
+            "write_seconds": round(self.write_seconds, 3),
+            "writer_blocked_seconds": round(self.blocked_seconds, 3),
+        }
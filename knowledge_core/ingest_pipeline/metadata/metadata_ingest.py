@@ -11,7 +11,7 @@ import psycopg2
 import psycopg2.extras
 
 from knowledge_core.ingest_pipeline.logging import log_error, log_event, setup_logging
-from knowledge_core.ingest_pipeline.posts import PostExtracted, extract_publish_posts
+from knowledge_core.ingest_pipeline.posts import PostHeader, open_extract_cache, scan_publish_posts
 
 logger = logging.getLogger(__name__)
 
@@ -27,14 +27,26 @@ def build_dsn() -> str:
     return f'dbname={database} user={user} password={password} host={host} port={port}'
 
 
-def validate_post_metadata(post: PostExtracted, run_id: str) -> None:
+def validate_post_metadata(post: PostHeader, run_id: str) -> None:
     if not post.channels:
         log_event(logger, run_id, 'warn', 'пост без channels', doc_id=post.id, source_path=post.source_path)
     if not post.authors:
         log_event(logger, run_id, 'warn', 'пост без authors', doc_id=post.id, source_path=post.source_path)
 
 
-def upsert_doc_metadata(posts: list[PostExtracted], dsn: str, run_id: str) -> int:
+def fetch_metadata_hashes(dsn: str, doc_ids: list[str]) -> dict[str, str]:
+    query = """
+    SELECT doc_id, meta->>'metadata_hash'
+    FROM publications.doc_metadata
+    WHERE doc_id = ANY(%s)
+    """
+    with psycopg2.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(query, (doc_ids,))
+            return {str(doc_id): value for doc_id, value in cur.fetchall() if value}
+
+
+def upsert_doc_metadata(posts: list[PostHeader], dsn: str, run_id: str) -> int:
     values = [
         (
             post.id,
@@ -45,10 +57,11 @@ def upsert_doc_metadata(posts: list[PostExtracted], dsn: str, run_id: str) -> in
             post.category_ids,
             'post',
             psycopg2.extras.Json(
+                # Только производное от frontmatter и пути: строка перезаписывается лишь при смене metadata_hash.
                 {
                     'source_path': post.source_path,
                     'title': post.title,
-                    'source_hash': post.source_hash,
+                    'metadata_hash': post.metadata_hash,
                 }
             ),
         )
@@ -77,14 +90,23 @@ def upsert_doc_metadata(posts: list[PostExtracted], dsn: str, run_id: str) -> in
     return len(values)
 
 
-def run_metadata_stage(source_root: Path, dsn: str, limit_posts: int | None = None, run_id: str | None = None) -> int:
+def run_metadata_stage(
+    source_root: Path,
+    dsn: str,
+    limit_posts: int | None = None,
+    run_id: str | None = None,
+    extract_cache_path: Path | None = None,
+) -> int:
     local_run_id = run_id or uuid.uuid4().hex[:8]
     started = time.time()
     log_event(logger, local_run_id, 'start', 'старт metadata stage', stage='metadata')
-    posts = extract_publish_posts(source_root)
+    with open_extract_cache(extract_cache_path) as extract_cache:
+        # Metadata нужна только первая фаза: тело поста не разбирается.
+        posts = scan_publish_posts(source_root, cache=extract_cache)
+        cache_stats = extract_cache.stats() if extract_cache is not None else {}
     if limit_posts is not None:
         posts = posts[:limit_posts]
-    log_event(logger, local_run_id, 'read', 'прочитаны publish-посты', stage='metadata', posts=len(posts))
+    log_event(logger, local_run_id, 'read', 'прочитаны publish-посты', stage='metadata', posts=len(posts), **cache_stats)
 
     for post in posts:
         validate_post_metadata(post, local_run_id)
@@ -93,7 +115,19 @@ def run_metadata_stage(source_root: Path, dsn: str, limit_posts: int | None = No
         log_event(logger, local_run_id, 'warn', 'нет данных для materialization', stage='metadata')
         return 0
 
-    rows = upsert_doc_metadata(posts, dsn=dsn, run_id=local_run_id)
+    # Правка текста без правки frontmatter не трогает metadata — пишутся только посты с новым metadata_hash.
+    stored = fetch_metadata_hashes(dsn, [post.id for post in posts])
+    changed = [post for post in posts if stored.get(post.id) != post.metadata_hash]
+    log_event(
+        logger,
+        local_run_id,
+        'diff',
+        'сравнение metadata_hash',
+        stage='metadata',
+        changed=len(changed),
+        unchanged=len(posts) - len(changed),
+    )
+    rows = upsert_doc_metadata(changed, dsn=dsn, run_id=local_run_id) if changed else 0
     duration_ms = int((time.time() - started) * 1000)
     log_event(logger, local_run_id, 'upsert', 'materialization metadata завершен', stage='metadata', table='publications.doc_metadata', rows=rows)
     log_event(logger, local_run_id, 'done', 'metadata stage done', stage='metadata', duration_ms=duration_ms)
@@ -116,7 +150,12 @@ def main() -> None:
     )
 
     try:
-        run_metadata_stage(source_root=source_root, dsn=build_dsn(), limit_posts=args.limit_posts)
+        run_metadata_stage(
+            source_root=source_root,
+            dsn=build_dsn(),
+            limit_posts=args.limit_posts,
+            extract_cache_path=Path(os.environ['EXTRACT_CACHE_PATH']) if os.getenv('EXTRACT_CACHE_PATH') else None,
+        )
     except Exception as exc:
         run_id = uuid.uuid4().hex[:8]
         log_error(logger, run_id, 'metadata', f'metadata stage failed: {exc}')
@@ -1,3 +1,25 @@
-from .extract_posts import PostExtracted, extract_publish_posts
+from .extract_cache import ExtractCache
+from .extract_posts import (
+    EXTRACT_VERSION,
+    PostExtracted,
+    PostHeader,
+    extract_publish_posts,
+    materialize_post,
+    materialize_posts,
+    open_extract_cache,
+    read_post_file,
+    scan_publish_posts,
+)
 
-__all__ = ["PostExtracted", "extract_publish_posts"]
+__all__ = [
+    "EXTRACT_VERSION",
+    "ExtractCache",
+    "PostExtracted",
+    "PostHeader",
+    "extract_publish_posts",
+    "materialize_post",
+    "materialize_posts",
+    "open_extract_cache",
+    "read_post_file",
+    "scan_publish_posts",
+]
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import os
+import pickle
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .extract_posts import PostHeader
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS extract_cache (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    source_hash TEXT NOT NULL,
+    meta BLOB NOT NULL,
+    header BLOB,
+    text_for_embedding TEXT
+) WITHOUT ROWID;
+"""
+# Раскладка таблицы; вместе с версией правил извлечения хранится в user_version.
+SCHEMA_VERSION = 2
+
+
+@dataclass(frozen=True)
+class ParsedFile:
+    source_hash: str
+    meta: dict[str, Any]
+    # None — файл не publish-пост.
+    header: PostHeader | None
+    text_for_embedding: str | None
+
+
+class ExtractCache:
+    # Результат разбора файла по ключу (path, st_mtime_ns, st_size). Если stat изменился (touch, checkout),
+    # файл перехешируется и запись переиспользуется при совпавшем source_hash.
+    # Версия правил извлечения и раскладки хранится в user_version: после её смены таблица пересоздаётся.
+    def __init__(self, path: Path, version: int) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        expected = int(version) * 100 + SCHEMA_VERSION
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != expected:
+            self._conn.execute("DROP TABLE IF EXISTS extract_cache")
+            self._conn.execute(f"PRAGMA user_version = {expected}")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self.hits = 0
+        self.verified = 0
+        self.misses = 0
+        self.stored = 0
+        self.pruned = 0
+
+    def __enter__(self) -> ExtractCache:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def get(self, path: Path, stat: os.stat_result) -> ParsedFile | None:
+        row = self._conn.execute(
+            """
+            SELECT source_hash, meta, header, text_for_embedding
+            FROM extract_cache
+            WHERE path = ? AND mtime_ns = ? AND size = ?
+            """,
+            (str(path), stat.st_mtime_ns, stat.st_size),
+        ).fetchone()
+        if row is None:
+            return None
+        self.hits += 1
+        return parsed_file(row)
+
+    def verify(self, path: Path, stat: os.stat_result, source_hash: str) -> ParsedFile | None:
+        row = self._conn.execute(
+            """
+            SELECT source_hash, meta, header, text_for_embedding
+            FROM extract_cache
+            WHERE path = ? AND source_hash = ?
+            """,
+            (str(path), source_hash),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self._conn.execute(
+            "UPDATE extract_cache SET mtime_ns = ?, size = ? WHERE path = ?",
+            (stat.st_mtime_ns, stat.st_size, str(path)),
+        )
+        self.verified += 1
+        return parsed_file(row)
+
+    def put(
+        self,
+        path: Path,
+        stat: os.stat_result,
+        source_hash: str,
+        meta: dict[str, Any],
+        header: PostHeader | None,
+    ) -> None:
+        self._conn.execute(
+            """
+            INSERT INTO extract_cache (path, mtime_ns, size, source_hash, meta, header)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (path) DO UPDATE SET
+                mtime_ns = excluded.mtime_ns,
+                size = excluded.size,
+                source_hash = excluded.source_hash,
+                meta = excluded.meta,
+                header = excluded.header,
+                text_for_embedding = NULL
+            """,
+            (
+                str(path),
+                stat.st_mtime_ns,
+                stat.st_size,
+                source_hash,
+                pickle.dumps(meta, protocol=pickle.HIGHEST_PROTOCOL),
+                None if header is None else pickle.dumps(header, protocol=pickle.HIGHEST_PROTOCOL),
+            ),
+        )
+        self.stored += 1
+
+    def get_text(self, path: Path, source_hash: str) -> str | None:
+        row = self._conn.execute(
+            """
+            SELECT text_for_embedding
+            FROM extract_cache
+            WHERE path = ? AND source_hash = ? AND text_for_embedding IS NOT NULL
+            """,
+            (str(path), source_hash),
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def put_text(self, path: Path, source_hash: str, text_for_embedding: str) -> None:
+        # Текст привязан к source_hash записи: текст изменившегося файла к старому заголовку не прилипнет.
+        self._conn.execute(
+            """
+            UPDATE extract_cache SET text_for_embedding = ?
+            WHERE path = ? AND source_hash = ?
+            """,
+            (text_for_embedding, str(path), source_hash),
+        )
+
+    def prune(self, source_root: Path, seen: set[str]) -> None:
+        # Удалённые и переименованные файлы: записи под source_root, которых не было в обходе.
+        # Записи других корней (metadata и embeddings могут делить кеш) не трогаются.
+        prefix = os.path.join(str(source_root), "")
+        stale = [
+            path
+            for (path,) in self._conn.execute(
+                "SELECT path FROM extract_cache WHERE substr(path, 1, ?) = ?",
+                (len(prefix), prefix),
+            )
+            if path not in seen
+        ]
+        self._conn.executemany("DELETE FROM extract_cache WHERE path = ?", ((path,) for path in stale))
+        self.pruned += len(stale)
+
+    def commit(self) -> None:
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.commit()
+        self._conn.close()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "extract_cache_hits": self.hits,
+            "extract_cache_verified": self.verified,
+            "extract_cache_misses": self.misses,
+            "extract_cache_stored": self.stored,
+            "extract_cache_pruned": self.pruned,
+        }
+
+
+def parsed_file(row: tuple[Any, ...]) -> ParsedFile:
+    source_hash, meta, header, text_for_embedding = row
+    return ParsedFile(
+        source_hash=source_hash,
+        meta=pickle.loads(meta),
+        header=None if header is None else pickle.loads(header),
+        text_for_embedding=text_for_embedding,
+    )
+
@@ -2,16 +2,42 @@ from __future__ import annotations
 
 import dataclasses
 import hashlib
+import json
 import logging
 import re
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Iterable
+from typing import Any, Iterable, Iterator, TypeVar
 
 import yaml
 
+from .extract_cache import ExtractCache, ParsedFile
 
 logger = logging.getLogger(__name__)
 
+# Версия правил clean_markdown / build_text_for_embedding и полей PostHeader: входит в ключ входа
+# embeddings и в кеш извлечения, поэтому после изменения правил тексты всех постов пересобираются.
+EXTRACT_VERSION = 1
+HASH_CHUNK_CHARS = 1 << 20
+
+PostLike = TypeVar("PostLike", "PostHeader", "PostExtracted")
+
+
+@dataclasses.dataclass(frozen=True)
+class PostHeader:
+    # Результат первой фазы: всё, что известно из frontmatter и хеша файла, без разбора тела.
+    id: str
+    title: str
+    authors: list[str]
+    date_ymd: str
+    year: int
+    channels: list[str]
+    rubric_ids: list[str]
+    category_ids: list[str]
+    source_path: str
+    source_hash: str
+    metadata_hash: str
+
 
 @dataclasses.dataclass(frozen=True)
 class PostExtracted:
@@ -26,23 +52,42 @@ class PostExtracted:
     text_for_embedding: str
     source_path: str
     source_hash: str
+    metadata_hash: str
+
+
+@contextmanager
+def open_extract_cache(path: Path | None) -> Iterator[ExtractCache | None]:
+    if path is None:
+        yield None
+        return
+    with ExtractCache(path, EXTRACT_VERSION) as cache:
+        yield cache
 
 
 def extract_publish_posts(
     source_root: Path,
     prefer_channel: str | None = None,
+    cache: ExtractCache | None = None,
 ) -> list[PostExtracted]:
-    posts: list[PostExtracted] = []
+    return materialize_posts(scan_publish_posts(source_root, prefer_channel=prefer_channel, cache=cache), cache=cache)
+
+
+def scan_publish_posts(
+    source_root: Path,
+    prefer_channel: str | None = None,
+    cache: ExtractCache | None = None,
+) -> list[PostHeader]:
+    # Фаза 1: файл читается потоком и хешируется, YAML разбирается только у frontmatter.
+    # Тело не проходит через clean_markdown — это делает materialize_post для нужных постов.
+    headers: list[PostHeader] = []
+    seen: set[str] = set()
     for path in iter_markdown_files(source_root):
+        seen.add(str(path))
         try:
-            raw_text = path.read_text(encoding="utf-8")
+            parsed = read_post_file(path, cache)
         except OSError as exc:
             logger.error("❌ Не удалось прочитать файл %s: %s", path, exc)
             continue
-
-        try:
-            frontmatter, body = split_frontmatter(raw_text, path)
-            meta = yaml.safe_load(frontmatter) or {}
         except ValueError as exc:
             logger.error("❌ %s", exc)
             continue
@@ -50,15 +95,112 @@ def extract_publish_posts(
             logger.error("❌ Ошибка YAML в %s: %s", path, exc)
             continue
 
-        if not is_publish_post(meta):
-            continue
+        if parsed.header is not None:
+            headers.append(parsed.header)
+
+    if cache is not None:
+        cache.prune(source_root, seen)
+        cache.commit()
+    return deduplicate_posts(headers, prefer_channel)
+
+
+def read_post_file(path: Path, cache: ExtractCache | None = None) -> ParsedFile:
+    # С кешем: совпал stat — файл не читается; stat изменился — файл хешируется, и при прежнем
+    # source_hash YAML не разбирается. Publish-посты с ошибками в frontmatter не кешируются,
+    # чтобы ошибка попадала в лог на каждом запуске.
+    stat = path.stat() if cache is not None else None
+    if cache is not None:
+        parsed = cache.get(path, stat)
+        if parsed is not None:
+            return parsed
+    frontmatter, source_hash = read_frontmatter_and_hash(path)
+    if cache is not None:
+        parsed = cache.verify(path, stat, source_hash)
+        if parsed is not None:
+            return parsed
+
+    meta = yaml.safe_load(frontmatter) or {}
+    publish = is_publish_post(meta)
+    header = build_post_header(meta, source_hash, path) if publish else None
+    if cache is not None and (header is not None or not publish):
+        cache.put(path, stat, source_hash, meta, header)
+    return ParsedFile(source_hash=source_hash, meta=meta, header=header, text_for_embedding=None)
+
+
+def materialize_posts(headers: Iterable[PostHeader], cache: ExtractCache | None = None) -> list[PostExtracted]:
+    posts = [materialize_post(header, cache) for header in headers]
+    if cache is not None:
+        cache.commit()
+    return [post for post in posts if post is not None]
+
+
+def materialize_post(header: PostHeader, cache: ExtractCache | None = None) -> PostExtracted | None:
+    # Фаза 2: файл перечитывается целиком, тело чистится и собирается text_for_embedding.
+    path = Path(header.source_path)
+    cached = cache.get_text(path, header.source_hash) if cache is not None else None
+    if cached is not None:
+        return build_extracted_post(header, cached, header.source_hash)
+    try:
+        raw_text = path.read_text(encoding="utf-8")
+        _, body = split_frontmatter(raw_text, path)
+    except OSError as exc:
+        logger.error("❌ Не удалось прочитать файл %s: %s", path, exc)
+        return None
+    except ValueError as exc:
+        logger.error("❌ %s", exc)
+        return None
 
-        post = build_post(meta, body, raw_text, path)
-        if post is None:
-            continue
-        posts.append(post)
+    source_hash = hashlib.sha256(raw_text.encode("utf-8")).hexdigest()
+    if source_hash != header.source_hash:
+        logger.warning("⚠️ Файл %s изменился между фазами извлечения, используется новое содержимое", path)
+    text_for_embedding = build_text_for_embedding(header.title, clean_markdown(body))
+    if cache is not None:
+        cache.put_text(path, source_hash, text_for_embedding)
+    return build_extracted_post(header, text_for_embedding, source_hash)
+
+
+def build_extracted_post(
+    header: PostHeader,
+    text_for_embedding: str,
+    source_hash: str,
+) -> PostExtracted:
+    return PostExtracted(
+        id=header.id,
+        title=header.title,
+        authors=header.authors,
+        date_ymd=header.date_ymd,
+        year=header.year,
+        channels=header.channels,
+        rubric_ids=header.rubric_ids,
+        category_ids=header.category_ids,
+        text_for_embedding=text_for_embedding,
+        source_path=header.source_path,
+        source_hash=source_hash,
+        metadata_hash=header.metadata_hash,
+    )
 
-    return deduplicate_posts(posts, prefer_channel)
+
+def read_frontmatter_and_hash(path: Path) -> tuple[str, str]:
+    # Хеш совпадает с sha256(path.read_text(encoding="utf-8").encode("utf-8")): файл читается
+    # в текстовом режиме с теми же переводами строк, но тело не держится в памяти целиком.
+    digest = hashlib.sha256()
+    with path.open(encoding="utf-8") as fh:
+        first = fh.readline()
+        digest.update(first.encode("utf-8"))
+        if first.strip() != "---":
+            raise ValueError(f"Отсутствует frontmatter в {path}")
+        lines: list[str] = []
+        while True:
+            line = fh.readline()
+            if not line:
+                raise ValueError(f"Не найден конец frontmatter в {path}")
+            digest.update(line.encode("utf-8"))
+            if line.strip() == "---":
+                break
+            lines.append(line.rstrip("\n"))
+        while chunk := fh.read(HASH_CHUNK_CHARS):
+            digest.update(chunk.encode("utf-8"))
+    return "\n".join(lines), digest.hexdigest()
 
 
 def iter_markdown_files(source_root: Path) -> Iterable[Path]:
@@ -94,12 +236,11 @@ def is_publish_post(meta: dict[str, Any]) -> bool:
     return True
 
 
-def build_post(
+def build_post_header(
     meta: dict[str, Any],
-    body: str,
-    raw_text: str,
+    source_hash: str,
     path: Path,
-) -> PostExtracted | None:
+) -> PostHeader | None:
     administrative = meta.get("administrative") or {}
     descriptive = meta.get("descriptive") or {}
     taxonomy = (descriptive.get("taxonomy") or {}) if isinstance(descriptive, dict) else {}
@@ -137,27 +278,33 @@ def build_post(
         logger.error("❌ Пропущен файл %s: некорректный date_ymd=%s", path, date_ymd)
         return None
 
-    title = str(descriptive["title"]).strip()
-    cleaned_body = clean_markdown(body)
-    text_for_embedding = build_text_for_embedding(title, cleaned_body)
-
-    source_hash = hashlib.sha256(raw_text.encode("utf-8")).hexdigest()
-
-    return PostExtracted(
+    # source_hash меняется от любой правки файла, metadata_hash — только от frontmatter и пути.
+    # Ключ вектора по тексту считается при подготовке (embedding_content_hash в graph_builder/pipeline.py).
+    return PostHeader(
         id=doc_id,
-        title=title,
+        title=str(descriptive["title"]).strip(),
         authors=list(administrative.get("authors") or []),
         date_ymd=date_ymd,
         year=year,
         channels=list(administrative.get("channels") or []),
         rubric_ids=list(taxonomy.get("rubric_ids") or []),
         category_ids=list(taxonomy.get("category_ids") or []),
-        text_for_embedding=text_for_embedding,
         source_path=str(path),
         source_hash=source_hash,
+        metadata_hash=build_metadata_hash(meta, path),
     )
 
 
+def build_metadata_hash(meta: dict[str, Any], path: Path) -> str:
+    payload = json.dumps(
+        {"meta": meta, "source_path": str(path)},
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
 def build_text_for_embedding(title: str, cleaned_body: str) -> str:
     parts = [title.strip(), cleaned_body.strip()]
     return "\n\n".join(part for part in parts if part)
@@ -182,11 +329,11 @@ def clean_markdown(text: str) -> str:
 
 
 def deduplicate_posts(
-    posts: list[PostExtracted],
+    posts: list[PostLike],
     prefer_channel: str | None,
-) -> list[PostExtracted]:
-    by_id: dict[str, PostExtracted] = {}
-    duplicates: dict[str, list[PostExtracted]] = {}
+) -> list[PostLike]:
+    by_id: dict[str, PostLike] = {}
+    duplicates: dict[str, list[PostLike]] = {}
 
     for post in posts:
         existing = by_id.get(post.id)
@@ -215,9 +362,9 @@ def deduplicate_posts(
 
 
 def choose_canonical_post(
-    candidates: list[PostExtracted],
+    candidates: list[PostLike],
     prefer_channel: str | None,
-) -> PostExtracted:
+) -> PostLike:
     if prefer_channel:
         preferred = [
             post for post in candidates if prefer_channel in post.channels
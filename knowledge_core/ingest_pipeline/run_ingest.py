@@ -9,14 +9,17 @@ import uuid
 from pathlib import Path
 
 from knowledge_core.ingest_pipeline.graph_builder.pipeline import (
+    GRAPH_METHODS,
     DbConfig,
     apply_cli_embeddings,
     apply_cli_execution,
+    apply_cli_extract,
     apply_cli_graph,
     build_dsn,
     load_config,
     run_pipeline,
 )
+from knowledge_core.ingest_pipeline.graph_builder.quantization import QUANTIZATIONS
 from knowledge_core.ingest_pipeline.logging import log_error, log_event, setup_logging
 from knowledge_core.ingest_pipeline.metadata.metadata_ingest import run_metadata_stage
 from knowledge_core.ingest_pipeline.stages.edges_stage import run_edges_stage
@@ -37,8 +40,16 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument('--provider', type=str, default=None)
     parser.add_argument('--batch-size', type=int, default=None)
     parser.add_argument('--max-chars', type=int, default=None)
+    parser.add_argument('--dimensions', type=int, default=None)
+    parser.add_argument('--api-base', type=str, default=None)
+    parser.add_argument('--concurrency', type=int, default=None)
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--resume', type=str, default=None, metavar='RUN_ID')
     parser.add_argument('--k', type=int, default=None)
     parser.add_argument('--min-similarity', type=float, default=None)
+    parser.add_argument('--method', type=str, choices=GRAPH_METHODS, default=None)
+    parser.add_argument('--quantization', type=str, choices=QUANTIZATIONS, default=None)
+    parser.add_argument('--workers', type=int, default=None)
     parser.add_argument('--mode', type=str, choices=('incremental', 'full'), default=None)
     parser.add_argument('--min-posts', type=int, default=None)
     parser.add_argument('--dry-run', action='store_true')
@@ -57,9 +68,16 @@ def run_stage(stage: str, args: argparse.Namespace, run_id: str) -> None:
     embedding_config = apply_cli_embeddings(config.embeddings, args)
     graph_config = apply_cli_graph(config.graph, args)
     execution_config = apply_cli_execution(config.execution, args)
+    extract_config = apply_cli_extract(config.extract, args)
 
     if stage == 'metadata':
-        run_metadata_stage(source_root=source_root, dsn=build_dsn(), limit_posts=args.limit_posts, run_id=run_id)
+        run_metadata_stage(
+            source_root=source_root,
+            dsn=build_dsn(),
+            limit_posts=args.limit_posts,
+            run_id=run_id,
+            extract_cache_path=extract_config.cache_path,
+        )
         return
 
     if stage == 'embeddings':
@@ -69,11 +87,12 @@ def run_stage(stage: str, args: argparse.Namespace, run_id: str) -> None:
             embedding_config=embedding_config,
             graph_config=graph_config,
             execution_config=execution_config,
-            extract_config=config.extract,
+            extract_config=extract_config,
             full_rebuild=False,
             run_id=run_id,
             run_embeddings=True,
             run_edges=False,
+            resume=args.resume is not None,
         )
         return
 
@@ -95,7 +114,7 @@ def run_stage(stage: str, args: argparse.Namespace, run_id: str) -> None:
 def main() -> None:
     args = parse_args()
     setup_logging(logging.DEBUG if args.debug else logging.INFO)
-    run_id = uuid.uuid4().hex[:8]
+    run_id = args.resume or uuid.uuid4().hex[:8]
     log_event(logger, run_id, 'start', 'запуск ingest orchestrator', stage=args.stage)
 
     try:
@@ -10,17 +10,18 @@ from pathlib import Path
 import psycopg2
 
 from knowledge_core.ingest_pipeline.graph_builder.pipeline import (
+    GRAPH_METHODS,
     DbConfig,
     apply_cli_embeddings,
     apply_cli_execution,
     apply_cli_graph,
-    build_similarity_edges,
     build_dsn,
-    clear_edges,
-    fetch_embeddings_for_edges,
     load_config,
-    persist_edges,
+    load_embeddings_for_edges,
+    rollback_edge_generation,
+    sync_edges,
 )
+from knowledge_core.ingest_pipeline.graph_builder.quantization import QUANTIZATIONS
 from knowledge_core.ingest_pipeline.logging import log_error, log_event, setup_logging
 
 logger = logging.getLogger(__name__)
@@ -31,8 +32,12 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument('--config', type=Path, required=False)
     parser.add_argument('--k', type=int, default=None)
     parser.add_argument('--min-similarity', type=float, default=None)
+    parser.add_argument('--method', type=str, choices=GRAPH_METHODS, default=None)
+    parser.add_argument('--quantization', type=str, choices=QUANTIZATIONS, default=None)
+    parser.add_argument('--workers', type=int, default=None)
     parser.add_argument('--mode', type=str, choices=('incremental', 'full'), default=None)
     parser.add_argument('--full-rebuild', action='store_true')
+    parser.add_argument('--rollback', action='store_true')
     parser.add_argument('--debug', action='store_true')
     return parser.parse_args()
 
@@ -42,31 +47,40 @@ def run_edges_stage(db_config: DbConfig, graph_config, embedding_config, full_re
     log_event(logger, run_id, 'start', 'старт edges stage', stage='edges')
     with psycopg2.connect(db_config.dsn) as conn:
         conn.autocommit = False
-        embeddings = fetch_embeddings_for_edges(
+        embeddings = load_embeddings_for_edges(
             conn,
+            embedding_config,
             doc_type=graph_config.doc_type,
-            model=embedding_config.model,
+            run_id=run_id,
+            quantization=graph_config.quantization if graph_config.method == 'topk' else 'none',
         )
         log_event(logger, run_id, 'embeddings', 'подготовлены embeddings для построения рёбер', stage='edges', docs_count=len(embeddings), model=embedding_config.model)
-        if full_rebuild:
-            clear_edges(conn, graph_config)
-
-        edges = build_similarity_edges(embeddings, graph_config)
-        log_event(logger, run_id, 'edges', 'рёбра рассчитаны', stage='edges', edges_count=len(edges), top_k=graph_config.k, min_similarity=graph_config.min_similarity)
-        written = persist_edges(
+        edges, delta = sync_edges(
             conn,
-            edges,
+            embeddings,
             graph_config=graph_config,
-            affected_doc_ids={record.doc_id for record in embeddings},
             full_rebuild=full_rebuild,
+            run_id=run_id,
         )
+        log_event(logger, run_id, 'edges', 'рёбра рассчитаны', stage='edges', edges_count=len(edges), method=graph_config.method, top_k=graph_config.k, min_similarity=graph_config.min_similarity)
+        log_event(logger, run_id, 'persist', 'рёбра записаны', stage='edges', inserted=len(delta.inserts), updated=len(delta.updates), deleted=len(delta.deletes))
         conn.commit()
 
+    written = len(delta.inserts) + len(delta.updates) + len(delta.deletes)
+
     duration_ms = int((time.time() - started) * 1000)
     log_event(logger, run_id, 'done', 'edges stage done', stage='edges', rows=written, duration_ms=duration_ms)
     return written
 
 
+def run_edges_rollback(db_config: DbConfig, graph_config, run_id: str) -> None:
+    with psycopg2.connect(db_config.dsn) as conn:
+        conn.autocommit = False
+        current, previous = rollback_edge_generation(conn, graph_config)
+        conn.commit()
+    log_event(logger, run_id, 'done', 'рёбра откачены на предыдущее поколение', stage='edges', method=graph_config.method, rolled_back=current, generation=previous)
+
+
 def main() -> None:
     args = parse_args()
     setup_logging(logging.DEBUG if args.debug else logging.INFO)
@@ -78,6 +92,9 @@ def main() -> None:
         embedding_config = apply_cli_embeddings(config.embeddings, args)
         graph_config = apply_cli_graph(config.graph, args)
         execution_config = apply_cli_execution(config.execution, args)
+        if args.rollback:
+            run_edges_rollback(DbConfig(dsn=build_dsn()), graph_config, run_id)
+            return
         run_edges_stage(
             db_config=DbConfig(dsn=build_dsn()),
             graph_config=graph_config,
@@ -10,6 +10,7 @@ from knowledge_core.ingest_pipeline.graph_builder.pipeline import (
     DbConfig,
     apply_cli_embeddings,
     apply_cli_execution,
+    apply_cli_extract,
     apply_cli_graph,
     load_config,
     run_pipeline,
@@ -28,6 +29,11 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument('--provider', type=str, default=None)
     parser.add_argument('--batch-size', type=int, default=None)
     parser.add_argument('--max-chars', type=int, default=None)
+    parser.add_argument('--dimensions', type=int, default=None)
+    parser.add_argument('--api-base', type=str, default=None)
+    parser.add_argument('--concurrency', type=int, default=None)
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--resume', type=str, default=None, metavar='RUN_ID')
     parser.add_argument('--limit-posts', type=int, default=None)
     parser.add_argument('--mode', type=str, choices=('incremental', 'full'), default=None)
     parser.add_argument('--dry-run', action='store_true')
@@ -40,7 +46,7 @@ def parse_args() -> argparse.Namespace:
 def main() -> None:
     args = parse_args()
     setup_logging(logging.DEBUG if args.debug else logging.INFO)
-    run_id = uuid.uuid4().hex[:8]
+    run_id = args.resume or uuid.uuid4().hex[:8]
 
     source_root = args.source_root or (
         Path(__file__).resolve().parents[2] / 'source_of_truth' / 'docs' / 'publications' / 'blogs'
@@ -59,11 +65,12 @@ def main() -> None:
             embedding_config=embedding_config,
             graph_config=graph_config,
             execution_config=execution_config,
-            extract_config=config.extract,
+            extract_config=apply_cli_extract(config.extract, args),
             full_rebuild=False,
             run_id=run_id,
             run_embeddings=True,
             run_edges=False,
+            resume=args.resume is not None,
         )
     except Exception as exc:
         log_error(logger, run_id, 'embeddings', f'embeddings stage failed: {exc}')
@@ -0,0 +1,42 @@
+import threading
+import unittest
+
+from knowledge_core.ingest_pipeline.graph_builder.writer import BackgroundWriter
+
+
+class BackgroundWriterTests(unittest.TestCase):
+    def test_writes_in_order_with_bounded_queue(self):
+        release = threading.Event()
+        written = []
+
+        def write(item):
+            release.wait(5)
+            written.append(item)
+
+        writer = BackgroundWriter(write, max_pending=1)
+        writer.submit(1)
+        writer.submit(2)
+        blocked = threading.Thread(target=writer.submit, args=(3,))
+        blocked.start()
+        blocked.join(0.2)
+        # Первый элемент в записи, второй в очереди — третий ждёт места.
+        self.assertTrue(blocked.is_alive())
+        release.set()
+        blocked.join(5)
+        writer.close()
+
+        self.assertEqual(written, [1, 2, 3])
+        self.assertEqual(writer.stats()['writes'], 3)
+
+    def test_write_error_is_raised_to_producer(self):
+        def write(item):
+            raise RuntimeError(f'запись {item} не удалась')
+
+        writer = BackgroundWriter(write)
+        writer.submit('a')
+        with self.assertRaisesRegex(RuntimeError, 'запись a'):
+            writer.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
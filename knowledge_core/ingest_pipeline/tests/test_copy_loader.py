@@ -0,0 +1,69 @@
+import io
+import struct
+import unittest
+
+import numpy as np
+
+from knowledge_core.ingest_pipeline.graph_builder.copy_loader import (
+    PGCOPY_HEADER,
+    PGCOPY_TRAILER,
+    ChunkStream,
+    encode_rows,
+)
+from knowledge_core.ingest_pipeline.graph_builder.vector_codec import decode_vector, encode_halfvec, encode_vector
+
+
+def decode_payload(payload):
+    assert payload.startswith(PGCOPY_HEADER) and payload.endswith(PGCOPY_TRAILER)
+    offset = len(PGCOPY_HEADER)
+    rows = []
+    while offset < len(payload) - len(PGCOPY_TRAILER):
+        (field_count,) = struct.unpack_from('>h', payload, offset)
+        offset += 2
+        fields = []
+        for _ in range(field_count):
+            (size,) = struct.unpack_from('>i', payload, offset)
+            offset += 4
+            if size < 0:
+                fields.append(None)
+                continue
+            fields.append(payload[offset : offset + size])
+            offset += size
+        rows.append(fields)
+    return rows
+
+
+class CopyLoaderTests(unittest.TestCase):
+    def test_binary_rows_roundtrip(self) -> None:
+        rows = [('doc-ё', 0.125, 7, 2**40, [0.5, -1.25, 3.0]), ('b', None, -1, 0, np.zeros(2))]
+        types = ['text', 'double precision', 'integer', 'bigint', 'vector']
+        payload = io.BufferedReader(ChunkStream(encode_rows(rows, types))).read()
+
+        first, second = decode_payload(payload)
+        self.assertEqual(first[0].decode('utf-8'), 'doc-ё')
+        self.assertEqual(struct.unpack('>d', first[1])[0], 0.125)
+        self.assertEqual(struct.unpack('>i', first[2])[0], 7)
+        self.assertEqual(struct.unpack('>q', first[3])[0], 2**40)
+        self.assertEqual(struct.unpack('>HH', first[4][:4]), (3, 0))
+        self.assertEqual(np.frombuffer(first[4][4:], dtype='>f4').tolist(), [0.5, -1.25, 3.0])
+        self.assertIsNone(second[1])
+        self.assertEqual(struct.unpack('>HH', second[4][:4]), (2, 0))
+
+    def test_vector_codec_is_lossless_for_float32(self) -> None:
+        vector = np.random.default_rng(3).standard_normal(3072).astype(np.float32)
+        decoded = decode_vector(memoryview(encode_vector(vector)))
+        self.assertEqual(decoded.dtype, np.float32)
+        np.testing.assert_array_equal(decoded, vector)
+        with self.assertRaises(ValueError):
+            decode_vector(encode_vector(vector)[:-4])
+
+    def test_halfvec_codec_uses_float16_wire_format(self) -> None:
+        payload = encode_halfvec([1.0, -0.5, 0.25])
+        self.assertEqual(struct.unpack('>HH', payload[:4]), (3, 0))
+        self.assertEqual(np.frombuffer(payload[4:], dtype='>f2').tolist(), [1.0, -0.5, 0.25])
+        with self.assertRaises(ValueError):
+            encode_halfvec([1e6])
+
+
+if __name__ == '__main__':
+    unittest.main()
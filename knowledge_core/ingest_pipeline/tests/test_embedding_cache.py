@@ -0,0 +1,57 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from knowledge_core.ingest_pipeline.graph_builder.embedding_cache import EmbeddingCache, text_key
+
+
+class EmbeddingCacheTests(unittest.TestCase):
+    def test_roundtrip_is_scoped_by_model_and_survives_reopen(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'cache.sqlite'
+            key = text_key('Заголовок\n\nТекст поста')
+            with EmbeddingCache(path, 'openai', 'text-embedding-3-large') as cache:
+                cache.put_many({key: [0.25, -0.5, 1.0]})
+
+            with EmbeddingCache(path, 'openai', 'text-embedding-3-large') as cache:
+                found = cache.get_many([key, text_key('другой текст')])
+                self.assertEqual(list(found), [key])
+                np.testing.assert_allclose(found[key], [0.25, -0.5, 1.0])
+                self.assertEqual(cache.stats()['cache_hits'], 1)
+                self.assertEqual(cache.stats()['cache_misses'], 1)
+
+            with EmbeddingCache(path, 'openai', 'text-embedding-3-small') as cache:
+                self.assertEqual(cache.get_many([key]), {})
+
+    def test_eviction_drops_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            # Один вектор из 4 float32 — 16 байт, в кеш помещаются два.
+            with EmbeddingCache(Path(tmp) / 'cache.sqlite', 'openai', 'm', max_bytes=32) as cache:
+                cache.put_many({'a': [1, 0, 0, 0]})
+                cache.put_many({'b': [0, 1, 0, 0]})
+                cache.get_many(['a'])
+                cache.put_many({'c': [0, 0, 1, 0]})
+
+                self.assertEqual(sorted(cache.get_many(['a', 'b', 'c'])), ['a', 'c'])
+                self.assertEqual(cache.stats()['cache_evicted'], 1)
+
+    def test_size_total_tracks_inserts_updates_and_evictions(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'cache.sqlite'
+            with EmbeddingCache(path, 'openai', 'm', max_bytes=40) as cache:
+                cache.put_many({'a': [1, 0, 0, 0], 'b': [0, 1]})
+                cache.put_many({'b': [0, 1, 0, 0]})
+                cache.put_many({'c': [0, 0, 1, 0]})
+                self.assertEqual(cache.stats()['cache_evicted'], 1)
+
+            with EmbeddingCache(path, 'openai', 'm') as cache:
+                conn = cache._conn
+                total = conn.execute('SELECT total FROM embedding_cache_size').fetchone()[0]
+                self.assertEqual(total, conn.execute('SELECT SUM(size) FROM embedding_cache').fetchone()[0])
+                self.assertEqual(total, 32)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,212 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from knowledge_core.ingest_pipeline.graph_builder.embedding_client import (
+    AdaptiveBatchSize,
+    EmbeddingHTTPError,
+    RateLimiter,
+    RetryPolicy,
+    embed_in_order,
+    parse_duration,
+    parse_retry_after,
+)
+
+
+class FakeProvider:
+    def __init__(self, delays=None, failures=None):
+        self.delays = delays or {}
+        self.failures = dict(failures or {})
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def embed_texts(self, texts):
+        with self._lock:
+            self.calls.append(list(texts))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            failure = self.failures.pop(texts[0], None)
+        try:
+            time.sleep(self.delays.get(texts[0], 0.0))
+            if failure is not None:
+                raise failure
+            return [[float(len(text))] for text in texts]
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def run(provider, texts, batch_size=1, **kwargs):
+    committed = []
+    options = {
+        'concurrency': 4,
+        'limiter': None,
+        'retry': RetryPolicy(base_delay=0.01),
+        'fail_fast': False,
+        'run_id': 'test',
+        'sizer': AdaptiveBatchSize(batch_size),
+    }
+    options.update(kwargs)
+    embed_in_order(
+        provider,
+        texts,
+        texts,
+        lambda start, vectors: committed.append((start, vectors)),
+        **options,
+    )
+    return committed
+
+
+class EmbeddingClientTests(unittest.TestCase):
+    def test_batches_run_concurrently_and_commit_in_order(self) -> None:
+        provider = FakeProvider(delays={'a': 0.2, 'bb': 0.01, 'ccc': 0.05})
+        committed = run(provider, ['a', 'bb', 'ccc', 'dddd'])
+        self.assertEqual([index for index, _ in committed], [0, 1, 2, 3])
+        self.assertEqual([vectors for _, vectors in committed], [[[1.0]], [[2.0]], [[3.0]], [[4.0]]])
+        self.assertGreater(provider.max_in_flight, 1)
+
+    def test_dispatch_stops_while_head_batch_is_uncommitted(self) -> None:
+        provider = FakeProvider(delays={'head': 0.3})
+        sent_before_head = []
+        texts = ['head'] + [f'doc-{idx}' for idx in range(200)]
+        embed_in_order(
+            provider,
+            texts,
+            texts,
+            lambda start, vectors: sent_before_head.append(len(provider.calls)) if start == 0 else None,
+            concurrency=4,
+            limiter=None,
+            retry=RetryPolicy(base_delay=0.01),
+            fail_fast=False,
+            run_id='test',
+            sizer=AdaptiveBatchSize(1),
+            window=6,
+        )
+        self.assertLessEqual(sent_before_head[0], 6)
+        self.assertEqual(len(provider.calls), len(texts))
+
+    def test_async_commit_keeps_loop_running_within_window(self) -> None:
+        provider = FakeProvider()
+        seen = []
+
+        async def commit(start, vectors):
+            if start == 0:
+                await asyncio.sleep(0.2)
+                seen.append(len(provider.calls))
+
+        texts = [f'doc-{idx}' for idx in range(50)]
+        embed_in_order(
+            provider,
+            texts,
+            texts,
+            commit,
+            concurrency=2,
+            limiter=None,
+            retry=RetryPolicy(base_delay=0.01),
+            fail_fast=False,
+            run_id='test',
+            sizer=AdaptiveBatchSize(1),
+            window=5,
+        )
+        # Пока первая запись ждёт, запросы в пределах окна продолжают отправляться — и не дальше.
+        self.assertEqual(seen, [5])
+        self.assertEqual(len(provider.calls), len(texts))
+
+    def test_retry_after_is_honoured(self) -> None:
+        provider = FakeProvider(failures={'a': EmbeddingHTTPError(429, 'slow down', retry_after=0.1)})
+        started = time.monotonic()
+        committed = run(provider, ['a', 'b'], batch_size=2)
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+        self.assertEqual(committed, [(0, [[1.0], [1.0]])])
+        self.assertEqual(len(provider.calls), 2)
+
+    def test_client_errors_are_not_retried(self) -> None:
+        provider = FakeProvider(failures={'a': EmbeddingHTTPError(400, 'bad input')})
+        with self.assertRaises(EmbeddingHTTPError):
+            run(provider, ['a'], retry=RetryPolicy(attempts=5, base_delay=0.01), fail_fast=True)
+        self.assertEqual(len(provider.calls), 1)
+
+    def test_poison_document_is_bisected_into_quarantine(self) -> None:
+        texts = ['a', 'b', 'c', 'poison', 'e', 'f', 'g', 'h']
+
+        class PoisonProvider(FakeProvider):
+            def embed_texts(self, texts):
+                self.calls.append(list(texts))
+                if 'poison' in texts:
+                    raise EmbeddingHTTPError(400, 'bad input')
+                return [[float(len(text))] for text in texts]
+
+        provider = PoisonProvider()
+        quarantined = []
+        sizer = AdaptiveBatchSize(8, increase=2)
+        committed = run(
+            provider,
+            texts,
+            concurrency=1,
+            sizer=sizer,
+            quarantine=lambda doc_id, exc: quarantined.append(doc_id),
+        )
+
+        self.assertEqual(quarantined, ['poison'])
+        vectors = [vector for _, batch in committed for vector in batch]
+        self.assertEqual(vectors, [[1.0], [1.0], [1.0], None, [1.0], [1.0], [1.0], [1.0]])
+        # 8 -> 4+4 -> 2+2 -> 1+1: четыре неудачных запроса на бисекцию, не падение всего запуска.
+        self.assertEqual(sum('poison' in call for call in provider.calls), 4)
+        # Четыре неудачи и три успеха: размер batch не застрял на единице.
+        self.assertEqual(sizer.current, 4)
+
+    def test_exhausted_retries_raise_instead_of_quarantine(self) -> None:
+        class DownProvider(FakeProvider):
+            def embed_texts(self, texts):
+                self.calls.append(list(texts))
+                raise EmbeddingHTTPError(503, 'unavailable')
+
+        provider = DownProvider()
+        quarantined = []
+        with self.assertRaises(EmbeddingHTTPError):
+            run(
+                provider,
+                [f'doc-{idx}' for idx in range(32)],
+                batch_size=8,
+                concurrency=1,
+                retry=RetryPolicy(attempts=3, base_delay=0.001),
+                quarantine=lambda doc_id, exc: quarantined.append(doc_id),
+            )
+        self.assertEqual(quarantined, [])
+        # Без бисекции и без новых batch-ей после сбоя головного: три попытки одного batch.
+        self.assertEqual(provider.calls, [[f'doc-{idx}' for idx in range(8)]] * 3)
+
+    def test_adaptive_batch_size_is_aimd(self) -> None:
+        sizer = AdaptiveBatchSize(64, increase=8)
+        sizer.failure()
+        sizer.failure()
+        self.assertEqual(sizer.current, 16)
+        for _ in range(3):
+            sizer.success()
+        self.assertEqual(sizer.current, 40)
+        for _ in range(10):
+            sizer.success()
+        self.assertEqual(sizer.current, 64)
+
+    def test_rate_limiter_buckets_and_headers(self) -> None:
+        now = [0.0]
+        limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600, clock=lambda: now[0])
+        self.assertEqual(limiter.reserve(10), 0.0)
+        self.assertAlmostEqual(limiter.reserve(595), 0.5)
+        now[0] = 10.0
+        self.assertEqual(limiter.reserve(1), 0.0)
+        limiter.observe({'x-ratelimit-remaining-tokens': '0', 'x-ratelimit-reset-tokens': '6m0s'})
+        self.assertAlmostEqual(limiter.reserve(1), 360.0)
+
+        self.assertEqual(parse_duration('1h2m3.5s'), 3723.5)
+        self.assertEqual(parse_duration('20ms'), 0.02)
+        self.assertEqual(parse_retry_after({'retry-after': '3'}), 3.0)
+        self.assertEqual(parse_retry_after({'retry-after-ms': '250'}), 0.25)
+        self.assertIsNone(parse_retry_after({}))
+
+
+if __name__ == '__main__':
+    unittest.main()
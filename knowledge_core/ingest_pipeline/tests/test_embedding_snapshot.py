@@ -0,0 +1,63 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from knowledge_core.ingest_pipeline.graph_builder.embedding_store import EmbeddingStore
+from knowledge_core.ingest_pipeline.graph_builder.quantization import QuantizedMatrix, quantized_topk_neighbours
+from knowledge_core.ingest_pipeline.graph_builder.snapshot import (
+    fingerprint_rows,
+    load_codes,
+    load_snapshot,
+    write_codes,
+    write_snapshot,
+)
+
+
+class EmbeddingSnapshotTests(unittest.TestCase):
+    def test_roundtrip_is_memory_mapped(self) -> None:
+        matrix = np.arange(1, 13, dtype=np.float64).reshape(3, 4) / 7
+        with tempfile.TemporaryDirectory() as tmp:
+            snapshot_dir = Path(tmp) / 'snapshots'
+            write_snapshot(snapshot_dir, 'post', 'text-embedding-3-large', ['a', 'b', 'c'], ['h1', 'h2', 'h3'], matrix)
+            snapshot = load_snapshot(snapshot_dir, 'post', 'text-embedding-3-large')
+            self.assertIsNotNone(snapshot)
+            self.assertIsInstance(snapshot.matrix, np.memmap)
+            self.assertEqual(snapshot.matrix.dtype, np.float32)
+            self.assertEqual(snapshot.doc_ids, ['a', 'b', 'c'])
+            expected = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+            np.testing.assert_allclose(snapshot.matrix, expected.astype(np.float32), rtol=1e-6)
+            store = EmbeddingStore(snapshot.doc_ids, snapshot.source_hashes, snapshot.matrix, normalized=True)
+            self.assertTrue(np.shares_memory(store.matrix, snapshot.matrix))
+            self.assertEqual(snapshot.fingerprint, fingerprint_rows([('c', 'h3'), ('a', 'h1'), ('b', 'h2')]))
+
+    def test_quantized_codes_are_reused_for_same_rows(self) -> None:
+        matrix = np.random.default_rng(3).normal(size=(60, 16))
+        with tempfile.TemporaryDirectory() as tmp:
+            snapshot_dir = Path(tmp)
+            doc_ids = [f'd{idx}' for idx in range(60)]
+            snapshot = write_snapshot(snapshot_dir, 'post', 'model', doc_ids, ['h'] * 60, matrix)
+            self.assertIsNone(load_codes(snapshot_dir, 'post', 'model', 'int8', snapshot))
+            write_codes(snapshot_dir, 'post', 'model', QuantizedMatrix(snapshot.matrix, 'int8'), snapshot)
+            codes = load_codes(snapshot_dir, 'post', 'model', 'int8', snapshot)
+            self.assertIsNotNone(codes)
+            expected = quantized_topk_neighbours(snapshot.matrix, 5, 0.0, 'int8')
+            actual = quantized_topk_neighbours(snapshot.matrix, 5, 0.0, 'int8', quantized=codes)
+            np.testing.assert_array_equal(expected[0], actual[0])
+            np.testing.assert_array_equal(expected[1], actual[1])
+            changed = write_snapshot(snapshot_dir, 'post', 'model', doc_ids, ['h2'] * 60, matrix)
+            self.assertIsNone(load_codes(snapshot_dir, 'post', 'model', 'int8', changed))
+
+    def test_missing_or_inconsistent_snapshot_is_ignored(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            snapshot_dir = Path(tmp)
+            self.assertIsNone(load_snapshot(snapshot_dir, 'post', 'model'))
+            write_snapshot(snapshot_dir, 'post', 'model', ['a'], ['h1'], np.ones((1, 2)))
+            write_snapshot(snapshot_dir, 'post', 'other', ['a', 'b'], ['h1', 'h2'], np.ones((2, 2)))
+            (snapshot_dir / 'post.other.npy').replace(snapshot_dir / 'post.model.npy')
+            self.assertIsNone(load_snapshot(snapshot_dir, 'post', 'model'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+import numpy as np
+
+from knowledge_core.ingest_pipeline.graph_builder.embedding_store import EmbeddingStore
+
+
+class EmbeddingStoreTests(unittest.TestCase):
+    def test_rows_are_packed_into_one_normalized_float32_buffer(self) -> None:
+        rows = [(f'doc-{idx}', f'h{idx}', [float(idx + 1), 0.0, 0.0]) for idx in range(1500)]
+        rows.append(('zero', 'h', [0.0, 0.0, 0.0]))
+
+        store = EmbeddingStore.from_rows(iter(rows), size_hint=10)
+
+        self.assertEqual(len(store), 1501)
+        self.assertEqual(store.matrix.dtype, np.float32)
+        self.assertTrue(store.matrix.flags.c_contiguous)
+        self.assertEqual(store.nbytes, 1501 * 3 * 4)
+        np.testing.assert_array_equal(store.vector('doc-7'), [1.0, 0.0, 0.0])
+        self.assertFalse(store.vector('zero').any())
+        self.assertEqual(store.source_hashes[store.row('doc-7')], 'h7')
+        self.assertIn('doc-1499', store)
+
+    def test_foreign_buffers_are_copied_not_modified(self) -> None:
+        matrix = np.array([[3.0, 4.0], [0.0, 2.0]], dtype=np.float32)
+        matrix.setflags(write=False)
+
+        store = EmbeddingStore(['a', 'b'], ['', ''], matrix)
+
+        np.testing.assert_allclose(store.matrix, [[0.6, 0.8], [0.0, 1.0]], rtol=1e-6)
+        np.testing.assert_array_equal(matrix, [[3.0, 4.0], [0.0, 2.0]])
+        with self.assertRaises(ValueError):
+            EmbeddingStore(['a', 'a'], ['', ''], matrix)
+        with self.assertRaises(ValueError):
+            EmbeddingStore.from_rows([('a', '', [1.0, 0.0]), ('b', '', [1.0])])
+
+
+if __name__ == '__main__':
+    unittest.main()
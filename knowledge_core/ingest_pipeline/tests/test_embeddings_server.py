@@ -0,0 +1,79 @@
+import unittest
+
+import numpy as np
+
+from knowledge_core.ingest_pipeline.graph_builder.embedding_client import (
+    AdaptiveBatchSize,
+    EmbeddingHTTPError,
+    RetryPolicy,
+    embed_in_order,
+)
+from knowledge_core.ingest_pipeline.graph_builder.embeddings_server import StandInConfig, running_server
+from knowledge_core.ingest_pipeline.graph_builder.pipeline import OpenAIEmbeddingProvider
+
+API_KEY = 'sk-' + 'x' * 32
+
+
+class EmbeddingsServerTests(unittest.TestCase):
+    def test_provider_talks_to_stand_in(self) -> None:
+        with running_server(StandInConfig(dimensions=16)) as server:
+            with OpenAIEmbeddingProvider('text-embedding-3-small', 8, API_KEY, api_base=server.base_url) as provider:
+                vectors = provider.embed_texts(['первый', 'второй'])
+            with OpenAIEmbeddingProvider(
+                'text-embedding-3-small', 8, API_KEY, dimensions=4, api_base=server.base_url
+            ) as provider:
+                shortened = provider.embed_texts(['первый'])
+        self.assertEqual([len(vector) for vector in vectors], [16, 16])
+        self.assertEqual(len(shortened[0]), 4)
+
+    def test_base64_and_float_responses_match(self) -> None:
+        texts = ['первый документ', 'второй документ']
+        with running_server(StandInConfig(dimensions=3072)) as server:
+            with OpenAIEmbeddingProvider('text-embedding-3-large', 8, API_KEY, api_base=server.base_url) as provider:
+                packed = provider.embed_texts(texts)
+            with OpenAIEmbeddingProvider(
+                'text-embedding-3-large', 8, API_KEY, api_base=server.base_url, encoding_format='float'
+            ) as provider:
+                plain = provider.embed_texts(texts)
+        self.assertEqual(packed[0].dtype, np.float32)
+        np.testing.assert_array_equal(np.asarray(packed), np.asarray(plain, dtype=np.float32))
+
+    def test_faults_are_retried_and_oversized_input_is_quarantined(self) -> None:
+        config = StandInConfig(rate_429=0.2, rate_500=0.1, retry_after=0.0, max_input_tokens=50, seed=3)
+        texts = [f'документ номер {idx}' for idx in range(40)]
+        texts[17] = 'слово ' * 200
+        results = {}
+        quarantined = {}
+
+        def commit(start, vectors):
+            for offset, vector in enumerate(vectors):
+                results[start + offset] = vector
+
+        with running_server(config) as server:
+            with OpenAIEmbeddingProvider('text-embedding-3-small', 8, API_KEY, api_base=server.base_url) as provider:
+                embed_in_order(
+                    provider,
+                    texts,
+                    [str(idx) for idx in range(len(texts))],
+                    commit,
+                    concurrency=4,
+                    limiter=None,
+                    retry=RetryPolicy(attempts=10, base_delay=0.001, max_delay=0.01),
+                    fail_fast=False,
+                    run_id='test',
+                    sizer=AdaptiveBatchSize(8),
+                    quarantine=lambda doc_id, exc: quarantined.setdefault(doc_id, exc),
+                )
+            counts = dict(server.state.counts)
+
+        self.assertEqual(sorted(results), list(range(len(texts))))
+        self.assertIsNone(results[17])
+        self.assertTrue(all(results[idx] is not None for idx in results if idx != 17))
+        self.assertEqual(list(quarantined), ['17'])
+        self.assertIsInstance(quarantined['17'], EmbeddingHTTPError)
+        self.assertEqual(quarantined['17'].status, 400)
+        self.assertGreater(counts['429'] + counts['500'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from knowledge_core.ingest_pipeline.posts import ExtractCache, extract_publish_posts, open_extract_cache
+
+# Минимальный пост: для кеша важны только путь, mtime и тело.
+POST = '---\ntype: post\nadministrative:\n  id: cache-001\n  status: publish\n  date_ymd: 2024-06-01\ndescriptive:\n  title: Кеш\n---\n{body}\n'
+
+
+def write_post(root, body='Тело поста.'):
+    path = Path(root) / 'blog' / 'post.md'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(POST.format(body=body), encoding='utf-8')
+    return path
+
+
+class ExtractCacheTests(unittest.TestCase):
+    def test_repeat_run_reads_from_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp) / 'src'
+            cache_path = Path(tmp) / 'extract.sqlite'
+            path = write_post(root)
+            (root / 'blog' / 'draft.md').write_text('---\ntype: note\n---\nчерновик\n', encoding='utf-8')
+            expected = extract_publish_posts(root)
+
+            with open_extract_cache(cache_path) as cache:
+                first = extract_publish_posts(root, cache=cache)
+                self.assertEqual(cache.stats()['extract_cache_stored'], 2)
+            with open_extract_cache(cache_path) as cache:
+                second = extract_publish_posts(root, cache=cache)
+                self.assertEqual(cache.stats()['extract_cache_hits'], 2)
+
+            stat = path.stat()
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            with open_extract_cache(cache_path) as cache:
+                touched = extract_publish_posts(root, cache=cache)
+                self.assertEqual(cache.stats()['extract_cache_verified'], 1)
+
+            write_post(root, body='Новое тело поста, длиннее прежнего.')
+            with open_extract_cache(cache_path) as cache:
+                edited = extract_publish_posts(root, cache=cache)
+                self.assertEqual(cache.stats()['extract_cache_misses'], 1)
+
+            with ExtractCache(cache_path, version=-1) as cache:
+                self.assertEqual(extract_publish_posts(root, cache=cache), edited)
+                self.assertEqual(cache.stats()['extract_cache_hits'], 0)
+
+        self.assertEqual(first, expected)
+        self.assertEqual(second, expected)
+        self.assertEqual(touched, expected)
+        self.assertNotEqual(edited[0].text_for_embedding, expected[0].text_for_embedding)
+
+    def test_scan_prunes_removed_files_of_its_root(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp) / 'src'
+            other = Path(tmp) / 'src-other'
+            cache_path = Path(tmp) / 'extract.sqlite'
+            path = write_post(root)
+            write_post(other)
+            with open_extract_cache(cache_path) as cache:
+                extract_publish_posts(root, cache=cache)
+                extract_publish_posts(other, cache=cache)
+
+            path.rename(path.with_name('renamed.md'))
+            with open_extract_cache(cache_path) as cache:
+                posts = extract_publish_posts(root, cache=cache)
+                self.assertEqual(cache.stats()['extract_cache_pruned'], 1)
+            with open_extract_cache(cache_path) as cache:
+                extract_publish_posts(other, cache=cache)
+                self.assertEqual(cache.stats()['extract_cache_hits'], 1)
+                self.assertEqual(cache.stats()['extract_cache_pruned'], 0)
+
+        self.assertEqual([post.source_path for post in posts], [str(root / 'blog' / 'renamed.md')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from knowledge_core.ingest_pipeline.graph_builder.http_session import HttpSession
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        payload = json.dumps({'path': self.path, 'size': len(body)}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class HttpSessionTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), EchoHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}/v1'
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_is_reused_across_requests(self) -> None:
+        with HttpSession(self.base_url) as session:
+            for _ in range(5):
+                response = session.request('POST', '/embeddings', b'{}', {'Content-Type': 'application/json'})
+                self.assertEqual(response.status, 200)
+                self.assertEqual(json.loads(response.body), {'path': '/v1/embeddings', 'size': 2})
+            stats = session.stats()
+        self.assertEqual(stats['http_requests'], 5)
+        self.assertEqual(stats['http_connections'], 1)
+        self.assertEqual(stats['http_reused'], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
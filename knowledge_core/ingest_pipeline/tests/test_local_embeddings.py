@@ -0,0 +1,35 @@
+import unittest
+
+import numpy as np
+
+from knowledge_core.ingest_pipeline.graph_builder.local_embeddings import HashingEmbedder
+from knowledge_core.ingest_pipeline.graph_builder.pipeline import EmbeddingConfig, build_provider
+
+
+class LocalEmbeddingsTests(unittest.TestCase):
+    def test_vectors_are_deterministic_and_normalized(self) -> None:
+        texts = ['Граф знаний и embeddings', 'совсем другой текст', '']
+        first = HashingEmbedder(64).embed(texts)
+        second = HashingEmbedder(64).embed(list(reversed(texts)))[::-1]
+
+        self.assertEqual(first.shape, (3, 64))
+        self.assertEqual(first.dtype, np.float32)
+        np.testing.assert_array_equal(first, second)
+        np.testing.assert_allclose(np.linalg.norm(first[:2], axis=1), 1.0, rtol=1e-6)
+        self.assertFalse(first[2].any())
+
+    def test_shared_words_mean_higher_similarity(self) -> None:
+        vectors = HashingEmbedder(256).embed(
+            ['графы знаний в ingest пайплайне', 'ingest пайплайн строит графы знаний', 'рецепт борща со сметаной']
+        )
+        self.assertGreater(float(vectors[0] @ vectors[1]), float(vectors[0] @ vectors[2]))
+
+    def test_local_provider_requires_local_model_name(self) -> None:
+        provider = build_provider(EmbeddingConfig(model='local-hash-v1', batch_size=8, provider='local', dimensions=32))
+        self.assertEqual(len(provider.embed_texts(['a b'])[0]), 32)
+        with self.assertRaises(ValueError):
+            build_provider(EmbeddingConfig(model='text-embedding-3-large', batch_size=8, provider='local'))
+
+
+if __name__ == '__main__':
+    unittest.main()
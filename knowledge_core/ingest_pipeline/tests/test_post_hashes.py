@@ -0,0 +1,70 @@
+import hashlib
+import tempfile
+import unittest
+from pathlib import Path
+
+from knowledge_core.ingest_pipeline.graph_builder.pipeline import embedding_content_hash
+from knowledge_core.ingest_pipeline.posts import extract_publish_posts, materialize_posts, scan_publish_posts
+
+POST = """---
+type: post
+administrative:
+  id: post-001
+  status: publish
+  date_ymd: 2024-05-01
+  channels: [{channel}]
+descriptive:
+  title: Заметка о внимании
+  taxonomy:
+    rubric_ids: [{rubric}]
+---
+# Внимание
+
+{body}
+"""
+
+
+def extract(tmp, **fields):
+    values = {'channel': 'detai_site_blog', 'rubric': 'r1', 'body': 'Тело поста.'}
+    values.update(fields)
+    (Path(tmp) / 'post.md').write_text(POST.format(**values), encoding='utf-8')
+    return extract_publish_posts(Path(tmp))[0]
+
+
+class PostHashTests(unittest.TestCase):
+    def test_metadata_edit_keeps_content_hash(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            base = extract(tmp)
+            retagged = extract(tmp, rubric='r2', channel='other')
+            edited = extract(tmp, body='Новое тело поста.')
+
+        def content_hash(post, dimensions=None):
+            return embedding_content_hash(post.text_for_embedding, 'text-embedding-3-small', dimensions)
+
+        self.assertNotEqual(base.source_hash, retagged.source_hash)
+        self.assertEqual(content_hash(base), content_hash(retagged))
+        self.assertNotEqual(base.metadata_hash, retagged.metadata_hash)
+        self.assertNotEqual(content_hash(base), content_hash(edited))
+        self.assertNotEqual(content_hash(base), content_hash(base, dimensions=256))
+        self.assertEqual(base.metadata_hash, edited.metadata_hash)
+
+    def test_scan_hashes_file_without_parsing_body(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'post.md'
+            raw = POST.format(channel='detai_site_blog', rubric='r1', body='Тело.\n' * 50000)
+            path.write_bytes(raw.replace('\n', '\r\n').encode('utf-8'))
+            headers = scan_publish_posts(Path(tmp))
+            posts = materialize_posts(headers)
+            expected = extract_publish_posts(Path(tmp))
+
+        self.assertEqual(posts, expected)
+        self.assertEqual(headers[0].source_hash, posts[0].source_hash)
+        self.assertEqual(
+            headers[0].source_hash,
+            hashlib.sha256(raw.replace('\r\n', '\n').encode('utf-8')).hexdigest(),
+        )
+        self.assertEqual(headers[0].metadata_hash, posts[0].metadata_hash)
+
+
+if __name__ == '__main__':
+    unittest.main()
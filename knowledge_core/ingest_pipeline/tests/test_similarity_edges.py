@@ -0,0 +1,208 @@
+import random
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from knowledge_core.ingest_pipeline.graph_builder import hnsw, parallel
+from knowledge_core.ingest_pipeline.graph_builder.pipeline import (
+    EmbeddingRecord,
+    GraphConfig,
+    build_neighbour_lists,
+    build_similarity_edges,
+    build_similarity_edges_python,
+    diff_edges,
+    edges_from_neighbour_lists,
+    prune_edges,
+    update_neighbour_lists,
+)
+from knowledge_core.ingest_pipeline.graph_builder.similarity import topk_neighbours
+
+
+def as_map(edges):
+    return {(a, b): weight for a, b, weight in edges}
+
+
+class SimilarityEdgesTests(unittest.TestCase):
+    def assert_same_edges(self, embeddings, graph_config):
+        expected = as_map(build_similarity_edges_python(embeddings, graph_config))
+        actual = as_map(build_similarity_edges(embeddings, graph_config))
+        self.assertEqual(expected.keys(), actual.keys())
+        for key, weight in expected.items():
+            self.assertAlmostEqual(weight, actual[key], places=6)
+
+    def test_matches_python_engine_on_random_vectors(self) -> None:
+        rng = random.Random(7)
+        embeddings = [
+            EmbeddingRecord(doc_id=f'doc-{idx:03d}', source_hash='', vector=[rng.gauss(0, 1) for _ in range(16)])
+            for idx in range(120)
+        ]
+        for k, min_similarity in ((3, 0.0), (8, 0.2), (50, -1.0)):
+            self.assert_same_edges(embeddings, GraphConfig(k=k, min_similarity=min_similarity))
+
+    def test_ties_are_broken_by_document_order(self) -> None:
+        # Одинаковые векторы дают точные совпадения весов на границе top-k.
+        vectors = [[1.0, 0.0], [1.0, 0.0], [1.0, 0.0], [1.0, 0.0], [0.0, 1.0], [1.0, 1.0], [1.0, 1.0]]
+        embeddings = [
+            EmbeddingRecord(doc_id=f'doc-{idx}', source_hash='', vector=vector)
+            for idx, vector in enumerate(vectors)
+        ]
+        for k in (1, 2, 3):
+            self.assert_same_edges(embeddings, GraphConfig(k=k, min_similarity=0.0))
+
+    def test_zero_vectors_and_empty_input(self) -> None:
+        embeddings = [
+            EmbeddingRecord(doc_id='a', source_hash='', vector=[0.0, 0.0]),
+            EmbeddingRecord(doc_id='b', source_hash='', vector=[1.0, 0.0]),
+        ]
+        self.assert_same_edges(embeddings, GraphConfig(k=2, min_similarity=0.0))
+        self.assertEqual(build_similarity_edges([], GraphConfig(k=2, min_similarity=0.0)), [])
+
+    def test_hnsw_method_recovers_exact_neighbours(self) -> None:
+        rng = random.Random(11)
+        embeddings = [
+            EmbeddingRecord(doc_id=f'doc-{idx:03d}', source_hash='', vector=[rng.gauss(0, 1) for _ in range(8)])
+            for idx in range(300)
+        ]
+        exact = as_map(build_similarity_edges(embeddings, GraphConfig(k=5, min_similarity=0.0)))
+        approx = as_map(build_similarity_edges(embeddings, GraphConfig(k=5, min_similarity=0.0, method='hnsw')))
+        recall = len(exact.keys() & approx.keys()) / len(exact)
+        self.assertGreaterEqual(recall, 0.9)
+        for key in exact.keys() & approx.keys():
+            self.assertAlmostEqual(exact[key], approx[key], places=6)
+
+    @unittest.skipUnless(hnsw.hnswlib is not None, 'hnswlib не установлен')
+    def test_hnswlib_backend_matches_exact_topk(self) -> None:
+        rng = np.random.default_rng(13)
+        matrix = rng.normal(size=(400, 16)).astype(np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.assertEqual(hnsw.approximate_backend(), 'hnswlib')
+        exact, _ = topk_neighbours(matrix, 5, 0.0)
+        approx, weights = hnsw.hnswlib_neighbours(matrix, 5, 0.0, m=16, ef_construction=200, ef_search=200, seed=42)
+        self.assertEqual(approx.shape, exact.shape)
+        self.assertFalse((approx == np.arange(400)[:, None]).any())
+        hits = sum(len(set(exact[row]) & set(approx[row])) for row in range(400))
+        self.assertGreaterEqual(hits / exact.size, 0.95)
+        rows, cols = np.nonzero(approx >= 0)
+        expected = np.sum(matrix[rows] * matrix[approx[rows, cols]], axis=1)
+        np.testing.assert_allclose(weights[rows, cols], expected, atol=1e-5)
+
+    def test_partition_fallback_recovers_exact_neighbours(self) -> None:
+        rng = np.random.default_rng(19)
+        matrix = rng.normal(size=(400, 8)).astype(np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        exact, _ = topk_neighbours(matrix, 5, 0.0)
+        approx, _ = hnsw.partition_neighbours(matrix, 5, 0.0, probes=16, seed=42)
+        hits = sum(len(set(exact[row][exact[row] >= 0]) & set(approx[row])) for row in range(400))
+        self.assertGreaterEqual(hits / np.count_nonzero(exact >= 0), 0.9)
+
+    def test_process_pool_matches_single_process_topk(self) -> None:
+        rng = np.random.default_rng(17)
+        matrix = rng.standard_normal((120, 16)).astype(np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        expected = topk_neighbours(matrix, 5, 0.1)
+        with (
+            mock.patch.object(parallel, 'PARALLEL_MIN_ROWS', 16),
+            mock.patch.object(parallel.os, 'cpu_count', return_value=4),
+            mock.patch.object(parallel, 'ProcessPoolExecutor', wraps=parallel.ProcessPoolExecutor) as pool,
+        ):
+            actual = parallel.parallel_topk_neighbours(matrix, 5, 0.1, workers=2)
+        pool.assert_called_once()
+        np.testing.assert_array_equal(expected[0], actual[0])
+        np.testing.assert_array_equal(expected[1], actual[1])
+
+    def test_quantized_topk_keeps_exact_weights(self) -> None:
+        rng = random.Random(13)
+        embeddings = [
+            EmbeddingRecord(doc_id=f'doc-{idx:03d}', source_hash='', vector=[rng.gauss(0, 1) for _ in range(32)])
+            for idx in range(200)
+        ]
+        exact = as_map(build_similarity_edges(embeddings, GraphConfig(k=5, min_similarity=0.0)))
+        for quantization, rescore, expected_recall in (('int8', 4, 0.95), ('binary', 8, 0.8)):
+            graph_config = GraphConfig(k=5, min_similarity=0.0, quantization=quantization, rescore=rescore)
+            approx = as_map(build_similarity_edges(embeddings, graph_config))
+            recall = len(exact.keys() & approx.keys()) / len(exact)
+            self.assertGreaterEqual(recall, expected_recall, quantization)
+            for key in exact.keys() & approx.keys():
+                self.assertAlmostEqual(exact[key], approx[key], places=6)
+
+    def test_incremental_update_matches_full_rebuild(self) -> None:
+        rng = random.Random(5)
+        embeddings = [
+            EmbeddingRecord(doc_id=f'doc-{idx:03d}', source_hash='v1', vector=[rng.gauss(0, 1) for _ in range(8)])
+            for idx in range(150)
+        ]
+        graph_config = GraphConfig(k=5, min_similarity=0.3)
+        lists = build_neighbour_lists(embeddings, graph_config)
+        edge_state = {record.doc_id: (record.source_hash, lists[record.doc_id]) for record in embeddings}
+
+        updated = list(embeddings[1:])
+        updated[10] = EmbeddingRecord(doc_id=updated[10].doc_id, source_hash='v2', vector=[rng.gauss(0, 1) for _ in range(8)])
+        updated.append(EmbeddingRecord(doc_id='doc-new', source_hash='v1', vector=[rng.gauss(0, 1) for _ in range(8)]))
+
+        update = update_neighbour_lists(updated, graph_config, edge_state)
+        self.assertIsNotNone(update)
+        new_lists, recomputed = update
+        self.assertLess(recomputed, len(updated))
+        expected = as_map(build_similarity_edges(updated, graph_config))
+        actual = as_map(edges_from_neighbour_lists(new_lists, graph_config.k))
+        self.assertEqual(expected.keys(), actual.keys())
+        for key, weight in expected.items():
+            self.assertAlmostEqual(weight, actual[key], places=6)
+
+    def test_prune_edges_caps_degree_deterministically(self) -> None:
+        rng = random.Random(9)
+        nodes = [f'n{idx:02d}' for idx in range(40)]
+        edges = sorted(
+            {
+                (a, b, round(rng.random(), 2))
+                for a, b in (sorted(rng.sample(nodes, 2)) for _ in range(400))
+            },
+            key=lambda edge: (edge[0], edge[1]),
+        )
+        edges = list({(a, b): (a, b, weight) for a, b, weight in edges}.values())
+
+        pruned = prune_edges(edges, 4)
+        degree = {}
+        for a, b, _ in pruned:
+            degree[a] = degree.get(a, 0) + 1
+            degree[b] = degree.get(b, 0) + 1
+        self.assertLessEqual(max(degree.values()), 4)
+
+        shuffled = list(edges)
+        rng.shuffle(shuffled)
+        self.assertEqual(set(prune_edges(shuffled, 4)), set(pruned))
+
+    def test_prune_edges_breaks_weight_ties_by_pair(self) -> None:
+        edges = [('a', 'c', 0.5), ('a', 'b', 0.5), ('a', 'd', 0.9)]
+        self.assertEqual(prune_edges(edges, 2), [('a', 'c', 0.5), ('a', 'd', 0.9)])
+
+    def test_diff_edges_writes_only_real_changes(self) -> None:
+        graph_config = GraphConfig(k=5, min_similarity=0.3)
+        stored = {
+            ('a', 'b'): (0.9, 5, 0.3),
+            ('a', 'c'): (0.8, 5, 0.3),
+            ('b', 'c'): (0.7, 5, 0.3),
+            ('c', 'd'): (0.6, 10, 0.3),
+        }
+        unchanged = diff_edges(stored, [('a', 'b', 0.9 + 1e-12), ('a', 'c', 0.8), ('b', 'c', 0.7), ('c', 'd', 0.6)], graph_config)
+        self.assertEqual((unchanged.inserts, unchanged.updates, unchanged.deletes), ([], [('c', 'd', 0.6)], []))
+
+        delta = diff_edges(stored, [('a', 'b', 0.95), ('a', 'c', 0.8), ('a', 'd', 0.5)], graph_config)
+        self.assertEqual(delta.inserts, [('a', 'd', 0.5)])
+        self.assertEqual(delta.updates, [('a', 'b', 0.95)])
+        self.assertEqual(sorted(delta.deletes), [('b', 'c'), ('c', 'd')])
+
+    def test_diff_edges_on_subset_keeps_edges_of_other_docs(self) -> None:
+        graph_config = GraphConfig(k=5, min_similarity=0.3)
+        stored = {
+            ('a', 'b'): (0.9, 5, 0.3),
+            ('a', 'x'): (0.8, 5, 0.3),
+            ('x', 'y'): (0.7, 5, 0.3),
+        }
+        delta = diff_edges(stored, [('a', 'b', 0.9)], graph_config, scope={'a', 'b'})
+        self.assertEqual((delta.inserts, delta.updates, delta.deletes), ([], [], [('a', 'x')]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+
+from knowledge_core.ingest_pipeline.graph_builder.tokens import (
+    TokenCounter,
+    estimate_tokens,
+    next_batch_end,
+)
+
+
+class TokenPlannerTests(unittest.TestCase):
+    def test_next_batch_end_respects_items_and_token_budget(self):
+        counts = [10, 10, 10, 50, 5, 5, 5, 5, 200]
+
+        self.assertEqual(next_batch_end(counts, 0, max_items=3, max_tokens=60), 3)
+        self.assertEqual(next_batch_end(counts, 3, max_items=3, max_tokens=60), 6)
+        self.assertEqual(next_batch_end(counts, 6, max_items=3, max_tokens=60), 8)
+        # Текст больше бюджета уходит отдельным batch, а не теряется.
+        self.assertEqual(next_batch_end(counts, 8, max_items=3, max_tokens=60), 9)
+        self.assertEqual(next_batch_end(counts, 0, max_items=4, max_tokens=None), 4)
+        self.assertEqual(next_batch_end(counts, 9, max_items=4, max_tokens=None), 9)
+        with self.assertRaises(ValueError):
+            next_batch_end(counts, 0, max_items=0, max_tokens=None)
+
+    def test_truncate_fits_token_limit(self):
+        counter = TokenCounter('text-embedding-3-large')
+        text = 'Длинный пост про внимание и привычки. ' * 500
+
+        truncated = counter.truncate(text, 300)
+
+        self.assertTrue(text.startswith(truncated))
+        self.assertLessEqual(counter.count(truncated), 300)
+        self.assertGreater(counter.count(truncated), 250)
+        self.assertGreater(estimate_tokens('Привет'), estimate_tokens('Hello!'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -136,7 +136,7 @@ class GraphQueryService:
                       LEAST(e.source_id::text, e.target_id::text) AS source_id,
                       GREATEST(e.source_id::text, e.target_id::text) AS target_id,
                       MAX(e.weight)::float8 AS weight
-                    FROM publications.similarity_edges e
+                    FROM publications.similarity_edges_active e
                     {edge_join_sql}
                     WHERE {edge_condition_sql}
                       AND e.source_id <> e.target_id
@@ -211,7 +211,7 @@ class GraphQueryService:
                 cur.execute(
                     '''
                     SELECT count(*)
-                    FROM publications.similarity_edges e
+                    FROM publications.similarity_edges_active e
                     LEFT JOIN publications.doc_metadata s ON s.doc_id = e.source_id
                     LEFT JOIN publications.doc_metadata t ON t.doc_id = e.target_id
                     WHERE (e.source_id = ANY(%s) OR e.target_id = ANY(%s))
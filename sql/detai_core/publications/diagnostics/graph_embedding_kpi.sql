@@ -3,11 +3,11 @@
 -- 1) Корректный расчёт количества уникальных документов в рёбрах (doc_type='post').
 WITH edge_docs AS (
   SELECT e.source_id AS doc_id
-  FROM publications.similarity_edges e
+  FROM publications.similarity_edges_active e
   WHERE e.doc_type = 'post'
   UNION
   SELECT e.target_id AS doc_id
-  FROM publications.similarity_edges e
+  FROM publications.similarity_edges_active e
   WHERE e.doc_type = 'post'
 )
 SELECT COUNT(*) AS distinct_edge_docs
@@ -45,11 +45,11 @@ SELECT
 -- 3) Полнота metadata для endpoint-ов графа (doc_type='post').
 WITH edge_docs AS (
   SELECT e.source_id AS doc_id
-  FROM publications.similarity_edges e
+  FROM publications.similarity_edges_active e
   WHERE e.doc_type = 'post'
   UNION
   SELECT e.target_id AS doc_id
-  FROM publications.similarity_edges e
+  FROM publications.similarity_edges_active e
   WHERE e.doc_type = 'post'
 )
 SELECT COUNT(*) AS edge_docs_missing_metadata
@@ -60,11 +60,11 @@ WHERE dm.doc_id IS NULL;
 -- 4) Доля endpoint-ов без metadata (для критерия стабильности global графа).
 WITH edge_docs AS (
   SELECT e.source_id AS doc_id
-  FROM publications.similarity_edges e
+  FROM publications.similarity_edges_active e
   WHERE e.doc_type = 'post'
   UNION
   SELECT e.target_id AS doc_id
-  FROM publications.similarity_edges e
+  FROM publications.similarity_edges_active e
   WHERE e.doc_type = 'post'
 ),
 edge_docs_quality AS (
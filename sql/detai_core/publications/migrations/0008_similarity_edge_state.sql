@@ -0,0 +1,23 @@
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS publications.similarity_edge_state (
+  doc_id             TEXT NOT NULL,
+  doc_type           TEXT NOT NULL,
+  method             TEXT NOT NULL,
+  k                  INTEGER NOT NULL,
+  min_similarity     DOUBLE PRECISION NOT NULL,
+  source_hash        TEXT NOT NULL,
+  neighbour_ids      TEXT[] NOT NULL DEFAULT ARRAY[]::TEXT[],
+  neighbour_weights  DOUBLE PRECISION[] NOT NULL DEFAULT ARRAY[]::DOUBLE PRECISION[],
+  updated_at         TIMESTAMPTZ NOT NULL DEFAULT now(),
+  CONSTRAINT similarity_edge_state_unique UNIQUE (doc_id, doc_type, method)
+);
+
+COMMENT ON TABLE publications.similarity_edge_state IS
+'Top-k списки соседей (до pruning) и source_hash, по которым последний раз строились similarity_edges. Основа инкрементального пересчёта рёбер.';
+
+COMMIT;
+
+INSERT INTO infra.schema_migrations (version)
+VALUES ('0008_similarity_edge_state')
+ON CONFLICT (version) DO NOTHING;
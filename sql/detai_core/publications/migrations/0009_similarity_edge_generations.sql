@@ -0,0 +1,84 @@
+BEGIN;
+
+ALTER TABLE publications.similarity_edges
+  ADD COLUMN IF NOT EXISTS generation BIGINT NOT NULL DEFAULT 0;
+
+ALTER TABLE publications.similarity_edges
+  DROP CONSTRAINT IF EXISTS similarity_edges_unique;
+
+CREATE UNIQUE INDEX IF NOT EXISTS similarity_edges_generation_uidx
+  ON publications.similarity_edges (source_id, target_id, doc_type, method, generation);
+
+CREATE INDEX IF NOT EXISTS similarity_edges_profile_generation_idx
+  ON publications.similarity_edges (doc_type, method, generation);
+
+CREATE SEQUENCE IF NOT EXISTS publications.similarity_edge_generation_seq START WITH 1;
+
+CREATE TABLE IF NOT EXISTS publications.similarity_edge_generations (
+  doc_type        TEXT NOT NULL,
+  method          TEXT NOT NULL,
+  generation      BIGINT NOT NULL DEFAULT nextval('publications.similarity_edge_generation_seq'),
+  k               INTEGER NOT NULL,
+  min_similarity  DOUBLE PRECISION NOT NULL,
+  status          TEXT NOT NULL DEFAULT 'building',
+  edges_count     INTEGER NOT NULL DEFAULT 0,
+  created_at      TIMESTAMPTZ NOT NULL DEFAULT now(),
+  activated_at    TIMESTAMPTZ,
+  CONSTRAINT similarity_edge_generations_pk PRIMARY KEY (doc_type, method, generation),
+  CONSTRAINT similarity_edge_generations_status_chk CHECK (status IN ('building', 'active', 'retired', 'rolled_back'))
+);
+
+CREATE TABLE IF NOT EXISTS publications.similarity_edge_active (
+  doc_type     TEXT NOT NULL,
+  method       TEXT NOT NULL,
+  generation   BIGINT NOT NULL,
+  switched_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+  CONSTRAINT similarity_edge_active_pk PRIMARY KEY (doc_type, method)
+);
+
+COMMENT ON TABLE publications.similarity_edge_generations IS
+'Поколения similarity_edges: полная пересборка пишет новое поколение рядом с активным, затем переключает указатель.';
+
+COMMENT ON TABLE publications.similarity_edge_active IS
+'Указатель на активное поколение similarity_edges для (doc_type, method). Переключение — один UPDATE.';
+
+-- Существующие рёбра становятся поколением 0.
+INSERT INTO publications.similarity_edge_generations
+  (doc_type, method, generation, k, min_similarity, status, edges_count, activated_at)
+SELECT e.doc_type, e.method, 0, MAX(e.k), MAX(e.min_similarity), 'active', COUNT(*), now()
+FROM publications.similarity_edges e
+WHERE e.generation = 0
+GROUP BY e.doc_type, e.method
+ON CONFLICT (doc_type, method, generation) DO NOTHING;
+
+INSERT INTO publications.similarity_edge_active (doc_type, method, generation)
+SELECT DISTINCT e.doc_type, e.method, 0
+FROM publications.similarity_edges e
+WHERE e.generation = 0
+ON CONFLICT (doc_type, method) DO NOTHING;
+
+CREATE OR REPLACE VIEW publications.similarity_edges_active AS
+SELECT
+  e.source_id,
+  e.target_id,
+  e.doc_type,
+  e.weight,
+  e.method,
+  e.k,
+  e.min_similarity,
+  e.updated_at,
+  e.generation
+FROM publications.similarity_edges e
+JOIN publications.similarity_edge_active a
+  ON a.doc_type = e.doc_type
+ AND a.method = e.method
+ AND a.generation = e.generation;
+
+COMMENT ON VIEW publications.similarity_edges_active IS
+'Рёбра активных поколений. Читатели (graph API, export_snapshot, диагностика) работают только с этим view.';
+
+COMMIT;
+
+INSERT INTO infra.schema_migrations (version)
+VALUES ('0009_similarity_edge_generations')
+ON CONFLICT (version) DO NOTHING;
@@ -0,0 +1,33 @@
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS publications.embedding_runs (
+  run_id         TEXT PRIMARY KEY,
+  doc_type       TEXT NOT NULL,
+  model          TEXT NOT NULL,
+  status         TEXT NOT NULL DEFAULT 'running',
+  docs_total     INTEGER NOT NULL DEFAULT 0,
+  docs_done      INTEGER NOT NULL DEFAULT 0,
+  resumed_count  INTEGER NOT NULL DEFAULT 0,
+  started_at     TIMESTAMPTZ NOT NULL DEFAULT now(),
+  finished_at    TIMESTAMPTZ,
+  CONSTRAINT embedding_runs_status_chk CHECK (status IN ('running', 'done', 'failed'))
+);
+
+CREATE TABLE IF NOT EXISTS publications.embedding_run_docs (
+  run_id   TEXT NOT NULL REFERENCES publications.embedding_runs (run_id) ON DELETE CASCADE,
+  doc_id   TEXT NOT NULL,
+  done_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+  CONSTRAINT embedding_run_docs_pk PRIMARY KEY (run_id, doc_id)
+);
+
+COMMENT ON TABLE publications.embedding_runs IS
+'Журнал запусков embeddings stage: (run_id, model), статус и прогресс. Основа --resume.';
+
+COMMENT ON TABLE publications.embedding_run_docs IS
+'doc_id, чьи embeddings уже зафиксированы в рамках запуска. Пишется в той же транзакции, что и batch embeddings.';
+
+COMMIT;
+
+INSERT INTO infra.schema_migrations (version)
+VALUES ('0010_embedding_runs')
+ON CONFLICT (version) DO NOTHING;
@@ -0,0 +1,23 @@
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS publications.embedding_quarantine (
+  run_id      TEXT NOT NULL REFERENCES publications.embedding_runs (run_id) ON DELETE CASCADE,
+  doc_id      TEXT NOT NULL,
+  doc_type    TEXT NOT NULL,
+  model       TEXT NOT NULL,
+  error       TEXT NOT NULL,
+  created_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+  CONSTRAINT embedding_quarantine_pk PRIMARY KEY (run_id, doc_id)
+);
+
+CREATE INDEX IF NOT EXISTS embedding_quarantine_doc_idx
+  ON publications.embedding_quarantine (doc_type, model, doc_id);
+
+COMMENT ON TABLE publications.embedding_quarantine IS
+'Документы, которые провайдер не принял даже по одному: ошибка последней попытки. Остальной запуск продолжается без них.';
+
+COMMIT;
+
+INSERT INTO infra.schema_migrations (version)
+VALUES ('0011_embedding_quarantine')
+ON CONFLICT (version) DO NOTHING;
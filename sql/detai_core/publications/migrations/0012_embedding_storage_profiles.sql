@@ -0,0 +1,49 @@
+BEGIN;
+
+-- Размерность больше не фиксирована: модели с dimensions < native и разные модели в одной таблице.
+ALTER TABLE publications.embeddings
+  ALTER COLUMN embedding TYPE vector,
+  ALTER COLUMN dims DROP DEFAULT;
+
+UPDATE publications.embeddings
+SET dims = vector_dims(embedding)
+WHERE embedding IS NOT NULL
+  AND dims IS DISTINCT FROM vector_dims(embedding);
+
+COMMENT ON COLUMN publications.embeddings.embedding IS
+'Профиль хранения vector: float4, 4 байта на измерение.';
+
+-- halfvec появился в pgvector 0.7: на более старом расширении колонка не создаётся, профиль halfvec
+-- недоступен, а embedding остаётся NOT NULL. Повторный запуск после обновления расширения её добавит.
+DO $$
+BEGIN
+  IF (
+    SELECT string_to_array(split_part(extversion, '-', 1), '.')::int[] >= ARRAY[0, 7]
+    FROM pg_extension
+    WHERE extname = 'vector'
+  ) THEN
+    ALTER TABLE publications.embeddings
+      ALTER COLUMN embedding DROP NOT NULL;
+    EXECUTE 'ALTER TABLE publications.embeddings ADD COLUMN IF NOT EXISTS embedding_half halfvec';
+    IF NOT EXISTS (
+      SELECT 1
+      FROM pg_constraint
+      WHERE conrelid = 'publications.embeddings'::regclass
+        AND conname = 'embeddings_one_storage_check'
+    ) THEN
+      ALTER TABLE publications.embeddings
+        ADD CONSTRAINT embeddings_one_storage_check
+        CHECK ((embedding IS NULL) <> (embedding_half IS NULL));
+    END IF;
+    COMMENT ON COLUMN publications.embeddings.embedding_half IS
+    'Профиль хранения halfvec: float2, 2 байта на измерение. Заполнена ровно одна из колонок embedding / embedding_half.';
+  ELSE
+    RAISE NOTICE 'pgvector < 0.7: колонка embedding_half не создана, профиль halfvec недоступен';
+  END IF;
+END $$;
+
+COMMIT;
+
+INSERT INTO infra.schema_migrations (version)
+VALUES ('0012_embedding_storage_profiles')
+ON CONFLICT (version) DO NOTHING;
@@ -0,0 +1,15 @@
+BEGIN;
+
+-- Ключ входа embeddings, который считается без разбора тела поста: хеш файла, версия экстрактора
+-- и параметры подготовки текста. Совпал — вектор переиспользуется без clean_markdown.
+ALTER TABLE publications.embeddings
+  ADD COLUMN IF NOT EXISTS input_hash TEXT;
+
+COMMENT ON COLUMN publications.embeddings.input_hash IS
+'sha256 от source_hash файла, EXTRACT_VERSION и параметров prepare_text; NULL — строка записана до двухфазного извлечения.';
+
+COMMIT;
+
+INSERT INTO infra.schema_migrations (version)
+VALUES ('0013_embedding_input_hash')
+ON CONFLICT (version) DO NOTHING;